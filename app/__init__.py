@@ -1,19 +1,39 @@
-from flask import Flask, request, redirect, session, abort
+import os
+
+from flask import Flask, request, redirect, abort
 from flask_login import LoginManager
 from flask_wtf.csrf import CSRFProtect
 
-import dmapiclient
 from dmutils import init_app
 from dmutils.user import User
 from dmutils.external import external as external_blueprint
 from govuk_frontend_jinja.flask_ext import init_govuk_frontend
 
-from config import configs
+from config import configs, convert_environment_overrides
+
+from .api_client import PooledDataAPIClient
+from .cache import TTLCache
+from .fast_path import FastPathMiddleware
+from .health import DependencyProber
+from .throttling import LoginThrottle
+from .notify import EmailDispatcher
+from .password_tracking import PasswordChanges
+from . import profiling, request_phases, sessions, static_assets
+from .template_cache import TemplateBytecodeCache
 
 
 login_manager = LoginManager()
-data_api_client = dmapiclient.DataAPIClient()
+data_api_client = PooledDataAPIClient()
 csrf = CSRFProtect()
+user_cache = TTLCache('user')
+invitation_cache = TTLCache('invitation')
+reset_password_token_cache = TTLCache('reset_password_token')
+password_changes = PasswordChanges()
+response_cache = TTLCache('response')
+template_fragment_cache = TTLCache('template_fragment')
+email_dispatcher = EmailDispatcher()
+dependency_prober = DependencyProber()
+login_throttle = LoginThrottle()
 
 
 def create_app(config_name):
@@ -30,9 +50,21 @@ def create_app(config_name):
         data_api_client=data_api_client,
         login_manager=login_manager,
     )
+    convert_environment_overrides(application)
+
+    sessions.init_app(application)
+    static_assets.init_app(application)
+    request_phases.init_app(application)
+
+    if application.config['DM_TEMPLATE_BYTECODE_CACHE_DIR']:
+        application.jinja_env.bytecode_cache = TemplateBytecodeCache(
+            application.config['DM_TEMPLATE_BYTECODE_CACHE_DIR'],
+            root=os.path.dirname(application.root_path),
+        )
 
     from .metrics import metrics as metrics_blueprint, gds_metrics
     from .main import main as main_blueprint
+    from .main.views.status import probe_dependencies
 
     application.register_blueprint(metrics_blueprint, url_prefix='/user')
     application.register_blueprint(main_blueprint, url_prefix='/user')
@@ -43,6 +75,36 @@ def create_app(config_name):
 
     login_manager.login_view = 'main.render_login'
     login_manager.login_message = None  # don't flash message to user
+    user_cache.init_app(
+        application,
+        maxsize=application.config['DM_USER_CACHE_MAXSIZE'],
+        ttl=application.config['DM_USER_CACHE_TTL'],
+    )
+    invitation_cache.init_app(
+        application,
+        maxsize=application.config['DM_INVITATION_CACHE_MAXSIZE'],
+        ttl=application.config['DM_INVITATION_CACHE_TTL'],
+    )
+    reset_password_token_cache.init_app(
+        application,
+        maxsize=application.config['DM_RESET_PASSWORD_TOKEN_CACHE_MAXSIZE'],
+        ttl=application.config['DM_RESET_PASSWORD_TOKEN_CACHE_TTL'],
+    )
+    password_changes.init_app(application)
+    response_cache.init_app(
+        application,
+        maxsize=application.config['DM_RESPONSE_CACHE_MAXSIZE'],
+        ttl=application.config['DM_RESPONSE_CACHE_TTL'],
+    )
+    template_fragment_cache.init_app(
+        application,
+        maxsize=application.config['DM_FRAGMENT_CACHE_MAXSIZE'],
+        ttl=application.config['DM_FRAGMENT_CACHE_TTL'],
+    )
+    application.jinja_env.fragment_cache = template_fragment_cache
+    email_dispatcher.init_app(application)
+    dependency_prober.init_app(application, probe=probe_dependencies)
+    login_throttle.init_app(application)
     gds_metrics.init_app(application)
     csrf.init_app(application)
 
@@ -60,14 +122,31 @@ def create_app(config_name):
             else:
                 return redirect(request.path[:-1], code=301)
 
-    @application.before_request
-    def refresh_session():
-        session.permanent = True
-        session.modified = True
+    application.before_request(sessions.refresh_session)
+
+    # wrapped before FastPathMiddleware so that only requests handled by Flask are profiled
+    profiling.init_app(application)
+
+    if application.config['DM_WSGI_FAST_PATH']:
+        application.wsgi_app = FastPathMiddleware(application, application.wsgi_app, gds_metrics)
+
+    if application.config['DM_PREWARM']:
+        from .prewarm import prewarm
+        prewarm(application)
 
     return application
 
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.load_user(data_api_client, user_id)
+    user = user_cache.get(str(user_id))
+    if user is None:
+        user = User.load_user(data_api_client, user_id)
+        if user is not None:
+            user_cache.set(str(user_id), user)
+    return user
+
+
+def invalidate_cached_user(user_id):
+    """Drop a user from the `load_user` cache - call this after anything that changes the user's record."""
+    user_cache.pop(str(user_id))
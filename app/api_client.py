@@ -0,0 +1,112 @@
+import functools
+import inspect
+import os
+import re
+from threading import Lock
+import time
+from urllib.parse import urlparse
+
+import dmapiclient
+from dmapiclient import HTTPError
+import requests
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
+
+from .metrics import DATA_API_REQUEST_DURATION_SECONDS, DATA_API_REQUESTS_IN_FLIGHT
+from .request_phases import timed_phase
+
+
+class PooledDataAPIClient(dmapiclient.DataAPIClient):
+    """
+    `DataAPIClient` which reuses a keep-alive connection pool for its requests instead of setting up a new session (and
+    connection) for every one. Pool size, timeouts and the retry budget are read from the app config by `init_app`.
+
+    Each request's duration is recorded in `data_api_request_duration_seconds` and requests currently waiting on the
+    API are counted in `data_api_requests_in_flight`, both labelled by method and endpoint (the request path with any
+    numeric ids replaced by `<id>`). Durations are also labelled by the error's status code, or "2xx" on success.
+
+    Calls to the client's public methods are timed as the "data_api" request phase, by method name.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pool_size = 10
+        self._keep_alive = True
+        self._sessions = {}
+        self._sessions_pid = None
+        self._lock = Lock()
+
+    def init_app(self, app):
+        super().init_app(app)
+        self._pool_size = app.config["DM_DATA_API_POOL_SIZE"]
+        self._keep_alive = app.config["DM_DATA_API_KEEP_ALIVE"]
+        self._timeout = (app.config["DM_DATA_API_CONNECT_TIMEOUT"], app.config["DM_DATA_API_READ_TIMEOUT"])
+        self._RETRIES = app.config["DM_DATA_API_RETRIES"]
+        self._RETRIES_BACKOFF_FACTOR = app.config["DM_DATA_API_RETRY_BACKOFF"]
+        with self._lock:
+            self._sessions = {}
+
+    def _requests_retry_session(self, *, retry_read_timeouts=True):
+        with self._lock:
+            # sessions aren't shared with worker processes forked from a preloaded app
+            if self._sessions_pid != os.getpid():
+                self._sessions = {}
+                self._sessions_pid = os.getpid()
+            if retry_read_timeouts not in self._sessions:
+                self._sessions[retry_read_timeouts] = self._new_session(retry_read_timeouts)
+            return self._sessions[retry_read_timeouts]
+
+    def _new_session(self, retry_read_timeouts):
+        session = requests.Session()
+        retry = Retry(
+            total=self._RETRIES,
+            read=self._RETRIES if retry_read_timeouts else 0,
+            connect=self._RETRIES,
+            status=self._RETRIES,
+            backoff_factor=self._RETRIES_BACKOFF_FACTOR,
+            status_forcelist=self._RETRIES_FORCE_STATUS_CODES,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self._pool_size, max_retries=retry)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        if not self._keep_alive:
+            session.headers["Connection"] = "close"
+        return session
+
+    @staticmethod
+    def _endpoint(url):
+        return re.sub(r"/\d+(?=/|$)", "/<id>", urlparse(url).path) or "/"
+
+    def _request(self, method, url, data=None, params=None, *, client_wait_for_response=True):
+        endpoint = self._endpoint(url)
+        in_flight = DATA_API_REQUESTS_IN_FLIGHT.labels(method, endpoint)
+        code = "error"
+        start_time = time.perf_counter()
+        in_flight.inc()
+        try:
+            response = super()._request(
+                method, url, data=data, params=params, client_wait_for_response=client_wait_for_response
+            )
+            code = "2xx"
+            return response
+        except HTTPError as e:
+            code = e.status_code
+            raise
+        finally:
+            in_flight.dec()
+            DATA_API_REQUEST_DURATION_SECONDS.labels(method, endpoint, code).observe(time.perf_counter() - start_time)
+
+
+def _phase_timed(name, method):
+    @functools.wraps(method)
+    def phase_timed_method(self, *args, **kwargs):
+        with timed_phase("data_api", name):
+            return method(self, *args, **kwargs)
+    return phase_timed_method
+
+
+# the *_iter methods return generators which call the paginated method they wrap (timed itself) for each page
+for _name, _method in inspect.getmembers(dmapiclient.DataAPIClient, inspect.isfunction):
+    if not _name.startswith("_") and not _name.endswith("_iter") and _name != "init_app":
+        setattr(PooledDataAPIClient, _name, _phase_timed(_name, _method))
@@ -0,0 +1,73 @@
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+
+from .metrics import CACHE_HITS_TOTAL, CACHE_MISSES_TOTAL
+
+
+class TTLCache:
+    """
+    A small, thread-safe, in-process LRU cache whose entries expire `ttl` seconds after they were set.
+
+    Instances are created at import time (so they can be shared between views) and sized from the app config by
+    `init_app`, which also empties them - each app created by the tests therefore starts with a cold cache. A `ttl` or
+    `maxsize` of 0 disables the cache entirely. Hits and misses are counted against the cache's `name` in
+    `cache_hits_total` / `cache_misses_total`.
+    """
+
+    def __init__(self, name, maxsize=0, ttl=0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def init_app(self, app, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clear()
+
+    @property
+    def enabled(self):
+        return bool(self.maxsize and self.ttl)
+
+    def get(self, key, default=None):
+        if not self.enabled:
+            return default
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+        if entry is None:
+            CACHE_MISSES_TOTAL.labels(self.name).inc()
+            return default
+
+        CACHE_HITS_TOTAL.labels(self.name).inc()
+        return entry[1]
+
+    def set(self, key, value):
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._entries[key] = (monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        return entry and entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
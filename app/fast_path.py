@@ -0,0 +1,118 @@
+from time import monotonic
+
+from dmutils.proxy_fix import CustomProxyFix
+from werkzeug.exceptions import HTTPException
+from werkzeug.wrappers import Request
+
+from .static_assets import StaticFiles
+
+
+class FastPathMiddleware:
+    """
+    WSGI middleware which serves static files, `_status` and `_metrics` directly, rather than passing them through
+    Flask's request handling (session loading, before/after request hooks, CSRF, flask-login...) which they don't need.
+    They're still counted in the `http_server_requests_total` and `http_server_request_duration_seconds` metrics as
+    if Flask had served them, with the client's host and address from the same `CustomProxyFix` dmutils wraps Flask in,
+    and given the `X-Frame-Options` header dmutils adds to Flask's responses. They're
+    deliberately not logged - they're polled constantly by health checks and Prometheus, and the request log would be
+    mostly them. Any other request, or any static path that isn't a file, is passed on to `wsgi_app`.
+
+    Static files are served precompressed, and cacheable forever when fingerprinted - see `StaticFiles`.
+    """
+
+    def __init__(self, app, wsgi_app, gds_metrics):
+        self.app = app
+        self.wsgi_app = wsgi_app
+        self.gds_metrics = gds_metrics
+
+        rules = {rule.endpoint: rule.rule for rule in app.url_map.iter_rules()}
+        self.static_rule = rules["static"]
+        self.static_url_path = app.static_url_path + "/"
+        self.handlers = {
+            rules["main.status"]: (rules["main.status"], self.status),
+            rules["main.status_live"]: (rules["main.status_live"], self.status_live),
+            rules["main.status_ready"]: (rules["main.status_ready"], self.status_ready),
+            rules["metrics.metrics"]: (rules["metrics.metrics"], self.metrics),
+        }
+        # the fast path's requests don't reach the CustomProxyFix dmutils.proxy_fix has wrapped Flask in
+        self.proxy_fix = CustomProxyFix(self.serve, app.config.get("DM_HTTP_PROTO", "http"))
+        self.static_files = StaticFiles(
+            wsgi_app,
+            app.static_folder,
+            app.static_url_path,
+            manifest=app.extensions.get("static_assets_manifest", {}),
+            cache_timeout=app.send_file_max_age_default.total_seconds(),
+        )
+
+    def __call__(self, environ, start_response):
+        path = environ.get("PATH_INFO", "")
+        if environ["REQUEST_METHOD"] in ("GET", "HEAD") and (
+            path in self.handlers or path.startswith(self.static_url_path)
+        ):
+            return self.proxy_fix(environ, start_response)
+
+        return self.wsgi_app(environ, start_response)
+
+    def serve(self, environ, start_response):
+        path = environ.get("PATH_INFO", "")
+        if path in self.handlers:
+            rule, handler = self.handlers[path]
+            return self._counted(rule, self._wsgi_handler(handler), environ, start_response)
+        return self._counted(self.static_rule, self.static_files, environ, start_response)
+
+    @staticmethod
+    def _wsgi_handler(handler):
+        def wsgi_handler(environ, start_response):
+            return handler(Request(environ))(environ, start_response)
+        return wsgi_handler
+
+    def _counted(self, rule, wsgi_app, environ, start_response):
+        start_time = monotonic()
+        status = []
+
+        def counting_start_response(status_line, headers, exc_info=None):
+            status.append(int(status_line.split(" ", 1)[0]))
+            # as dmutils.flask_init's after_request hook, which isn't run for these requests
+            if not any(name.lower() == "x-frame-options" for name, value in headers):
+                headers.append(("X-Frame-Options", "DENY"))
+            return start_response(status_line, headers, exc_info)
+
+        app_iter = wsgi_app(environ, counting_start_response)
+
+        # a static path that isn't a file will have been passed on to (and counted by) the Flask app
+        if status and status[0] != 404:
+            request = Request(environ)
+            self.gds_metrics.observe_request(request.method, request.host, rule, status[0], monotonic() - start_time)
+
+        return app_iter
+
+    def status(self, request):
+        from .main.views.status import app_status
+
+        return self._status_response(app_status, ignore_dependencies="ignore-dependencies" in request.args)
+
+    def status_live(self, request):
+        from .main.views.status import liveness_status
+
+        return self._status_response(liveness_status)
+
+    def status_ready(self, request):
+        from .main.views.status import readiness_status
+
+        return self._status_response(readiness_status)
+
+    def _status_response(self, status_function, **kwargs):
+        with self.app.app_context():
+            response, status_code = status_function(**kwargs)
+        response.status_code = status_code
+        return response
+
+    def metrics(self, request):
+        # gds_metrics' own view, which needs a request context - without the session Flask would load for one
+        request_context = self.app.request_context(request.environ)
+        request_context.session = self.app.session_interface.make_null_session(self.app)
+        with request_context:
+            try:
+                return self.gds_metrics.metrics_endpoint()
+            except HTTPException as e:
+                return e.get_response()
@@ -0,0 +1,38 @@
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+
+class FragmentCacheExtension(Extension):
+    """
+    Adds a `{% fragmentcache "name", key, ... %}...{% endfragmentcache %}` tag, which renders its body once per distinct
+    set of key values and serves it from the environment's `fragment_cache` (a `TTLCache`, set by `create_app`) after
+    that. The keys must include everything the body's output depends on - e.g. the arguments passed to the macro it
+    calls. Without a `fragment_cache` the body is rendered every time.
+    """
+    tags = {"fragmentcache"}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+
+        key = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            key.append(parser.parse_expression())
+
+        body = parser.parse_statements(["name:endfragmentcache"], drop_needle=True)
+        call = self.call_method("_render_fragment", [nodes.Tuple(key, "load")])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render_fragment(self, key, caller):
+        fragment_cache = self.environment.fragment_cache
+        if fragment_cache is None:
+            return caller()
+
+        rv = fragment_cache.get(key)
+        if rv is None:
+            rv = caller()
+            fragment_cache.set(key, rv)
+        return rv
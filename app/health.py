@@ -0,0 +1,88 @@
+import os
+from threading import Event, Lock, Thread
+from time import monotonic
+
+
+class DependencyProber:
+    """
+    Probes the app's dependencies (the Data API) for `_status`.
+
+    If `DM_STATUS_PROBE_INTERVAL` is set the probe is made from a background thread in each worker every that many
+    seconds, and `get_status` returns the last result rather than each of the constant load balancer status checks
+    making a request to the API. Results older than `STALE_AFTER_INTERVALS` intervals (the thread is stuck on a slow
+    API, say) are refreshed inline. Otherwise every call to `get_status` probes.
+    """
+
+    STALE_AFTER_INTERVALS = 3
+
+    def __init__(self):
+        self._app = None
+        self._probe = None
+        self.interval = None
+        self._result = None
+        self._prober_pid = None
+        self._stopped = Event()
+        self._lock = Lock()
+
+    def init_app(self, app, probe):
+        """`probe` is called in an app context, and should return a status dict like `DataAPIClient.get_status`"""
+        with self._lock:
+            # stop the previous app's thread, if any
+            self._stopped.set()
+            self._stopped = Event()
+            self._prober_pid = None
+            self._result = None
+
+        self._app = app
+        self._probe = probe
+        self.interval = app.config["DM_STATUS_PROBE_INTERVAL"] or None
+
+    def get_status(self):
+        """The last result of probing the dependencies - so an instance can be passed to `get_app_status` in place of
+        the API client"""
+        return self.get()[0]
+
+    def get(self):
+        """The last result of probing the dependencies, and its age in seconds"""
+        if not self.interval:
+            status, checked_at = self._probe_now(self._stopped)
+            return status, monotonic() - checked_at
+
+        self._ensure_prober()
+        result = self._result
+        if result is None or monotonic() - result[1] > self.interval * self.STALE_AFTER_INTERVALS:
+            result = self._probe_now(self._stopped)
+        return result[0], monotonic() - result[1]
+
+    def status_age(self):
+        """An additional check for `get_app_status` (called after `get_status`), adding the age of the status it got"""
+        result = self._result
+        return {"dependencies_checked_seconds_ago": round(monotonic() - result[1], 1) if result else None}
+
+    def _ensure_prober(self):
+        # started on first use so that worker processes forked from a preloaded app each get their own thread
+        with self._lock:
+            if self._prober_pid != os.getpid():
+                self._prober_pid = os.getpid()
+                Thread(target=self._run, args=(self._stopped,), name="dependency-prober", daemon=True).start()
+
+    def _run(self, stopped):
+        while not stopped.wait(self.interval):
+            self._probe_now(stopped)
+
+    def _probe_now(self, stopped):
+        try:
+            with self._app.app_context():
+                status = self._probe() or {"status": "n/a"}
+            if "status" not in status:
+                # get_status returns the body of an API error response as it is, and one from a proxy in front of the
+                # API (say) mightn't be a status report at all
+                status = dict(status, status="error")
+        except Exception as e:
+            self._app.logger.exception("Failed to probe dependencies")
+            status = {"status": "error", "message": str(e)}
+
+        result = (status, monotonic())
+        if not stopped.is_set():
+            self._result = result
+        return result
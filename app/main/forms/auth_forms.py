@@ -1,9 +1,7 @@
-from itertools import chain
 from pathlib import Path
 
 from flask import current_app
 from flask_login import current_user
-from flask_wtf import FlaskForm
 from wtforms import PasswordField, StringField
 from wtforms.validators import DataRequired, EqualTo, Length, Regexp, ValidationError
 
@@ -11,6 +9,12 @@ from dmutils.email.helpers import hash_string
 from dmutils.forms.fields import DMStripWhitespaceStringField
 
 from app import data_api_client
+from app.request_phases import PhaseTimedForm, timed_phase
+from .password_blocklist import (
+    BloomFilteredBlocklist,
+    normalized_password,
+    PasswordBlocklistIndex,
+)
 
 
 PASSWORD_MIN_LENGTH = 10
@@ -39,46 +43,58 @@ class NotInPasswordBlocklist:
     # path, relative to flask app root_path, to look for password blocklist files. all files found here will be read,
     # one password per line
     BLOCKLIST_DIR_PATH = "data/password_blocklist"
+    # path, relative to flask app root_path, of the compiled index of the above built by
+    # scripts/build-password-blocklist-index.py. if it's missing or out of date we fall back to reading the text files.
+    BLOCKLIST_INDEX_PATH = "data/password_blocklist.idx"
 
     @staticmethod
     def _normalized_password(password):
-        return password.strip().lower()
-
-    @classmethod
-    def _lines_from_filepath(cls, filepath):
-        with filepath.open("r", encoding="utf-8") as f:
-            # we exclude passwords that can't be used anyway as they fall short of the minimum password length - doing
-            # this allows us to keep "original" password lists in the blocklist dir without modification, making them
-            # easier to maintain yet still memory-efficient.
-            return tuple(
-                password
-                for password in (cls._normalized_password(line) for line in f)
-                if len(password) >= PASSWORD_MIN_LENGTH
-            )
+        return normalized_password(password)
 
     # this value is not populated until first access because construction depends on current_app being available
     _blocklist_set = None
 
     @classmethod
     def get_blocklist_set(cls):
-        # cache blocklist set class-wide
+        # cache blocklist set class-wide. this will be a PasswordBlocklistIndex - mapped where a current index has been
+        # built, otherwise built in memory - optionally fronted by a Bloom filter. both support `in`, which is all we
+        # need.
         if cls._blocklist_set is None:
-            cls._blocklist_set = frozenset(chain.from_iterable(
-                cls._lines_from_filepath(filepath)
-                for filepath in (Path(current_app.root_path) / cls.BLOCKLIST_DIR_PATH).iterdir()
-                if filepath.is_file()
-            ))
+            root_path = Path(current_app.root_path)
+            blocklist_dir = root_path / cls.BLOCKLIST_DIR_PATH
+            blocklist = PasswordBlocklistIndex.open(
+                root_path / cls.BLOCKLIST_INDEX_PATH,
+                blocklist_dir,
+                PASSWORD_MIN_LENGTH,
+            )
+            if blocklist is None:
+                current_app.logger.warning(
+                    "Password blocklist index at {index_path} missing or stale, reading blocklist files instead",
+                    extra={"index_path": cls.BLOCKLIST_INDEX_PATH},
+                )
+                blocklist = PasswordBlocklistIndex.from_files(blocklist_dir, PASSWORD_MIN_LENGTH)
+
+            false_positive_rate = current_app.config.get("DM_PASSWORD_BLOCKLIST_BLOOM_FILTER_FP_RATE")
+            if false_positive_rate:
+                blocklist = BloomFilteredBlocklist(blocklist, false_positive_rate)
+
+            cls._blocklist_set = blocklist
         return cls._blocklist_set
 
+    @classmethod
+    def blocklist_loaded(cls):
+        return cls._blocklist_set is not None
+
     def __init__(self, message):
         self.message = message
 
+    @timed_phase("validator", "NotInPasswordBlocklist")
     def __call__(self, form, field):
         if self._normalized_password(field.data) in self.get_blocklist_set():
             raise ValidationError(self.message)
 
 
-class LoginForm(FlaskForm):
+class LoginForm(PhaseTimedForm):
     email_address = DMStripWhitespaceStringField(
         'Email address', id="input-email_address",
         hint=EMAIL_LOGIN_HINT,
@@ -96,7 +112,7 @@ class LoginForm(FlaskForm):
     )
 
 
-class EmailAddressForm(FlaskForm):
+class EmailAddressForm(PhaseTimedForm):
     email_address = DMStripWhitespaceStringField(
         'Email address', id="input-email_address",
         hint=EMAIL_LOGIN_HINT,
@@ -112,6 +128,7 @@ class MatchesCurrentPassword:
     def __init__(self, message):
         self.message = message
 
+    @timed_phase("validator", "MatchesCurrentPassword")
     def __call__(self, form, field):
         user_json = data_api_client.authenticate_user(current_user.email_address, field.data)
 
@@ -122,7 +139,7 @@ class MatchesCurrentPassword:
             raise ValidationError(self.message)
 
 
-class PasswordChangeForm(FlaskForm):
+class PasswordChangeForm(PhaseTimedForm):
     old_password = PasswordField(
         'Old password', id="input-old_password",
         validators=[
@@ -163,7 +180,7 @@ class PasswordResetForm(PasswordChangeForm):
     old_password = None
 
 
-class CreateUserForm(FlaskForm):
+class CreateUserForm(PhaseTimedForm):
     name = DMStripWhitespaceStringField(
         'Your name', id="input-name",
         validators=[
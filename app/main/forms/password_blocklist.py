@@ -0,0 +1,176 @@
+"""
+Compiled, memory-mapped password blocklist index.
+
+The plain-text blocklist files are compiled at build time (see `scripts/build-password-blocklist-index.py`) into a
+sorted array of 64-bit password hashes, so that workers can `mmap` the index instead of each building a frozenset of
+~100k strings on first use. Being a read-only file mapping, the index's pages are shared between all workers through
+the page cache.
+
+Index layout: an 8 byte magic/byteorder header, the 32 byte fingerprint of the source files it was built from (see
+`blocklist_fingerprint`), an 8 byte record count and then the sorted native-endian unsigned 64-bit hashes.
+"""
+from array import array
+from bisect import bisect_left
+from hashlib import blake2b, sha256
+import math
+import mmap
+import os
+import struct
+import sys
+
+
+INDEX_MAGIC = b"DMPWBL2" + (b"<" if sys.byteorder == "little" else b">")
+_HEADER = struct.Struct("8s32sQ")
+
+
+def normalized_password(password):
+    return password.strip().lower()
+
+
+def password_hash(password):
+    return int.from_bytes(blake2b(password.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def blocklist_filepaths(blocklist_dir):
+    return sorted(filepath for filepath in blocklist_dir.iterdir() if filepath.is_file())
+
+
+def passwords_from_file(filepath, min_length):
+    with filepath.open("r", encoding="utf-8") as f:
+        # we exclude passwords that can't be used anyway as they fall short of the minimum password length - doing
+        # this allows us to keep "original" password lists in the blocklist dir without modification, making them
+        # easier to maintain yet still memory-efficient.
+        return tuple(
+            password
+            for password in (normalized_password(line) for line in f)
+            if len(password) >= min_length
+        )
+
+
+def blocklist_fingerprint(blocklist_dir, min_length):
+    """
+    A digest of everything an index depends on, used to tell whether an index is stale. The blocklist files are
+    identified by their names, sizes and modification times, so that checking an index doesn't mean reading them.
+    """
+    fingerprint = sha256(INDEX_MAGIC + str(min_length).encode("ascii"))
+    for filepath in blocklist_filepaths(blocklist_dir):
+        stat = filepath.stat()
+        fingerprint.update(f"{filepath.name}\0{stat.st_size}\0{stat.st_mtime_ns}\0".encode("utf-8"))
+    return fingerprint.digest()
+
+
+def sorted_hashes(blocklist_dir, min_length):
+    return array("Q", sorted({
+        password_hash(password)
+        for filepath in blocklist_filepaths(blocklist_dir)
+        for password in passwords_from_file(filepath, min_length)
+    }))
+
+
+def build_index(blocklist_dir, index_path, min_length):
+    hashes = sorted_hashes(blocklist_dir, min_length)
+
+    # write to a temporary file and rename it into place so running workers never see a partial index
+    tmp_path = index_path.with_name(index_path.name + ".tmp")
+    with tmp_path.open("wb") as f:
+        f.write(_HEADER.pack(INDEX_MAGIC, blocklist_fingerprint(blocklist_dir, min_length), len(hashes)))
+        hashes.tofile(f)
+    os.replace(str(tmp_path), str(index_path))
+
+    return len(hashes)
+
+
+class PasswordBlocklistIndex:
+    """
+    Read-only sorted array of password hashes - a compiled index mapped by `open`, or one built in memory from the
+    blocklist files by `from_files`. Supports `in` for (normalized) passwords.
+    """
+
+    def __init__(self, hashes):
+        self._hashes = hashes
+
+    @classmethod
+    def from_files(cls, blocklist_dir, min_length):
+        """Build the index in memory, for when there's no current compiled index to map"""
+        return cls(sorted_hashes(blocklist_dir, min_length))
+
+    @classmethod
+    def open(cls, index_path, blocklist_dir, min_length):
+        """
+        Map the index at `index_path`, returning `None` if it is missing, malformed or wasn't built from the current
+        contents of `blocklist_dir`.
+        """
+        try:
+            with index_path.open("rb") as f:
+                mapped_file = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        if len(mapped_file) < _HEADER.size:
+            return None
+        magic, fingerprint, count = _HEADER.unpack_from(mapped_file)
+        if (
+            magic != INDEX_MAGIC
+            or len(mapped_file) != _HEADER.size + count * 8
+            or fingerprint != blocklist_fingerprint(blocklist_dir, min_length)
+        ):
+            return None
+
+        return cls(memoryview(mapped_file)[_HEADER.size:_HEADER.size + count * 8].cast("Q"))
+
+    def __contains__(self, password):
+        return self.contains_hash(password_hash(password))
+
+    def contains_hash(self, hash_):
+        i = bisect_left(self._hashes, hash_)
+        return i < len(self._hashes) and self._hashes[i] == hash_
+
+    def __iter__(self):
+        """Iterate over the password *hashes* in the index"""
+        return iter(self._hashes)
+
+    def __len__(self):
+        return len(self._hashes)
+
+
+class BloomFilter:
+    """
+    Bloom filter over 64-bit password hashes, sized for `count` entries at the given false positive rate. Bit
+    positions are derived from the two 32-bit halves of the hash (Kirsch-Mitzenmacher double hashing), so no further
+    hashing is needed on lookup.
+    """
+
+    def __init__(self, hashes, count, false_positive_rate):
+        count = max(count, 1)
+        self.num_bits = max(8, math.ceil(-count * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / count * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+        for hash_ in hashes:
+            for position in self._positions(hash_):
+                self._bits[position >> 3] |= 1 << (position & 7)
+
+    def _positions(self, hash_):
+        h1, h2 = hash_ & 0xffffffff, hash_ >> 32
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+
+    def might_contain(self, hash_):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(hash_))
+
+
+class BloomFilteredBlocklist:
+    """
+    Wraps a PasswordBlocklistIndex with a Bloom filter so that the exact lookup only happens for passwords that might be
+    on the list. Building the filter reads every hash in the index.
+    """
+
+    def __init__(self, blocklist, false_positive_rate):
+        self._blocklist = blocklist
+        self.bloom_filter = BloomFilter(blocklist, len(blocklist), false_positive_rate)
+
+    def __contains__(self, password):
+        hash_ = password_hash(password)
+        return self.bloom_filter.might_contain(hash_) and self._blocklist.contains_hash(hash_)
+
+    def __len__(self):
+        return len(self._blocklist)
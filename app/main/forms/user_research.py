@@ -1,6 +1,7 @@
-from flask_wtf import FlaskForm
 from wtforms import BooleanField
 
+from app.request_phases import PhaseTimedForm
 
-class UserResearchOptInForm(FlaskForm):
+
+class UserResearchOptInForm(PhaseTimedForm):
     user_research_opt_in = BooleanField("Send me emails about opportunities to get involved in user research")
@@ -0,0 +1,54 @@
+from functools import wraps
+
+from flask import current_app, g, make_response, request, session
+from flask_login import current_user
+from flask_wtf.csrf import generate_csrf
+
+from ... import response_cache
+
+
+# stands in for the CSRF token in cached pages, as the token is tied to the user's session
+CSRF_TOKEN_PLACEHOLDER = "__dm_cached_csrf_token__"
+
+
+def _csrf_field_name():
+    return current_app.config.get("WTF_CSRF_FIELD_NAME", "csrf_token")
+
+
+def cacheable_response(view):
+    """
+    Cache the rendered page from a GET view whose output only depends on the request path, query string and the role
+    of the logged in user (for the header) in `response_cache`. Requests with flashed messages waiting to be shown
+    always go through to the view, and only successful HTML responses are cached.
+
+    A CSRF token rendered into the page is swapped for the current session's token whenever the page is served.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method != "GET" or not response_cache.enabled or session.get("_flashes"):
+            return view(*args, **kwargs)
+
+        key = (
+            request.endpoint,
+            request.full_path,
+            current_user.role if current_user.is_authenticated else None,
+        )
+        cached = response_cache.get(key)
+        if cached is not None:
+            body, status, mimetype, has_csrf_token = cached
+            if has_csrf_token:
+                body = body.replace(CSRF_TOKEN_PLACEHOLDER, generate_csrf())
+            return current_app.response_class(body, status=status, mimetype=mimetype)
+
+        response = make_response(view(*args, **kwargs))
+        if response.status_code == 200 and response.mimetype == "text/html" and not response.direct_passthrough:
+            body = response.get_data(as_text=True)
+            # only set if a token was generated while rendering the page
+            csrf_token = g.get(_csrf_field_name())
+            if csrf_token:
+                body = body.replace(csrf_token, CSRF_TOKEN_PLACEHOLDER)
+            response_cache.set(key, (body, response.status_code, response.mimetype, bool(csrf_token)))
+
+        return response
+
+    return wrapper
@@ -0,0 +1,43 @@
+from collections import deque
+from time import monotonic, sleep
+
+from flask import current_app
+
+
+class ResponseTimePadder:
+    """
+    Pads the time spent in a view to a target duration, so that response times don't reveal which branch of the view
+    was taken (e.g. whether an account exists). The target is a percentile of the durations of the most recent "real"
+    branches recorded with `record`, capped so that a slow dependency can't tie up workers indefinitely.
+
+    Configured by `<config_prefix>_RESPONSE_TIME` (on/off), `<config_prefix>_PERCENTILE`,
+    `<config_prefix>_DEFAULT_SECONDS` (the target until any durations have been recorded) and
+    `<config_prefix>_MAX_SECONDS`.
+    """
+
+    def __init__(self, config_prefix, window=50):
+        self.config_prefix = config_prefix
+        self._durations = deque(maxlen=window)
+
+    def _config(self, name):
+        return current_app.config[f"{self.config_prefix}_{name}"]
+
+    def record(self, start_time):
+        self._durations.append(monotonic() - start_time)
+
+    def target_duration(self):
+        durations = sorted(self._durations)
+        if durations:
+            percentile = self._config("PERCENTILE")
+            target = durations[min(len(durations) - 1, int(len(durations) * percentile / 100))]
+        else:
+            target = self._config("DEFAULT_SECONDS")
+        return min(target, self._config("MAX_SECONDS"))
+
+    def pad(self, start_time):
+        if not self._config("RESPONSE_TIME"):
+            return
+
+        remaining = self.target_duration() - (monotonic() - start_time)
+        if remaining > 0:
+            sleep(remaining)
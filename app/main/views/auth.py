@@ -1,4 +1,6 @@
 # coding: utf-8
+import math
+
 from flask_login import current_user
 from flask import (
     current_app,
@@ -21,16 +23,20 @@ from dmutils.email.helpers import hash_string
 
 from .. import main
 from ..forms.auth_forms import LoginForm
+from ..helpers.cache_helpers import cacheable_response
 from ..helpers.login_helpers import redirect_logged_in_user
-from ... import data_api_client
+from ... import data_api_client, login_throttle
 
 
 NO_ACCOUNT_MESSAGE = Markup("""Check you’ve entered the correct email address and password. Accounts
     are locked after 5 failed attempts. If you’ve forgotten your password you can reset it by selecting
     ‘Forgotten password’.""")
 
+TOO_MANY_ATTEMPTS_MESSAGE = "There have been too many attempts to log in. Wait a few minutes, then try again."
+
 
 @main.route('/login', methods=["GET"])
+@cacheable_response
 def render_login():
     next_url = request.args.get('next')
     if current_user.is_authenticated and not get_flashed_messages():
@@ -51,6 +57,23 @@ def process_login():
     form = LoginForm()
     next_url = request.args.get('next')
     if form.validate_on_submit():
+        throttled = login_throttle.check(form.email_address.data)
+        if throttled:
+            current_app.logger.warning(
+                "login.throttled: {bucket} limit reached logging in {email_hash}",
+                extra={'bucket': throttled.bucket, 'email_hash': hash_string(form.email_address.data)})
+            errors = govuk_errors({
+                "email_address": {
+                    "message": TOO_MANY_ATTEMPTS_MESSAGE,
+                    "input_name": "email_address",
+                },
+            })
+            return render_template(
+                "auth/login.html",
+                form=form,
+                errors=errors,
+                next=next_url), 429, {'Retry-After': str(math.ceil(throttled.retry_after))}
+
         user_json = data_api_client.authenticate_user(
             form.email_address.data,
             form.password.data)
@@ -1,9 +1,11 @@
 # coding: utf-8
 from .. import main
+from ..helpers.cache_helpers import cacheable_response
 from dmutils.flask import timed_render_template as render_template
 
 
 @main.route('/cookie-settings', methods=["GET"])
+@cacheable_response
 def cookie_settings():
     # Preferences saved client side as cookies, so no POST required
     return render_template('cookies/cookie_settings.html')
@@ -1,3 +1,5 @@
+import hashlib
+
 from flask import abort, current_app, Markup
 from flask_login import login_user
 
@@ -11,7 +13,7 @@ from dmutils.user import User
 from .. import main
 from ..forms.auth_forms import CreateUserForm
 from ..helpers.login_helpers import redirect_logged_in_user
-from ... import data_api_client
+from ... import data_api_client, invitation_cache
 
 
 INVALID_TOKEN_MESSAGE = Markup(
@@ -22,10 +24,25 @@ INVALID_TOKEN_MESSAGE = Markup(
 )
 
 
-@main.route('/create/<string:encoded_token>', methods=["GET"])
-def create_user(encoded_token):
-    token = decode_invitation_token(encoded_token)
+def _invitation_cache_key(encoded_token):
+    return hashlib.sha256(encoded_token.encode("utf-8")).hexdigest()
+
+
+def _invitation_cache_entry(encoded_token):
+    """
+    Returns the (possibly cached) entry for an invitation token: a dict holding the decoded token under "token" and,
+    once it has been looked up, the API's user (or None) for the invited email address under "user_json".
+    """
+    key = _invitation_cache_key(encoded_token)
+    entry = invitation_cache.get(key)
+    if entry is None:
+        entry = {"token": decode_invitation_token(encoded_token)}
+        invitation_cache.set(key, entry)
+    return entry
+
 
+def _invalid_token_response(token, encoded_token):
+    """Returns the error response for an invalid or expired invitation token, or None if the token is valid."""
     if token.get('error') == 'token_invalid':
         current_app.logger.warning(
             "createuser.token_invalid: {encoded_token}",
@@ -52,9 +69,22 @@ def create_user(encoded_token):
             token=None,
             user=None), 400
 
+
+@main.route('/create/<string:encoded_token>', methods=["GET"])
+def create_user(encoded_token):
+    invitation = _invitation_cache_entry(encoded_token)
+    token = invitation["token"]
+
+    error_response = _invalid_token_response(token, encoded_token)
+    if error_response:
+        return error_response
+
+    role = token["role"]
     form = CreateUserForm()
 
-    user_json = data_api_client.get_user(email_address=token["email_address"])
+    if "user_json" not in invitation:
+        invitation["user_json"] = data_api_client.get_user(email_address=token["email_address"])
+    user_json = invitation["user_json"]
 
     if not user_json:
         return render_template(
@@ -78,33 +108,13 @@ def create_user(encoded_token):
 
 @main.route('/create/<string:encoded_token>', methods=["POST"])
 def submit_create_user(encoded_token):
-    token = decode_invitation_token(encoded_token)
+    token = _invitation_cache_entry(encoded_token)["token"]
 
-    if token.get('error') == 'token_invalid':
-        current_app.logger.warning(
-            "createuser.token_invalid: {encoded_token}",
-            extra={'encoded_token': encoded_token}
-        )
-        return render_error_page(
-            status_code=400,
-            error_message=INVALID_TOKEN_MESSAGE.format(support_email=current_app.config['SUPPORT_EMAIL_ADDRESS']),
-        )
+    error_response = _invalid_token_response(token, encoded_token)
+    if error_response:
+        return error_response
 
     role = token["role"]
-
-    if token.get('error') == 'token_expired':
-        current_app.logger.warning(
-            "createuser.token_expired: {encoded_token}",
-            extra={'encoded_token': encoded_token}
-        )
-        return render_template(
-            "auth/create-user-error.html",
-            error=None,
-            support_email_address=current_app.config['SUPPORT_EMAIL_ADDRESS'],
-            role=role,
-            token=None,
-            user=None), 400
-
     form = CreateUserForm()
 
     if not form.validate_on_submit():
@@ -133,6 +143,8 @@ def submit_create_user(encoded_token):
         elif role == 'supplier':
             user_data.update({'supplierId': token['supplier_id']})
 
+        # whether or not this succeeds, the cached "user already exists" result is likely out of date
+        invitation_cache.pop(_invitation_cache_key(encoded_token))
         user_create_response = data_api_client.create_user(user_data)
         user = User.from_json(user_create_response)
         login_user(user)
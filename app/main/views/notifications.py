@@ -12,7 +12,7 @@ from dmutils.forms.helpers import get_errors_from_wtform
 from .. import main
 from ..forms.user_research import UserResearchOptInForm
 from ..helpers.login_helpers import get_user_dashboard_url
-from ... import data_api_client
+from ... import data_api_client, invalidate_cached_user
 
 
 @main.route('/notifications/user-research', methods=["GET", "POST"])
@@ -35,6 +35,7 @@ def user_research_consent():
                 user_research_opted_in=user_research_opt_in,
                 updater=current_user.email_address
             )
+            invalidate_cached_user(current_user.id)
 
             flash("Your preference has been saved", "success")
             return redirect(dashboard_url)
@@ -1,9 +1,13 @@
 # -*- coding: utf-8 -*-
+import hashlib
+from time import monotonic
 
-from flask import current_app, flash, redirect, url_for, Markup, abort
+from flask import current_app, flash, redirect, url_for, Markup
 from flask_login import current_user, login_required
 
-from dmutils.email import DMNotifyClient, generate_token, decode_password_reset_token, EmailError
+from cryptography.fernet import InvalidToken
+from dmutils.email import generate_token, decode_password_reset_token, EmailError
+from dmutils.email.tokens import decode_token
 from dmutils.email.helpers import hash_string
 from dmutils.flask import timed_render_template as render_template
 from dmutils.forms.helpers import get_errors_from_wtform
@@ -11,9 +15,16 @@ from dmutils.user import User
 
 from .. import main
 from ..forms.auth_forms import EmailAddressForm, PasswordResetForm, PasswordChangeForm
-from ..helpers.logging_helpers import log_email_error
+from ..helpers.cache_helpers import cacheable_response
 from ..helpers.login_helpers import get_user_dashboard_url
-from ... import data_api_client
+from ..helpers.timing_helpers import ResponseTimePadder
+from ... import (
+    data_api_client,
+    email_dispatcher,
+    invalidate_cached_user,
+    password_changes,
+    reset_password_token_cache,
+)
 
 
 EMAIL_SENT_MESSAGE = Markup(
@@ -30,10 +41,45 @@ EXPIRED_PASSWORD_RESET_TOKEN_MESSAGE = Markup(
 
 PASSWORD_UPDATED_MESSAGE = "Your password has been successfully changed."
 PASSWORD_NOT_UPDATED_MESSAGE = "Your password could not be updated, due to an error."
-NOTIFY_SANDBOX_ADDRESS = "simulate-delivered@notifications.service.gov.uk"
+
+# To mitigate timing attacks (where a user's existence could be determined by the response time of
+# send_reset_password_email) every branch of the view is padded to the typical time taken by those that send an email.
+reset_password_email_timing = ResponseTimePadder("DM_RESET_PASSWORD_PAD")
+
+
+def _reset_password_token_cache_key(token):
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _decode_password_reset_token(token, cached=True):
+    # valid tokens are cached along with when their user's password was last changed through the app, so that showing
+    # the reset page and resetting the password only fetch the user from the API once. an entry is only used while
+    # that's unchanged - where password_changes aren't shared by the workers, anything acting on a token must pass
+    # cached=False, as it may have been used through another.
+    key = _reset_password_token_cache_key(token)
+    entry = reset_password_token_cache.get(key) if cached else None
+    if entry is not None:
+        decoded, password_changed_at = entry
+        if password_changed_at == password_changes.changed_at(decoded["user"]):
+            return decoded
+
+    try:
+        # just decrypted - before the user is fetched, so a change made meanwhile isn't missed
+        user_id = decode_token(
+            token, current_app.config['SHARED_EMAIL_KEY'], current_app.config['RESET_PASSWORD_TOKEN_NS']
+        )[0]["user"]
+    except InvalidToken:
+        user_id = None
+    password_changed_at = password_changes.changed_at(user_id) if user_id is not None else None
+
+    decoded = decode_password_reset_token(token, data_api_client)
+    if 'error' not in decoded and password_changed_at is not None:
+        reset_password_token_cache.set(key, (decoded, password_changed_at))
+    return decoded
 
 
 @main.route('/reset-password', methods=["GET"])
+@cacheable_response
 def request_password_reset():
     form = EmailAddressForm()
     errors = get_errors_from_wtform(form)
@@ -44,11 +90,11 @@ def request_password_reset():
 
 @main.route('/reset-password', methods=["POST"])
 def send_reset_password_email():
+    start_time = monotonic()
     form = EmailAddressForm()
     if form.validate_on_submit():
         email_address = form.email_address.data
         user_json = data_api_client.get_user(email_address=email_address)
-        notify_client = DMNotifyClient(current_app.config['DM_NOTIFY_API_KEY'])
 
         if user_json is not None:
             user = User.from_json(user_json)
@@ -73,80 +119,62 @@ def send_reset_password_email():
                 )
 
                 try:
-                    notify_client.send_email(
+                    outcome = email_dispatcher.send_email(
                         user.email_address,
                         template_name_or_id=current_app.config['NOTIFY_TEMPLATES']['reset_password'],
                         personalisation={
                             'url': url_for('main.reset_password', token=token, _external=True),
                         },
                         reference='reset-password-{}'.format(hash_string(user.email_address)),
+                        email_type="Password reset",
+                        error_code="login.reset-email.notify-error",
                     )
-                except EmailError as exc:
-                    log_email_error(
-                        exc,
-                        "Password reset",
-                        "login.reset-email.notify-error",
-                        user.email_address,
+                except EmailError:
+                    # already logged by the dispatcher. respond as if it had been sent, as anything else would
+                    # reveal that the account exists
+                    pass
+                else:
+                    reset_password_email_timing.record(start_time)
+                    current_app.logger.info(
+                        "{code}: Password reset email {outcome} for email_hash {email_hash}",
+                        extra={
+                            'email_hash': hash_string(user.email_address),
+                            'outcome': outcome,
+                            'code': 'login.reset-email.sent'
+                        }
                     )
-                    abort(503, "Failed to send password reset email.")
-
-                current_app.logger.info(
-                    "{code}: Sent password reset email for email_hash {email_hash}",
-                    extra={
-                        'email_hash': hash_string(user.email_address),
-                        'code': 'login.reset-email.sent'
-                    }
-                )
             else:
                 try:
-                    notify_client.send_email(
+                    outcome = email_dispatcher.send_email(
                         user.email_address,
                         template_name_or_id=current_app.config['NOTIFY_TEMPLATES']['reset_password_inactive'],
                         reference='reset-password-inactive-{}'.format(hash_string(user.email_address)),
+                        email_type="Password reset (inactive user)",
+                        error_code="login.reset-email-inactive.notify-error",
                     )
-                except EmailError as exc:
-                    log_email_error(
-                        exc,
-                        "Password reset (inactive user)",
-                        "login.reset-email-inactive.notify-error",
-                        user.email_address,
+                except EmailError:
+                    # as above
+                    pass
+                else:
+                    reset_password_email_timing.record(start_time)
+                    current_app.logger.warning(
+                        "{code}: Password (non-)reset email {outcome} for inactive user email_hash {email_hash}",
+                        extra={
+                            'email_hash': hash_string(user.email_address),
+                            'outcome': outcome,
+                            'code': 'login.reset-email-inactive.sent',
+                        }
                     )
-                    abort(503, "Failed to send password reset email.")
-
-                current_app.logger.warning(
-                    "{code}: Sent password (non-)reset email for inactive user email_hash {email_hash}",
-                    extra={
-                        'email_hash': hash_string(user.email_address),
-                        'code': 'login.reset-email-inactive.sent',
-                    }
-                )
         else:
-            # Send a email to the Notify sandbox using the 'inactive' template, to mitigate any timing attacks (where
-            # a user's existence could be determined by the response time of this view). Any errors are also handled
-            # in the same way as for inactive users.
-            try:
-                notify_client.send_email(
-                    NOTIFY_SANDBOX_ADDRESS,
-                    template_name_or_id=current_app.config['NOTIFY_TEMPLATES']['reset_password_inactive'],
-                    reference='reset-password-nonexistent-user-{}'.format(hash_string(email_address)),
-                )
-            except EmailError as exc:
-                log_email_error(
-                    exc,
-                    "Password reset (non-existent user)",
-                    "login.reset-email-nonexistent.notify-error",
-                    email_address,  # Hashed by the helper function
-                )
-                abort(503, "Failed to send password reset email.")
-
             current_app.logger.info(
-                "{code}: Sent password (non-)reset email for invalid user email_hash {email_hash}",
+                "{code}: Password reset requested for invalid user email_hash {email_hash}",
                 extra={
                     'email_hash': hash_string(email_address),
                     'code': 'login.reset-email.invalid-email'
                 }
             )
 
+        reset_password_email_timing.pad(start_time)
         flash(EMAIL_SENT_MESSAGE.format(support_email=current_app.config['SUPPORT_EMAIL_ADDRESS']), "success")
         return redirect(url_for('.request_password_reset'))
     else:
@@ -157,7 +185,7 @@ def send_reset_password_email():
 
 @main.route('/reset-password/<token>', methods=["GET"])
 def reset_password(token):
-    decoded = decode_password_reset_token(token, data_api_client)
+    decoded = _decode_password_reset_token(token)
     if 'error' in decoded:
         flash(EXPIRED_PASSWORD_RESET_TOKEN_MESSAGE, "error")
         return redirect(url_for('.request_password_reset'))
@@ -176,7 +204,7 @@ def reset_password(token):
 @main.route('/reset-password/<token>', methods=["POST"])
 def update_password(token):
     form = PasswordResetForm()
-    decoded = decode_password_reset_token(token, data_api_client)
+    decoded = _decode_password_reset_token(token, cached=password_changes.shared)
     if 'error' in decoded:
         flash(EXPIRED_PASSWORD_RESET_TOKEN_MESSAGE, "error")
         return redirect(url_for('.request_password_reset'))
@@ -187,6 +215,8 @@ def update_password(token):
 
     if form.validate_on_submit():
         if data_api_client.update_user_password(user_id, password, email_address):
+            invalidate_cached_user(user_id)
+            password_changes.record(user_id)
             current_app.logger.info(
                 "User {user_id} successfully changed their password",
                 extra={'user_id': user_id})
@@ -213,13 +243,14 @@ def change_password():
         response = data_api_client.update_user_password(current_user.id, form.password.data,
                                                         updater=current_user.email_address)
         if response:
+            invalidate_cached_user(current_user.id)
+            # any reset tokens cached for this user were issued before this change, so are no longer valid
+            password_changes.record(current_user.id)
             current_app.logger.info(
                 "User {user_id} successfully changed their password",
                 extra={'user_id': current_user.id}
             )
 
-            notify_client = DMNotifyClient(current_app.config['DM_NOTIFY_API_KEY'])
-
             token = generate_token(
                 {
                     "user": current_user.id
@@ -229,30 +260,29 @@ def change_password():
             )
 
             try:
-                notify_client.send_email(
+                outcome = email_dispatcher.send_email(
                     current_user.email_address,
                     template_name_or_id=current_app.config['NOTIFY_TEMPLATES']['change_password_alert'],
                     personalisation={
                         'url': url_for('main.reset_password', token=token, _external=True),
                     },
-                    reference='change-password-alert-{}'.format(hash_string(current_user.email_address))
+                    reference='change-password-alert-{}'.format(hash_string(current_user.email_address)),
+                    email_type="Password change alert",
+                    error_code="login.password-change-alert-email.notify-error",
                 )
 
                 current_app.logger.info(
-                    "{code}: Password change alert email sent for email_hash {email_hash}",
+                    "{code}: Password change alert email {outcome} for email_hash {email_hash}",
                     extra={
                         'email_hash': hash_string(current_user.email_address),
+                        'outcome': outcome,
                         'code': 'login.password-change-alert-email.sent'
                     }
                 )
 
-            except EmailError as exc:
-                log_email_error(
-                    exc,
-                    "Password change alert",
-                    "login.password-change-alert-email.notify-error",
-                    current_user.email_address
-                )
+            except EmailError:
+                # already logged by the dispatcher, and the password has been changed so there's nothing more to do
+                pass
 
             flash(PASSWORD_UPDATED_MESSAGE, "success")
         else:
@@ -1,12 +1,52 @@
-from flask import request
+from flask import current_app, jsonify, request
 
 from .. import main
-from ... import data_api_client
+from ... import data_api_client, dependency_prober
+from ...prewarm import warm_state
 from dmutils.status import get_app_status
 
 
+def probe_dependencies():
+    return data_api_client.get_status()
+
+
+def app_status(ignore_dependencies):
+    # the Data API's status is probed by dependency_prober, in the background if DM_STATUS_PROBE_INTERVAL is set
+    return get_app_status(data_api_client=dependency_prober,
+                          search_api_client=None,
+                          ignore_dependencies=ignore_dependencies,
+                          additional_checks_extended=[dependency_prober.status_age])
+
+
+def liveness_status():
+    """Whether the app is running at all - no dependencies are checked"""
+    return get_app_status(ignore_dependencies=True)
+
+
+def readiness_status():
+    """Whether the app can serve requests (its dependencies are up), and whether its caches are warm"""
+    api_status, age = dependency_prober.get()
+    ready = api_status["status"].lower() == "ok"
+    return jsonify(
+        status="ok" if ready else "error",
+        api_status=api_status,
+        dependencies_checked_seconds_ago=round(age, 1),
+        warm=warm_state(current_app),
+    ), 200 if ready else 503
+
+
+# all normally served by FastPathMiddleware, which calls the status functions directly
+
 @main.route('/_status')
 def status():
-    return get_app_status(data_api_client=data_api_client,
-                          search_api_client=None,
-                          ignore_dependencies='ignore-dependencies' in request.args)
+    return app_status(ignore_dependencies='ignore-dependencies' in request.args)
+
+
+@main.route('/_status/live')
+def status_live():
+    return liveness_status()
+
+
+@main.route('/_status/ready')
+def status_ready():
+    return readiness_status()
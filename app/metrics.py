@@ -1,9 +1,140 @@
-from flask import Blueprint
+from threading import Lock
+from time import monotonic
+
+from flask import Blueprint, g, request
 from dmutils.metrics import DMGDSMetrics
+from gds_metrics.metrics import (
+    Counter,
+    Gauge,
+    Histogram,
+    HTTP_SERVER_REQUEST_DURATION_SECONDS,
+    HTTP_SERVER_REQUESTS_TOTAL,
+)
+
+from .multiprocess_metrics import init_registry
+
+
+HTTP_SERVER_SERIES_OVERFLOW_TOTAL = Counter(
+    'http_server_series_overflow_total',
+    'Total requests counted under "other" labels as http_server_* metrics already had too many label sets',
+)
+
+
+class BoundedGDSMetrics(DMGDSMetrics):
+    """
+    `DMGDSMetrics` which keeps the number of `http_server_requests_total` and `http_server_request_duration_seconds`
+    series bounded however requests are made. Like gds-metrics, requests are labelled by the matched route's template
+    (`/user/reset-password/<token>`, not the path) or `UNMATCHED_PATH`. Unusual HTTP methods and hosts other than
+    `DM_HTTP_METRICS_HOSTS` are labelled "other", and once `DM_HTTP_METRICS_MAX_SERIES` label sets have been seen by a
+    process, any new label sets are recorded as "other" as well.
+    """
+
+    UNMATCHED_PATH = 'No endpoint'
+    OVERFLOW_LABEL = 'other'
+    KNOWN_METHODS = frozenset(('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'))
+
+    def __init__(self):
+        super().__init__()
+        self.max_series = None
+        self.hosts = frozenset()
+        self._label_sets = set()
+        self._lock = Lock()
+
+    def init_app(self, app):
+        super().init_app(app)
+        self.max_series = app.config['DM_HTTP_METRICS_MAX_SERIES']
+        self.hosts = frozenset(app.config['DM_HTTP_METRICS_HOSTS'])
+        if not self.hosts:
+            app.logger.warning('DM_HTTP_METRICS_HOSTS is not set, so all requests will be labelled with host "other"')
+        with self._lock:
+            self._label_sets = set()
+
+    def labels(self, method, host, path, code):
+        labels = (
+            method if method in self.KNOWN_METHODS else self.OVERFLOW_LABEL,
+            host if host in self.hosts else self.OVERFLOW_LABEL,
+            path,
+            code,
+        )
+        with self._lock:
+            if labels in self._label_sets:
+                return labels
+            if self.max_series is None or len(self._label_sets) < self.max_series:
+                self._label_sets.add(labels)
+                return labels
+
+        HTTP_SERVER_SERIES_OVERFLOW_TOTAL.inc()
+        return (labels[0], self.OVERFLOW_LABEL, self.OVERFLOW_LABEL, code)
+
+    def observe_request(self, method, host, path, code, duration):
+        labels = self.labels(method, host, path, code)
+        HTTP_SERVER_REQUEST_DURATION_SECONDS.labels(*labels).observe(duration)
+        HTTP_SERVER_REQUESTS_TOTAL.labels(*labels).inc()
+
+    def teardown_request(self, sender, response, *args, **kwargs):
+        self.observe_request(
+            request.method,
+            request.host,
+            request.url_rule.rule if request.url_rule else self.UNMATCHED_PATH,
+            response.status_code,
+            monotonic() - g._gds_metrics_start_time,
+        )
+        return response
 
 
 metrics = Blueprint('metrics', __name__)
 
-gds_metrics = DMGDSMetrics()
+gds_metrics = BoundedGDSMetrics()
+init_registry(gds_metrics)
 
 metrics.add_url_rule(gds_metrics.metrics_path, 'metrics', gds_metrics.metrics_endpoint)
+
+
+CACHE_HITS_TOTAL = Counter(
+    'cache_hits_total',
+    'Total in-process cache hits',
+    ['cache']
+)
+
+CACHE_MISSES_TOTAL = Counter(
+    'cache_misses_total',
+    'Total in-process cache misses',
+    ['cache']
+)
+
+NOTIFY_REQUEST_DURATION_SECONDS = Histogram(
+    'notify_request_duration_seconds',
+    'Notify API request duration in seconds',
+    ['method', 'code']
+)
+
+DATA_API_REQUEST_DURATION_SECONDS = Histogram(
+    'data_api_request_duration_seconds',
+    'Data API request duration in seconds',
+    ['method', 'endpoint', 'code']
+)
+
+DATA_API_REQUESTS_IN_FLIGHT = Gauge(
+    'data_api_requests_in_flight',
+    'Data API requests currently waiting on a response',
+    ['method', 'endpoint'],
+    multiprocess_mode='livesum'
+)
+
+REQUEST_PHASE_DURATION_SECONDS = Histogram(
+    'request_phase_duration_seconds',
+    'Time spent in each phase of handling requests (see app.request_phases) in seconds',
+    ['endpoint', 'phase', 'operation']
+)
+
+SESSION_SAVES_TOTAL = Counter(
+    'session_saves_total',
+    'Total sessions saved at the end of a request, by whether they were written or skipped as unmodified',
+    ['outcome']
+)
+
+LOGIN_THROTTLE_CHECKS_TOTAL = Counter(
+    'login_throttle_checks_total',
+    'Total login attempts checked by the login throttle (see app.throttling), by outcome',
+    ['outcome']
+)
@@ -0,0 +1,83 @@
+"""
+Housekeeping for prometheus_client's multiprocess mode, in which each worker process writes its metrics to mmapped
+`<type>_<pid>.db` files in the `prometheus_multiproc_dir` directory and `_metrics` aggregates all the files there.
+
+Left alone, the files of dead workers (recycled by the server, say) pile up, and every scrape reads all of them. So
+before each scrape the counters, histograms and summaries of dead workers are added into a single `<type>_archived.db`
+file per type, keeping totals monotonic, and their gauge files are removed - in every `multiprocess_mode`, as a dead
+worker's gauges no longer describe anything. A lock file serialises this against concurrent scrapes, so no scrape sees
+a dead worker's values counted twice or not at all.
+"""
+import fcntl
+import glob
+import os
+
+from prometheus_client import CollectorRegistry
+from prometheus_client.core import _MmapedDict
+from prometheus_client.multiprocess import MultiProcessCollector
+
+
+ARCHIVED_FILE_TYPES = ("counter", "histogram", "summary")
+LOCK_FILENAME = ".lock"
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _dead_process_files(path):
+    """(type, filename) of each metrics file written by a process which is no longer running"""
+    for filename in glob.glob(os.path.join(path, "*.db")):
+        typ, _, pid = os.path.basename(filename)[:-len(".db")].rpartition("_")
+        if pid.isdigit() and int(pid) != os.getpid() and not _pid_alive(int(pid)):
+            yield typ, filename
+
+
+def archive_dead_process_files(path):
+    """Add the counters, histograms and summaries of dead processes into the archive files, removing their files and
+    those of their gauges. Call with the lock held exclusively."""
+    archives = {}
+    try:
+        for typ, filename in _dead_process_files(path):
+            if typ in ARCHIVED_FILE_TYPES:
+                if typ not in archives:
+                    archives[typ] = _MmapedDict(os.path.join(path, f"{typ}_archived.db"))
+                dead = _MmapedDict(filename, read_mode=True)
+                for key, value in dead.read_all_values():
+                    archives[typ].write_value(key, archives[typ].read_value(key) + value)
+                dead.close()
+                os.remove(filename)
+            elif typ.startswith("gauge_"):
+                os.remove(filename)
+    finally:
+        for archive in archives.values():
+            archive.close()
+
+
+class ArchivingMultiProcessCollector(MultiProcessCollector):
+    """`MultiProcessCollector` which archives the files of dead processes before collecting"""
+
+    def collect(self):
+        with open(os.path.join(self._path, LOCK_FILENAME), "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # another worker is archiving - wait for it to finish, then collect
+                pass
+            else:
+                archive_dead_process_files(self._path)
+
+            fcntl.flock(lock_file, fcntl.LOCK_SH)
+            return list(super().collect())
+
+
+def init_registry(gds_metrics):
+    """Give `gds_metrics` a registry collecting with `ArchivingMultiProcessCollector`, in place of gds-metrics' own"""
+    gds_metrics.registry = CollectorRegistry()
+    ArchivingMultiProcessCollector(gds_metrics.registry)
@@ -0,0 +1,270 @@
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import os
+from threading import Lock, Thread
+import time
+
+from flask import current_app
+from notifications_python_client.errors import HTTPError
+from notifications_python_client.notifications import NotificationsAPIClient
+import requests
+from requests.adapters import HTTPAdapter
+
+from cryptography.fernet import InvalidToken
+from dmutils.email import DMNotifyClient, EmailError, generate_token
+from dmutils.email.exceptions import EmailTemplateError
+from dmutils.email.tokens import decode_token, ONE_DAY_IN_SECONDS
+
+from .metrics import NOTIFY_REQUEST_DURATION_SECONDS
+from .request_phases import timed_phase
+
+
+logger = logging.getLogger(__name__)
+
+
+# moves emails claimed by consumers (in the processing list KEYS[2]) more than ARGV[2] seconds before ARGV[1] back onto
+# the queue KEYS[1], to be sent next. the times they were claimed are in the hash KEYS[3] - an email without one was
+# claimed by a consumer which died before recording it, so is timed from now. returns the number of emails requeued.
+REQUEUE_ABANDONED_SCRIPT = """
+local now = tonumber(ARGV[1])
+local requeued = 0
+for _, email in ipairs(redis.call("LRANGE", KEYS[2], 0, -1)) do
+    local claimed_at = tonumber(redis.call("HGET", KEYS[3], email))
+    if not claimed_at then
+        redis.call("HSET", KEYS[3], email, ARGV[1])
+    elseif now - claimed_at > tonumber(ARGV[2]) then
+        redis.call("LREM", KEYS[2], 1, email)
+        redis.call("HDEL", KEYS[3], email)
+        redis.call("RPUSH", KEYS[1], email)
+        requeued = requeued + 1
+    end
+end
+return requeued
+"""
+
+
+class PooledNotificationsAPIClient(NotificationsAPIClient):
+    """
+    Notify API client making its requests through a persistent `requests.Session`, so that connections (and TLS
+    sessions) are kept alive and reused rather than set up for every email. Also records the duration of each request
+    in `notify_request_duration_seconds`.
+    """
+
+    def configure(self, pool_size, timeout):
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _perform_request(self, method, url, kwargs):
+        start_time = time.perf_counter()
+        status_code = "error"
+        try:
+            response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+            status_code = response.status_code
+            response.raise_for_status()
+            return response
+        except requests.RequestException as e:
+            api_error = HTTPError.create(e)
+            logger.error(
+                "API {} request on {} failed with {} '{}'".format(method, url, api_error.status_code, api_error.message)
+            )
+            raise api_error
+        finally:
+            NOTIFY_REQUEST_DURATION_SECONDS.labels(method, status_code).observe(time.perf_counter() - start_time)
+
+
+class PooledDMNotifyClient(DMNotifyClient):
+    _client_class = PooledNotificationsAPIClient
+
+    def __init__(self, *args, pool_size, timeout, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.client.configure(pool_size, timeout)
+
+    def send_email(self, to_email_address, *args, **kwargs):
+        # timed as the "notify" request phase, by the template's name in NOTIFY_TEMPLATES where it has one
+        template_name_or_id = kwargs["template_name_or_id"] if "template_name_or_id" in kwargs else args[0]
+        template_names = {v: k for k, v in current_app.config["NOTIFY_TEMPLATES"].items()}
+        with timed_phase("notify", template_names.get(template_name_or_id, template_name_or_id)):
+            return super().send_email(to_email_address, *args, **kwargs)
+
+
+class EmailDispatcher:
+    """
+    Sends Notify emails on behalf of views.
+
+    If `DM_NOTIFY_ASYNC` is set, `send_email` only queues the email - onto a Redis list shared by all workers if
+    `DM_REDIS_SERVICE_NAME` is set, otherwise onto an in-process thread pool - and returns immediately. Queued emails
+    are retried with exponential backoff, and emails that still fail to send are logged with `log_email_error`.
+
+    Emails queued in Redis are encrypted with the app's `SECRET_KEY`, as they include reset links. Each worker's
+    threads consuming them are started by `init_app`, or after forking from a preloaded app. A consumer moves the email
+    it's sending onto a processing list, and only removes it from there once it's been sent (or has failed) - emails
+    left there for `DM_NOTIFY_DISPATCH_VISIBILITY_TIMEOUT` seconds, by a worker which died while sending them, are
+    queued again. So emails are sent at least once. Emails queued in-process are sent at most once - they're lost if the
+    worker is stopped before sending them.
+
+    Otherwise emails are sent synchronously, once, and `EmailError`s are logged then re-raised so the view can respond
+    accordingly.
+
+    Either way emails are sent through a single `PooledDMNotifyClient`, created on first use.
+    """
+
+    def __init__(self):
+        self._app = None
+        self._notify_client = None
+        self._executor = None
+        self._redis = None
+        self._redis_consumer_pid = None
+        self._lock = Lock()
+        if hasattr(os, "register_at_fork"):
+            # so that worker processes forked from a preloaded app consume the queue without waiting for an email
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def init_app(self, app):
+        self._app = app
+        self.asynchronous = app.config["DM_NOTIFY_ASYNC"]
+        self.threads = app.config["DM_NOTIFY_DISPATCH_THREADS"]
+        self.retries = app.config["DM_NOTIFY_DISPATCH_RETRIES"]
+        self.retry_backoff = app.config["DM_NOTIFY_DISPATCH_RETRY_BACKOFF"]
+        self.redis_key = app.config["DM_NOTIFY_DISPATCH_REDIS_KEY"]
+        self.processing_redis_key = f"{self.redis_key}:processing"
+        self.claimed_at_redis_key = f"{self.redis_key}:claimed-at"
+        self.visibility_timeout = app.config["DM_NOTIFY_DISPATCH_VISIBILITY_TIMEOUT"]
+
+        self._notify_client = None
+        self._executor = None
+        self._redis = None
+        self._redis_consumer_pid = None
+        if self.asynchronous and app.config.get("DM_REDIS_SERVICE_NAME"):
+            # the session store's client, set up by dmutils.session
+            self._redis = app.config["SESSION_REDIS"]
+            self._requeue_abandoned = self._redis.register_script(REQUEUE_ABANDONED_SCRIPT)
+            # started now rather than on the first send, so emails left queued by a previous deploy are sent
+            self._start_redis_consumers()
+
+    def send_email(self, to_email_address, *, email_type, error_code, **send_email_kwargs):
+        """
+        Send (or queue) an email, returning "sent" or "queued". `send_email_kwargs` are passed on to
+        `DMNotifyClient.send_email`, `email_type` and `error_code` are used to log the failure if the email can't be
+        sent.
+        """
+        email = {
+            "to_email_address": to_email_address,
+            "send_email_kwargs": send_email_kwargs,
+            "email_type": email_type,
+            "error_code": error_code,
+        }
+
+        if not self.asynchronous:
+            self._send(email, retries=0, reraise=True)
+            return "sent"
+
+        if self._redis is not None:
+            self._start_redis_consumers()
+            # pushed onto the left of the list, and consumed from the right
+            self._redis.lpush(
+                self.redis_key,
+                generate_token(email, self._app.config["SECRET_KEY"], self._app.config["NOTIFY_DISPATCH_TOKEN_NS"]),
+            )
+        else:
+            self._get_executor().submit(self._send_in_app_context, email)
+        return "queued"
+
+    @property
+    def notify_client(self):
+        # created on first use, so that an app without DM_NOTIFY_API_KEY configured can still start
+        with self._lock:
+            if self._notify_client is None:
+                config = self._app.config
+                with self._app.app_context():
+                    self._notify_client = PooledDMNotifyClient(
+                        config["DM_NOTIFY_API_KEY"],
+                        config["DM_NOTIFY_BASE_URL"],
+                        pool_size=config["DM_NOTIFY_POOL_SIZE"],
+                        timeout=(config["DM_NOTIFY_CONNECT_TIMEOUT"], config["DM_NOTIFY_READ_TIMEOUT"]),
+                    )
+            return self._notify_client
+
+    def _get_executor(self):
+        # created on first use so that worker processes forked from a preloaded app don't inherit a dead pool
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="notify-dispatch")
+            return self._executor
+
+    def _after_fork(self):
+        # the lock may have been held by another thread of the parent
+        self._lock = Lock()
+        self._start_redis_consumers()
+
+    def _start_redis_consumers(self):
+        # once in each process
+        with self._lock:
+            if self._redis is not None and self._redis_consumer_pid != os.getpid():
+                self._redis_consumer_pid = os.getpid()
+                for _ in range(self.threads):
+                    Thread(target=self._consume_redis_queue, name="notify-dispatch", daemon=True).start()
+
+    def _consume_redis_queue(self):
+        requeue_abandoned_at = 0
+        while True:
+            try:
+                if time.monotonic() >= requeue_abandoned_at:
+                    requeue_abandoned_at = time.monotonic() + self.visibility_timeout / 2
+                    self._requeue_abandoned(
+                        keys=[self.redis_key, self.processing_redis_key, self.claimed_at_redis_key],
+                        args=[time.time(), self.visibility_timeout],
+                    )
+                self._consume_redis_email()
+            except Exception:
+                self._app.logger.exception("Failed to read from Notify dispatch queue")
+                time.sleep(self.retry_backoff)
+
+    def _consume_redis_email(self):
+        token = self._redis.brpoplpush(self.redis_key, self.processing_redis_key, timeout=5)
+        if token is None:
+            return
+        # wall clock time, as it's compared with the time in other processes
+        self._redis.hset(self.claimed_at_redis_key, token, time.time())
+
+        try:
+            email, _ = decode_token(
+                token.decode("utf-8"),
+                self._app.config["SECRET_KEY"],
+                self._app.config["NOTIFY_DISPATCH_TOKEN_NS"],
+                max_age_in_seconds=ONE_DAY_IN_SECONDS,
+            )
+        except InvalidToken:
+            self._app.logger.error("Dropped a Notify dispatch queue item which couldn't be decrypted")
+        else:
+            self._send_in_app_context(email)
+
+        self._redis.lrem(self.processing_redis_key, 1, token)
+        self._redis.hdel(self.claimed_at_redis_key, token)
+
+    def _send_in_app_context(self, email):
+        with self._app.app_context():
+            self._send(email, retries=self.retries)
+
+    def _send(self, email, retries, reraise=False):
+        # imported here as the views (which import this module via `app`) are imported by `app.main`
+        from .main.helpers.logging_helpers import log_email_error
+
+        for attempt in range(retries + 1):
+            try:
+                self.notify_client.send_email(email["to_email_address"], **email["send_email_kwargs"])
+                return
+            except EmailTemplateError as exc:
+                # no point retrying this
+                error = exc
+                break
+            except EmailError as exc:
+                error = exc
+                if attempt < retries:
+                    time.sleep(self.retry_backoff * 2 ** attempt)
+
+        log_email_error(error, email["email_type"], email["error_code"], email["to_email_address"])
+        if reraise:
+            raise error
@@ -0,0 +1,64 @@
+from threading import Lock
+from time import time
+
+from flask import current_app
+
+
+class PasswordChanges:
+    """
+    Records when each user's password was last changed through the app, so that decoded password reset tokens cached
+    in-process (see `reset_password_token_cache`) can be checked for having been cached before a later change - made
+    through any worker - without asking the API.
+
+    The times are kept in Redis, shared by all workers, if `DM_REDIS_SERVICE_NAME` is set (`shared` is then true),
+    otherwise in-process, where other workers can't see them. They only need to outlive the cached tokens, so expire
+    `DM_RESET_PASSWORD_TOKEN_CACHE_TTL` seconds after the change.
+    """
+
+    def __init__(self):
+        self.ttl = 0
+        self.key_prefix = None
+        self._redis = None
+        self._changed_at = {}
+        self._lock = Lock()
+
+    def init_app(self, app):
+        self.ttl = app.config["DM_RESET_PASSWORD_TOKEN_CACHE_TTL"]
+        self.key_prefix = app.config["DM_PASSWORD_CHANGES_REDIS_KEY_PREFIX"]
+        # the session store's client, set up by dmutils.session
+        self._redis = app.config["SESSION_REDIS"] if app.config.get("DM_REDIS_SERVICE_NAME") else None
+        with self._lock:
+            self._changed_at = {}
+
+    @property
+    def shared(self):
+        return self._redis is not None
+
+    def changed_at(self, user_id):
+        """
+        When `user_id`'s password was last changed, as an opaque string - "" if no change has been recorded - or None
+        if that can't be found out.
+        """
+        if self._redis is None:
+            with self._lock:
+                return self._changed_at.get(user_id, "")
+
+        try:
+            changed_at = self._redis.get(f"{self.key_prefix}{user_id}")
+        except Exception:
+            current_app.logger.exception("reset-password.password-changes.error: failed to check password changes")
+            return None
+        return changed_at.decode("utf-8") if changed_at else ""
+
+    def record(self, user_id):
+        changed_at = repr(time())
+        if self._redis is None:
+            with self._lock:
+                self._changed_at[user_id] = changed_at
+            return
+
+        try:
+            self._redis.set(f"{self.key_prefix}{user_id}", changed_at, ex=max(1, self.ttl))
+        except Exception:
+            # other workers will accept the user's cached reset tokens until they expire from the cache
+            current_app.logger.exception("reset-password.password-changes.error: failed to record password change")
@@ -0,0 +1,84 @@
+import logging
+import os
+
+from dmutils.timing import logged_duration
+
+
+PREWARM_TEMPLATE_EXTENSIONS = ("html", "njk")
+PREWARM_ASSET_EXTENSIONS = (".css", ".js")
+
+
+def prewarm_password_blocklist(app):
+    from .main.forms.auth_forms import NotInPasswordBlocklist
+
+    return len(NotInPasswordBlocklist.get_blocklist_set())
+
+
+def prewarm_templates(app):
+    """Load (and so translate and compile) our templates and the govuk-frontend/DM templates they might import"""
+    template_names = [
+        name for name in app.jinja_env.list_templates(extensions=PREWARM_TEMPLATE_EXTENSIONS)
+        if not name.startswith("node_modules/") and "/node_modules/" not in name
+    ]
+    for name in template_names:
+        try:
+            app.jinja_env.get_template(name)
+        except Exception as e:
+            # some templates shipped in the frontend packages (e.g. examples) aren't usable by us - not a problem, and
+            # prewarming shouldn't stop the app starting anyway
+            app.logger.debug("Could not prewarm template {template_name}: {error}",
+                             extra={"template_name": name, "error": str(e)})
+
+    return len(template_names)
+
+
+def prewarm_asset_fingerprints(app):
+    asset_fingerprinter = app.config["BASE_TEMPLATE_DATA"]["asset_fingerprinter"]
+    static_folder = app.static_folder
+
+    asset_paths = [
+        os.path.relpath(os.path.join(dirpath, filename), static_folder)
+        for dirpath, _, filenames in os.walk(static_folder)
+        for filename in filenames
+        if filename.endswith(PREWARM_ASSET_EXTENSIONS)
+    ]
+    for asset_path in asset_paths:
+        asset_fingerprinter.get_url(asset_path)
+
+    return len(asset_paths)
+
+
+PREWARM_STEPS = (
+    ("password_blocklist", prewarm_password_blocklist),
+    ("templates", prewarm_templates),
+    ("asset_fingerprints", prewarm_asset_fingerprints),
+)
+
+
+def warm_state(app):
+    """Whether the password blocklist has been loaded and the templates compiled, as reported by `_status/ready`"""
+    from .main.forms.auth_forms import NotInPasswordBlocklist
+
+    return {
+        "password_blocklist": NotInPasswordBlocklist.blocklist_loaded(),
+        "templates": "templates" in app.extensions.get("prewarmed", ()),
+    }
+
+
+def prewarm(app):
+    """
+    Build the structures that would otherwise be built lazily by the first requests a worker serves. Enabled by
+    setting `DM_PREWARM`.
+    """
+    prewarmed = app.extensions.setdefault("prewarmed", set())
+    with app.app_context():
+        for step, prewarm_function in PREWARM_STEPS:
+            with logged_duration(
+                logger=app.logger,
+                message="Prewarmed {prewarm_step} ({prewarm_count} items) in {duration_real}s",
+                log_level=logging.INFO,
+                condition=True,
+            ) as log_context:
+                log_context.update(prewarm_step=step, prewarm_count=None)
+                log_context["prewarm_count"] = prewarm_function(app)
+            prewarmed.add(step)
@@ -0,0 +1,99 @@
+import cProfile
+import os
+import random
+import re
+import uuid
+
+from itsdangerous import BadSignature, TimestampSigner
+from werkzeug.exceptions import HTTPException
+
+
+PROFILE_HEADER_SALT = "dm-request-profile"
+PROFILE_HEADER_VALUE = "profile"
+
+
+def profile_header_signer(signing_key):
+    return TimestampSigner(signing_key, salt=PROFILE_HEADER_SALT)
+
+
+class RequestProfiler:
+    """
+    WSGI middleware profiling whole requests - before_request hooks, loading the user, the view and rendering - with
+    cProfile, for a `DM_PROFILE_SAMPLE_RATE` fraction of requests and for requests with a `DM_PROFILE_HEADER` header
+    signed with `DM_PROFILE_SIGNING_KEY` (see `scripts/sign-profile-header.py`) in the last
+    `DM_PROFILE_HEADER_MAX_AGE` seconds.
+
+    Profiles are written to `DM_PROFILE_DIR` as `<endpoint>.<request id>.prof`, for `pstats` or snakeviz.
+    """
+
+    def __init__(self, app, wsgi_app):
+        self.wsgi_app = wsgi_app
+        self.url_map = app.url_map
+        self.profile_dir = app.config["DM_PROFILE_DIR"]
+        self.sample_rate = app.config["DM_PROFILE_SAMPLE_RATE"] or 0
+        self.header_environ_key = "HTTP_" + app.config["DM_PROFILE_HEADER"].upper().replace("-", "_")
+        self.header_max_age = app.config["DM_PROFILE_HEADER_MAX_AGE"]
+        self.request_id_header = app.config["DM_REQUEST_ID_HEADER"]
+        signing_key = app.config["DM_PROFILE_SIGNING_KEY"]
+        self.header_signer = profile_header_signer(signing_key) if signing_key else None
+
+    def should_profile(self, environ):
+        if self.sample_rate and random.random() < self.sample_rate:
+            return True
+
+        header = environ.get(self.header_environ_key)
+        if header and self.header_signer is not None:
+            try:
+                return self.header_signer.unsign(header, max_age=self.header_max_age) == PROFILE_HEADER_VALUE.encode()
+            except BadSignature:
+                return False
+        return False
+
+    def __call__(self, environ, start_response):
+        if not self.should_profile(environ):
+            return self.wsgi_app(environ, start_response)
+
+        response_headers = []
+        response_body = []
+
+        def recording_start_response(status, headers, exc_info=None):
+            response_headers.extend(headers)
+            return start_response(status, headers, exc_info)
+
+        def run_app():
+            app_iter = self.wsgi_app(environ, recording_start_response)
+            try:
+                response_body.extend(app_iter)
+            finally:
+                if hasattr(app_iter, "close"):
+                    app_iter.close()
+
+        profile = cProfile.Profile()
+        try:
+            profile.runcall(run_app)
+        finally:
+            request_id = dict((name.lower(), value) for name, value in response_headers).get(
+                self.request_id_header.lower()
+            )
+            self.write_profile(profile, self._endpoint(environ), request_id or uuid.uuid4().hex)
+
+        return response_body
+
+    def _endpoint(self, environ):
+        try:
+            endpoint, _ = self.url_map.bind_to_environ(environ).match()
+        except HTTPException:
+            return "none"
+        return endpoint
+
+    def write_profile(self, profile, endpoint, request_id):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        # request ids come from request headers, so are only used if they're safe to put in a filename
+        if not re.fullmatch(r"[\w-]+", request_id):
+            request_id = uuid.uuid4().hex
+        profile.dump_stats(os.path.join(self.profile_dir, f"{endpoint}.{request_id}.prof"))
+
+
+def init_app(app):
+    if app.config["DM_PROFILE_DIR"]:
+        app.wsgi_app = RequestProfiler(app, app.wsgi_app)
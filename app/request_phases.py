@@ -0,0 +1,69 @@
+"""
+Instrumentation of the phases of handling a request - form validation, Data API calls, sending emails with Notify and
+rendering templates - recording the time spent in each in `request_phase_duration_seconds`, labelled by the endpoint
+being served, the phase, and the form, validator, API client method, email template or page template concerned.
+"""
+from contextlib import contextmanager
+from threading import local
+from time import perf_counter
+
+from flask import before_render_template, g, has_app_context, has_request_context, request, template_rendered
+from flask_wtf import FlaskForm
+
+from .metrics import REQUEST_PHASE_DURATION_SECONDS
+
+
+NO_ENDPOINT = "none"
+
+_active_phases = local()
+
+
+def _endpoint():
+    return (request.endpoint or NO_ENDPOINT) if has_request_context() else NO_ENDPOINT
+
+
+@contextmanager
+def timed_phase(phase, operation):
+    """
+    Record the time spent in the block (or decorated function) as `operation` of `phase`. Outside of a request (e.g. in
+    a background thread) it's recorded against endpoint "none". Phases nested in one of the same kind - an API client
+    method calling another, say - aren't recorded separately.
+    """
+    phases = _active_phases.__dict__.setdefault("phases", set())
+    if phase in phases:
+        yield
+        return
+
+    phases.add(phase)
+    start_time = perf_counter()
+    try:
+        yield
+    finally:
+        phases.discard(phase)
+        REQUEST_PHASE_DURATION_SECONDS.labels(_endpoint(), phase, operation).observe(perf_counter() - start_time)
+
+
+class PhaseTimedForm(FlaskForm):
+    """`FlaskForm` recording the time spent validating it as the "form_validation" phase"""
+
+    def validate(self):
+        with timed_phase("form_validation", type(self).__name__):
+            return super().validate()
+
+
+def _before_render_template(sender, template, context, **extra):
+    g.setdefault("_render_start_times", []).append(perf_counter())
+
+
+def _template_rendered(sender, template, context, **extra):
+    start_times = g.get("_render_start_times") if has_app_context() else None
+    if start_times:
+        REQUEST_PHASE_DURATION_SECONDS.labels(_endpoint(), "render", template.name).observe(
+            perf_counter() - start_times.pop()
+        )
+
+
+def init_app(app):
+    """Time every `render_template` as the "render" phase"""
+    before_render_template.connect(_before_render_template, app)
+    template_rendered.connect(_template_rendered, app)
@@ -0,0 +1,51 @@
+import time
+
+from flask import current_app, request, session
+from flask_session.sessions import RedisSessionInterface
+
+from .metrics import SESSION_SAVES_TOTAL
+
+
+class SlidingRedisSessionInterface(RedisSessionInterface):
+    """
+    Flask-Session's `RedisSessionInterface` writes every non-empty session back to Redis (and sets the cookie) at the
+    end of every request. This only does so when Flask's own session interfaces would - if the session was modified,
+    or if it's permanent and `SESSION_REFRESH_EACH_REQUEST` is set - counting saves in `session_saves_total`.
+    """
+
+    def save_session(self, app, session, response):
+        if not self.should_set_cookie(app, session):
+            SESSION_SAVES_TOTAL.labels("skipped").inc()
+            return
+
+        SESSION_SAVES_TOTAL.labels("written").inc()
+        return super().save_session(app, session, response)
+
+
+def refresh_session():
+    if request.endpoint in current_app.config["DM_SESSIONLESS_ENDPOINTS"]:
+        return
+
+    if not session.permanent:
+        session.permanent = True
+
+    # sliding expiry - the session (and so its expiry time) is only rewritten when it's modified, so make sure that
+    # happens once it's more than a fraction of its lifetime old
+    refresh_after = (
+        current_app.permanent_session_lifetime.total_seconds()
+        * current_app.config["DM_SESSION_REFRESH_FRACTION"]
+    )
+    now = int(time.time())
+    if now - session.get("_refreshed_at", 0) >= refresh_after:
+        session["_refreshed_at"] = now
+
+
+def init_app(app):
+    """Replace the session interface set up by `dmutils.session.init_app`, if it's a Flask-Session Redis one"""
+    if isinstance(app.session_interface, RedisSessionInterface):
+        app.session_interface = SlidingRedisSessionInterface(
+            app.config["SESSION_REDIS"],
+            app.config["SESSION_KEY_PREFIX"],
+            app.config["SESSION_USE_SIGNER"],
+            app.config["SESSION_PERMANENT"],
+        )
@@ -0,0 +1,186 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+
+from dmutils.asset_fingerprint import AssetFingerprinter
+import flask
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+from werkzeug.wrappers import Request, Response
+from werkzeug.wsgi import wrap_file
+
+try:
+    import brotli
+except ImportError:  # brotli is optional - without it only gzip variants are built
+    brotli = None
+
+
+MANIFEST_FILENAME = "manifest.json"
+COMPRESSIBLE_EXTENSIONS = (".css", ".js", ".map", ".svg", ".json", ".txt", ".ico")
+# preferred first, when the client accepts both
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def _compress(encoding, data):
+    if encoding == "br":
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def build_manifest(static_folder):
+    """
+    Fingerprint every file in `static_folder`, writing `manifest.json` there mapping each file's path (relative to
+    `static_folder`) to the md5 of its contents (as `AssetFingerprinter` would compute it) and the precompressed
+    variants written alongside it - gzip, and brotli if the `brotli` package is installed. Variants that aren't
+    smaller than the original aren't kept. Returns the number of files fingerprinted.
+    """
+    encodings = [(encoding, suffix) for encoding, suffix in ENCODINGS if encoding != "br" or brotli is not None]
+    variant_suffixes = tuple(suffix for _, suffix in ENCODINGS)
+
+    manifest = {}
+    for dirpath, _, filenames in os.walk(static_folder):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            asset_path = os.path.relpath(path, static_folder).replace(os.sep, "/")
+            if asset_path == MANIFEST_FILENAME or filename.endswith(variant_suffixes):
+                continue
+
+            with open(path, "rb") as f:
+                data = f.read()
+
+            available = []
+            if filename.endswith(COMPRESSIBLE_EXTENSIONS):
+                for encoding, suffix in encodings:
+                    compressed = _compress(encoding, data)
+                    if len(compressed) < len(data):
+                        with open(path + suffix, "wb") as f:
+                            f.write(compressed)
+                        available.append(encoding)
+
+            manifest[asset_path] = {"hash": hashlib.md5(data).hexdigest(), "encodings": available}
+
+    with open(os.path.join(static_folder, MANIFEST_FILENAME), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    return len(manifest)
+
+
+def load_manifest(static_folder):
+    """The manifest written by `build_manifest`, or an empty one if the assets haven't been fingerprinted"""
+    try:
+        with open(os.path.join(static_folder, MANIFEST_FILENAME)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+class ManifestAssetFingerprinter(AssetFingerprinter):
+    """`AssetFingerprinter` which takes fingerprints from the build's manifest, only reading and hashing assets missing
+    from it"""
+
+    def __init__(self, manifest, **kwargs):
+        super().__init__(**kwargs)
+        self.manifest = manifest
+
+    def get_asset_fingerprint(self, asset_file_path):
+        asset_path = os.path.relpath(asset_file_path, self._filesystem_path).replace(os.sep, "/")
+        if asset_path in self.manifest:
+            return self.manifest[asset_path]["hash"]
+        return super().get_asset_fingerprint(asset_file_path)
+
+
+class StaticFiles:
+    """
+    WSGI app serving the files in `static_folder` under `static_url_path`, passing any other request on to `wsgi_app`.
+
+    Files in the manifest are served precompressed if the client accepts one of their variants' encodings, and requests
+    for their fingerprinted URLs (as given by `ManifestAssetFingerprinter`) are marked as cacheable forever. Files are
+    sent with the server's `wsgi.file_wrapper` (sendfile under gunicorn) where there is one.
+
+    `send_static_file` serves files the same way as a Flask view, for when the app's requests don't pass through this.
+    """
+
+    def __init__(self, wsgi_app, static_folder, static_url_path, manifest, cache_timeout):
+        self.wsgi_app = wsgi_app
+        self.static_folder = static_folder
+        self.static_url_path = static_url_path.rstrip("/") + "/"
+        self.manifest = manifest
+        self.cache_timeout = int(cache_timeout)
+
+    def __call__(self, environ, start_response):
+        request = Request(environ)
+        asset_path = request.path[len(self.static_url_path):]
+        filename = safe_join(self.static_folder, asset_path)
+        if not request.path.startswith(self.static_url_path) or filename is None or not os.path.isfile(filename):
+            return self.wsgi_app(environ, start_response)
+
+        return self.send_asset(request, asset_path, filename)(environ, start_response)
+
+    def send_static_file(self, filename):
+        asset_path = filename
+        filename = safe_join(self.static_folder, asset_path)
+        if filename is None or not os.path.isfile(filename):
+            raise NotFound()
+
+        return self.send_asset(flask.request, asset_path, filename)
+
+    def send_asset(self, request, asset_path, filename):
+        entry = self.manifest.get(asset_path)
+        mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+        content_encoding = None
+        if entry:
+            for encoding, suffix in ENCODINGS:
+                if encoding in entry["encodings"] and request.accept_encodings[encoding]:
+                    content_encoding = encoding
+                    filename += suffix
+                    break
+
+        f = open(filename, "rb")
+        stat = os.fstat(f.fileno())
+        response = Response(
+            wrap_file(request.environ, f),
+            mimetype=mimetype,
+            direct_passthrough=True,
+        )
+        response.content_length = stat.st_size
+        response.last_modified = int(stat.st_mtime)
+
+        etag = entry["hash"] if entry else "{}-{}".format(int(stat.st_mtime), stat.st_size)
+        response.set_etag(etag + ("-" + content_encoding if content_encoding else ""))
+        if entry and entry["encodings"]:
+            response.vary.add("Accept-Encoding")
+        if content_encoding:
+            response.content_encoding = content_encoding
+
+        if entry and request.query_string.decode("latin-1") == entry["hash"]:
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        else:
+            response.cache_control.public = True
+            response.cache_control.max_age = self.cache_timeout
+
+        return response.make_conditional(request)
+
+
+def init_app(app):
+    """
+    Load the static asset manifest, fingerprinting asset URLs in templates with it, and serve static files with
+    `StaticFiles` from the app's `static` view - as `FastPathMiddleware` does, if `DM_WSGI_FAST_PATH` is set, before
+    requests reach the app
+    """
+    manifest = load_manifest(app.static_folder)
+    app.extensions["static_assets_manifest"] = manifest
+    app.config["BASE_TEMPLATE_DATA"] = dict(
+        app.config["BASE_TEMPLATE_DATA"] or {},
+        asset_fingerprinter=ManifestAssetFingerprinter(manifest, asset_root=app.config["ASSET_PATH"]),
+    )
+    app.view_functions["static"] = StaticFiles(
+        app.wsgi_app,
+        app.static_folder,
+        app.static_url_path,
+        manifest=manifest,
+        cache_timeout=app.send_file_max_age_default.total_seconds(),
+    ).send_static_file
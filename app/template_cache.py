@@ -0,0 +1,39 @@
+import os
+import tempfile
+
+import jinja2
+
+
+class TemplateBytecodeCache(jinja2.FileSystemBytecodeCache):
+    """
+    Jinja bytecode cache for our templates (and the govuk-frontend macros they use, already translated from Nunjucks),
+    precompiled by `scripts/compile-templates.py` as part of the build so that workers don't have to parse, translate
+    and compile them on first use.
+
+    Jinja keys cached templates by their absolute filename - here filenames are taken relative to `root` instead, so a
+    cache compiled in one checkout (e.g. on the build server) is used by another (the deployed app).
+    """
+
+    def __init__(self, directory, root):
+        super().__init__(directory)
+        self.root = root
+
+    def get_cache_key(self, name, filename=None):
+        if filename is not None:
+            filename = os.path.relpath(filename, self.root)
+        return super().get_cache_key(name, filename)
+
+    def dump_bytecode(self, bucket):
+        # written atomically as several workers may compile the same template at once, and not at all if the cache
+        # directory isn't writable - the template has been compiled either way
+        try:
+            fd, tmp_filename = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        except OSError:
+            return
+
+        try:
+            with os.fdopen(fd, "wb") as f:
+                bucket.write_bytecode(f)
+            os.replace(tmp_filename, self._get_cache_filename(bucket))
+        except OSError:
+            os.unlink(tmp_filename)
@@ -0,0 +1,148 @@
+from collections import namedtuple, OrderedDict
+from threading import Lock
+from time import monotonic, time
+
+from flask import current_app, request
+from dmutils.email.helpers import hash_string
+
+from .metrics import LOGIN_THROTTLE_CHECKS_TOTAL
+
+
+# a token bucket - up to `capacity` tokens, refilled at `rate` tokens a second
+Bucket = namedtuple("Bucket", ("name", "key", "capacity", "rate"))
+
+# the bucket which was empty, and the seconds until it will have a token again
+Throttled = namedtuple("Throttled", ("bucket", "retry_after"))
+
+
+# takes a token from each of KEYS in turn, stopping at the first which has none, as `_MemoryBuckets.take` does.
+# ARGV is the time followed by the capacity and rate of each bucket. returns the (1-based) index of the empty bucket and
+# the seconds until it has a token, or 0 if a token was taken from every bucket. numbers are returned as strings, as
+# Redis truncates Lua numbers to integers.
+TAKE_TOKENS_SCRIPT = """
+local now = tonumber(ARGV[1])
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[2 * i])
+    local rate = tonumber(ARGV[2 * i + 1])
+    local bucket = redis.call("HMGET", key, "tokens", "updated_at")
+    local tokens = tonumber(bucket[1]) or capacity
+    local updated_at = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+
+    local taken = tokens >= 1
+    if taken then
+        tokens = tokens - 1
+    end
+    redis.call("HMSET", key, "tokens", tostring(tokens), "updated_at", tostring(now))
+    -- a bucket which has refilled is the same as one which doesn't exist
+    redis.call("EXPIRE", key, math.ceil((capacity - tokens) / rate) + 1)
+
+    if not taken then
+        return {i, tostring((1 - tokens) / rate)}
+    end
+end
+return {0, "0"}
+"""
+
+
+class _MemoryBuckets:
+    """Token buckets in this process, forgetting the least recently used once there are more than `maxsize`"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+        self._lock = Lock()
+
+    def take(self, buckets):
+        now = monotonic()
+        with self._lock:
+            for bucket in buckets:
+                tokens, updated_at = self._buckets.pop(bucket.key, (bucket.capacity, now))
+                tokens = min(bucket.capacity, tokens + max(0, now - updated_at) * bucket.rate)
+
+                taken = tokens >= 1
+                if taken:
+                    tokens -= 1
+                self._buckets[bucket.key] = (tokens, now)
+                if len(self._buckets) > self.maxsize:
+                    self._buckets.popitem(last=False)
+
+                if not taken:
+                    return Throttled(bucket.name, (1 - tokens) / bucket.rate)
+        return None
+
+
+class _RedisBuckets:
+    """Token buckets in Redis, shared by every worker, under keys starting with `key_prefix`"""
+
+    def __init__(self, redis, key_prefix):
+        self.key_prefix = key_prefix
+        self._take_tokens = redis.register_script(TAKE_TOKENS_SCRIPT)
+
+    def take(self, buckets):
+        # wall clock time rather than monotonic, as it's compared with times recorded by other processes
+        args = [time()]
+        for bucket in buckets:
+            args.extend((bucket.capacity, bucket.rate))
+
+        index, retry_after = self._take_tokens(keys=[self.key_prefix + bucket.key for bucket in buckets], args=args)
+        if int(index):
+            return Throttled(buckets[int(index) - 1].name, float(retry_after))
+        return None
+
+
+class LoginThrottle:
+    """
+    Limits login attempts with token buckets per client IP address and per email address, so that credential stuffing
+    is turned away before each attempt costs the API a password hash.
+
+    Each bucket holds up to `DM_LOGIN_THROTTLE_<IP|EMAIL>_BURST` attempts and is refilled at
+    `DM_LOGIN_THROTTLE_<IP|EMAIL>_PER_MINUTE` attempts a minute. The buckets are kept in Redis, shared by all workers,
+    if `DM_REDIS_SERVICE_NAME` is set, otherwise in-process. Email addresses are only kept hashed.
+
+    The client's IP address is `request.remote_addr`, as taken from X-Forwarded-For by dmutils' `CustomProxyFix`.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.limits = {}
+        self._store = None
+
+    def init_app(self, app):
+        self.enabled = app.config["DM_LOGIN_THROTTLE"]
+        self.limits = {
+            name: (
+                app.config[f"DM_LOGIN_THROTTLE_{name.upper()}_BURST"],
+                app.config[f"DM_LOGIN_THROTTLE_{name.upper()}_PER_MINUTE"] / 60,
+            )
+            for name in ("ip", "email")
+        }
+
+        if app.config.get("DM_REDIS_SERVICE_NAME"):
+            # the session store's client, set up by dmutils.session
+            self._store = _RedisBuckets(app.config["SESSION_REDIS"], app.config["DM_LOGIN_THROTTLE_REDIS_KEY_PREFIX"])
+        else:
+            self._store = _MemoryBuckets(app.config["DM_LOGIN_THROTTLE_MAXSIZE"])
+
+    def check(self, email_address):
+        """
+        Count a login attempt for `email_address` from the current request's client, returning `Throttled` if it's
+        over either limit, otherwise None.
+        """
+        if not self.enabled:
+            return None
+
+        buckets = [
+            Bucket("ip", f"ip:{request.remote_addr}", *self.limits["ip"]),
+            Bucket("email", f"email:{hash_string(email_address.strip().lower())}", *self.limits["email"]),
+        ]
+        try:
+            throttled = self._store.take(buckets)
+        except Exception:
+            # let the attempt through rather than stop everyone logging in - account locking still applies
+            current_app.logger.exception("login.throttle.error: failed to check login throttle")
+            LOGIN_THROTTLE_CHECKS_TOTAL.labels("error").inc()
+            return None
+
+        LOGIN_THROTTLE_CHECKS_TOTAL.labels(f"throttled_{throttled.bucket}" if throttled else "allowed").inc()
+        return throttled
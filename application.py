@@ -1,6 +1,12 @@
 import os
+import tempfile
 
-from app import create_app
+# every worker writes its metrics to files in this directory, which are aggregated by _metrics. it has to be set
+# before prometheus_client is imported, and shouldn't be shared with other apps (gds-metrics defaults to /tmp).
+os.environ.setdefault("prometheus_multiproc_dir", os.path.join(tempfile.gettempdir(), "user-frontend-metrics"))
+os.makedirs(os.environ["prometheus_multiproc_dir"], exist_ok=True)
+
+from app import create_app  # noqa: E402
 
 
 application = create_app(os.getenv("DM_ENVIRONMENT") or "development")
@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+"""
+Time the functions on the app's request paths - password blocklist lookups and loading, URL and regex checks, form
+construction and error handling, and rendering every template in app/templates - and compare them with the baselines
+in `benchmarks/baselines.json`, exiting with an error if any is more than `--threshold` slower or has no baseline.
+
+Times are recorded relative to a fixed pure Python workload timed alongside them, so baselines saved on one machine
+are roughly comparable with runs on another. Save new baselines with `--save-baseline` when a change is expected to
+alter them.
+
+Usage:
+    benchmarks/hot_paths.py [--save-baseline] [--threshold=<fraction>] [--baseline=<path>] [<name filter>...]
+"""
+import argparse
+from contextlib import contextmanager
+import json
+from pathlib import Path
+import re
+import sys
+import tempfile
+import timeit
+from types import SimpleNamespace
+
+from flask import render_template
+import mock
+from wtforms.validators import Regexp, ValidationError
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dmutils.forms.helpers import get_errors_from_wtform  # noqa: E402
+
+from app import create_app  # noqa: E402
+from app.main.forms import auth_forms  # noqa: E402
+from app.main.forms.auth_forms import EMAIL_REGEX, NotInPasswordBlocklist, PASSWORD_MIN_LENGTH  # noqa: E402
+from app.main.forms.password_blocklist import (  # noqa: E402
+    blocklist_filepaths,
+    BloomFilteredBlocklist,
+    build_index,
+    PasswordBlocklistIndex,
+    passwords_from_file,
+)
+from app.main.forms.user_research import UserResearchOptInForm  # noqa: E402
+from app.main.helpers.login_helpers import is_safe_url  # noqa: E402
+
+
+DEFAULT_BASELINE_PATH = Path(__file__).resolve().parent / "baselines.json"
+DEFAULT_THRESHOLD = 0.25
+REPEAT = 7
+
+AUTH_FORMS = (
+    auth_forms.LoginForm,
+    auth_forms.EmailAddressForm,
+    auth_forms.PasswordChangeForm,
+    auth_forms.PasswordResetForm,
+    auth_forms.CreateUserForm,
+)
+
+
+def template_contexts():
+    """The context each template in app/templates is rendered with, as by its view - call in a request context"""
+    return {
+        "_base_page.html": {},
+        "auth/change-password.html": {
+            "form": auth_forms.PasswordChangeForm(), "errors": {}, "dashboard_url": "/buyers",
+        },
+        "auth/create-user-error.html": {
+            "error": None, "support_email_address": "support@example.com", "role": "buyer", "token": None, "user": None,
+        },
+        "auth/create-user.html": {
+            "email_address": "test@example.gov.uk", "form": auth_forms.CreateUserForm(), "errors": {},
+            "role": "buyer", "supplier_name": None, "token": "token",
+        },
+        "auth/login.html": {"form": auth_forms.LoginForm(), "errors": {}, "next": None},
+        "auth/request-password-reset.html": {"form": auth_forms.EmailAddressForm(), "errors": {}},
+        "auth/reset-password.html": {
+            "email_address": "test@example.gov.uk", "form": auth_forms.PasswordResetForm(), "errors": {},
+            "token": "token",
+        },
+        "cookies/cookie_settings.html": {},
+        "notifications/user-research-consent.html": {
+            "form": UserResearchOptInForm(), "errors": {}, "dashboard_url": "/buyers",
+        },
+    }
+
+
+def make_app():
+    # the test config, with cookie sessions rather than Redis ones, and with CSRF protection as when deployed
+    with mock.patch("dmutils.session.init_app"):
+        app = create_app("test")
+    app.config["DM_LOG_LEVEL"] = "CRITICAL"
+    app.config["WTF_CSRF_ENABLED"] = True
+    return app
+
+
+@contextmanager
+def blocklist_index_path(index_path):
+    """Load the blocklist from `index_path` - falling back to the text files if there's nothing there"""
+    with mock.patch.object(NotInPasswordBlocklist, "BLOCKLIST_INDEX_PATH", str(index_path)):
+        yield
+
+
+def blocklist_benchmarks(app, work_dir):
+    blocklist_dir = Path(app.root_path) / NotInPasswordBlocklist.BLOCKLIST_DIR_PATH
+    index_path = Path(work_dir) / "password_blocklist.idx"
+    build_index(blocklist_dir, index_path, PASSWORD_MIN_LENGTH)
+
+    blocked_password = passwords_from_file(blocklist_filepaths(blocklist_dir)[0], PASSWORD_MIN_LENGTH)[0]
+    index = PasswordBlocklistIndex.open(index_path, blocklist_dir, PASSWORD_MIN_LENGTH)
+    bloom_filtered_index = BloomFilteredBlocklist(index, 0.01)
+    validator = NotInPasswordBlocklist(message="Too common")
+
+    def validate(password):
+        field = SimpleNamespace(data=password)
+
+        def benchmark():
+            try:
+                validator(None, field)
+            except ValidationError:
+                pass
+        return benchmark
+
+    def cold_load(path):
+        def benchmark():
+            with blocklist_index_path(path):
+                NotInPasswordBlocklist._blocklist_set = None
+                NotInPasswordBlocklist.get_blocklist_set()
+        return benchmark
+
+    # validating first, with the blocklist loaded from the index as when deployed
+    return [
+        ("NotInPasswordBlocklist (allowed)", validate("load-test-Password-2f9c")),
+        ("NotInPasswordBlocklist (blocked)", validate(blocked_password)),
+        # whether DM_PASSWORD_BLOCKLIST_BLOOM_FILTER_FP_RATE is worth setting
+        ("blocklist index lookup (allowed)", lambda: "load-test-password-2f9c" in index),
+        ("blocklist index lookup (blocked)", lambda: blocked_password in index),
+        ("Bloom filtered blocklist index lookup (allowed)", lambda: "load-test-password-2f9c" in bloom_filtered_index),
+        ("Bloom filtered blocklist index lookup (blocked)", lambda: blocked_password in bloom_filtered_index),
+        ("get_blocklist_set cold (index)", cold_load(index_path)),
+        ("get_blocklist_set cold (text files)", cold_load(Path(work_dir) / "missing.idx")),
+    ]
+
+
+def check_benchmarks():
+    email_regex = re.compile(EMAIL_REGEX)
+    [phone_regexp] = [
+        validator for validator in auth_forms.CreateUserForm.phone_number.kwargs["validators"]
+        if isinstance(validator, Regexp)
+    ]
+    return [
+        ("is_safe_url (relative)", lambda: is_safe_url("/buyers/frameworks")),
+        ("is_safe_url (external)", lambda: is_safe_url("https://example.com/buyers")),
+        ("EMAIL_REGEX (valid)", lambda: email_regex.match("firstname.lastname@department.gov.uk")),
+        ("EMAIL_REGEX (invalid)", lambda: email_regex.match("firstname.lastname.department.gov.uk" * 4)),
+        ("phone number regex (valid)", lambda: phone_regexp.regex.match("+44 (0)20 7946 0001")),
+        ("phone number regex (invalid)", lambda: phone_regexp.regex.match("020 7946 0001 ext. 123")),
+    ]
+
+
+def form_benchmarks():
+    invalid_form = auth_forms.CreateUserForm(formdata=None)
+    invalid_form.validate()
+    benchmarks = [("get_errors_from_wtform", lambda: get_errors_from_wtform(invalid_form))]
+    for form_class in AUTH_FORMS:
+        benchmarks.append((f"{form_class.__name__}()", form_class))
+    return benchmarks
+
+
+def template_benchmarks(app):
+    contexts = template_contexts()
+    template_dir = Path(app.root_path) / "templates"
+    template_names = sorted(str(path.relative_to(template_dir)) for path in template_dir.rglob("*.html"))
+
+    missing = set(template_names) - set(contexts)
+    if missing:
+        raise KeyError(f"add a context for {', '.join(sorted(missing))} to template_contexts()")
+
+    return [
+        (f"render {name}", lambda name=name: render_template(name, **contexts[name]))
+        for name in template_names
+    ]
+
+
+def calibrate():
+    """Seconds taken by a fixed pure Python workload, which times are recorded relative to"""
+    return time_benchmark(lambda: sorted(str(i * 7919 % 10007) for i in range(2000)))
+
+
+def time_benchmark(function):
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=REPEAT, number=number)) / number
+
+
+def run(app, include):
+    """Time each benchmark whose name `include` returns true for"""
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir, app.test_request_context("/user/login"):
+        benchmarks = (
+            blocklist_benchmarks(app, work_dir)
+            + check_benchmarks()
+            + form_benchmarks()
+            + template_benchmarks(app)
+        )
+        with blocklist_index_path(Path(work_dir) / "password_blocklist.idx"):
+            for name, function in benchmarks:
+                if include(name):
+                    function()
+                    results[name] = time_benchmark(function)
+    NotInPasswordBlocklist._blocklist_set = None
+    return results
+
+
+def changes(results, calibration, baseline):
+    """The baseline time of each of `results` at this machine's speed, and the fractional change from it"""
+    if not baseline:
+        return {}
+    scale = calibration / baseline["calibration"]
+    return {
+        name: (baseline["benchmarks"][name] * scale, seconds / (baseline["benchmarks"][name] * scale) - 1)
+        for name, seconds in results.items()
+        if name in baseline["benchmarks"]
+    }
+
+
+def report(results, calibration, baseline, threshold):
+    """Print `results` against `baseline`, returning the names of those more than `threshold` slower or without one"""
+    regressions = []
+    missing = []
+    baseline_changes = changes(results, calibration, baseline)
+    print(f"{'benchmark':<55}{'time (us)':>12}{'baseline (us)':>15}{'change':>10}")
+    for name, seconds in results.items():
+        expected, change = baseline_changes.get(name, (None, None))
+        if expected is None:
+            missing.append(name)
+            print(f"{name:<55}{seconds * 1e6:>12.2f}{'-':>15}{'-':>10}  NO BASELINE")
+            continue
+
+        regressed = change > threshold
+        if regressed:
+            regressions.append(name)
+        print(
+            f"{name:<55}{seconds * 1e6:>12.2f}{expected * 1e6:>15.2f}{change:>+10.1%}"
+            + ("  REGRESSION" if regressed else "")
+        )
+
+    if missing:
+        print(f"No baselines for {len(missing)} benchmarks - record them with --save-baseline", file=sys.stderr)
+    return regressions + missing
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("names", nargs="*", help="only run benchmarks whose names contain one of these")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="record these results as the baseline")
+    parser.add_argument(
+        "--threshold", type=float, default=DEFAULT_THRESHOLD,
+        help=f"fraction slower than the baseline counted as a regression (default {DEFAULT_THRESHOLD})",
+    )
+    args = parser.parse_args()
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else None
+    if baseline is None and not args.save_baseline:
+        sys.exit(f"No baselines at {args.baseline} to compare with - record them with --save-baseline")
+    app = make_app()
+    calibration = calibrate()
+    results = run(app, lambda name: not args.names or any(name_filter in name for name_filter in args.names))
+    # the fastest of before and after, as for each benchmark
+    calibration = min(calibration, calibrate())
+
+    if args.save_baseline:
+        saved = {}
+        if baseline and args.names:
+            # keep the baselines of the benchmarks that weren't run, scaled to this machine's speed
+            saved = {
+                name: seconds * calibration / baseline["calibration"]
+                for name, seconds in baseline["benchmarks"].items()
+            }
+        saved.update(results)
+        args.baseline.write_text(json.dumps({"calibration": calibration, "benchmarks": saved}, indent=2) + "\n")
+        print(f"Saved baselines for {len(results)} benchmarks to {args.baseline}", file=sys.stderr)
+        sys.exit()
+
+    # time apparent regressions again, keeping the faster time, so that a noisy neighbour doesn't fail the run
+    slower = [name for name, (_, change) in changes(results, calibration, baseline).items() if change > args.threshold]
+    if slower:
+        retimed = run(app, lambda name: name in slower)
+        results.update((name, min(results[name], retimed[name])) for name in slower)
+
+    if report(results, calibration, baseline, args.threshold):
+        sys.exit(1)
@@ -0,0 +1,439 @@
+#!/usr/bin/env python
+"""
+Load test the app as deployed - `application.py` under gunicorn - against the stub Data API and Notify in
+`stub_services.py`, for each of the given gunicorn worker classes.
+
+Virtual users repeatedly run scenarios, chosen by the weights in `--mix`, for `--duration` seconds after a
+`--warmup`. For each scenario it reports throughput, request latency percentiles and errors, and for each run the
+peak RSS of the gunicorn workers and the most requests to the Data API stub in flight at once. With `--isolated` each
+scenario is also run on its own. `--fault` injects faults into the Data API stub (see `stub_services.parse_fault`).
+
+Needs gunicorn (and gevent for gevent workers) installed, and a Redis server on localhost for sessions as the app runs
+with the development config.
+
+Usage:
+    benchmarks/load.py [--worker-class=<class>...] [--workers=<n>] [--threads=<n>] [--concurrency=<n>]
+                            [--duration=<seconds>] [--mix=<scenario=weight,...>] [--isolated]
+"""
+import argparse
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import importlib.util
+import multiprocessing
+import os
+from pathlib import Path
+import random
+import re
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+import uuid
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dmutils.email import generate_token  # noqa: E402
+
+from benchmarks.stub_services import parse_fault, serve  # noqa: E402
+from config import configs  # noqa: E402
+from fakes.data_api import PASSWORD, seeded_user_email  # noqa: E402
+
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+CONFIG = configs["development"]
+
+DEFAULT_MIX = "login=60,reset-request=15,reset-completion=10,invite-acceptance=5,change-password=10"
+WORKER_CLASS_MODULES = {"gevent": "gevent", "eventlet": "eventlet"}
+
+CSRF_INPUT_RE = re.compile(r'<input[^>]*name="csrf_token"[^>]*>')
+VALUE_RE = re.compile(r'value="([^"]*)"')
+
+# as flashed by `reset_password.update_password`
+PASSWORD_UPDATED_MESSAGE = "Your password has been successfully changed."
+
+
+class ScenarioError(Exception):
+    pass
+
+
+class VirtualUser:
+    """
+    Runs scenarios with a `requests.Session` (so a keep-alive connection, like a browser), as seeded user
+    `user_index`, recording the latency of each request made under the scenario's name.
+    """
+
+    def __init__(self, base_url, user_index):
+        self.base_url = base_url
+        self.user_id = user_index
+        self.email_address = seeded_user_email(user_index)
+        self.session = requests.Session()
+        self.latencies = defaultdict(list)
+        self.durations = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def run(self, scenario, record=True):
+        self.session.cookies.clear()
+        self._scenario = scenario if record else None
+        start_time = time.perf_counter()
+        try:
+            SCENARIOS[scenario](self)
+        except (ScenarioError, requests.RequestException):
+            if record:
+                self.errors[scenario] += 1
+        else:
+            if record:
+                self.durations[scenario].append(time.perf_counter() - start_time)
+
+    def request(self, method, path, expect, data=None):
+        start_time = time.perf_counter()
+        response = self.session.request(method, self.base_url + path, data=data, allow_redirects=False)
+        if self._scenario is not None:
+            self.latencies[self._scenario].append(time.perf_counter() - start_time)
+        if response.status_code != expect:
+            raise ScenarioError(f"{method} {path}: expected {expect}, got {response.status_code}")
+        return response
+
+    def csrf_token(self, response):
+        field = CSRF_INPUT_RE.search(response.text)
+        if not field:
+            raise ScenarioError(f"no CSRF token in {response.url}")
+        return VALUE_RE.search(field.group(0)).group(1)
+
+    def submit(self, path, fields, expect=302):
+        """GET the form at `path` and POST `fields` to it"""
+        csrf_token = self.csrf_token(self.request("GET", path, 200))
+        return self.request("POST", path, expect, dict(fields, csrf_token=csrf_token))
+
+    def follow(self, response, path):
+        """GET the page `response` redirects to, which should be `path`"""
+        location = urlsplit(response.headers.get("Location", "")).path
+        if location != path:
+            raise ScenarioError(f"{response.url}: expected redirect to {path}, got {location}")
+        return self.request("GET", path, 200)
+
+
+def login(user):
+    user.submit("/user/login", {"email_address": user.email_address, "password": PASSWORD})
+
+
+def reset_request(user):
+    user.submit("/user/reset-password", {"email_address": user.email_address})
+
+
+def reset_completion(user):
+    # as emailed by reset_request
+    token = generate_token({"user": user.user_id}, CONFIG.SHARED_EMAIL_KEY, CONFIG.RESET_PASSWORD_TOKEN_NS)
+    response = user.submit(f"/user/reset-password/{token}", {"password": PASSWORD, "confirm_password": PASSWORD})
+    # an invalid token or a failed update also redirects
+    if PASSWORD_UPDATED_MESSAGE not in user.follow(response, "/user/login").text:
+        raise ScenarioError("password reset didn't flash the success message")
+
+
+def invite_acceptance(user):
+    # as emailed by the buyer and supplier frontends' invitations
+    token = generate_token(
+        {"email_address": f"load-test-invitee-{uuid.uuid4().hex}@example.gov.uk", "role": "buyer"},
+        CONFIG.SHARED_EMAIL_KEY,
+        CONFIG.INVITE_EMAIL_TOKEN_NS,
+    )
+    user.submit(f"/user/create/{token}", {"name": "Load Test", "phone_number": "", "password": PASSWORD})
+
+
+def change_password(user):
+    login(user)
+    user.submit(
+        "/user/change-password",
+        {"old_password": PASSWORD, "password": PASSWORD, "confirm_password": PASSWORD},
+    )
+
+
+SCENARIOS = {
+    "login": login,
+    "reset-request": reset_request,
+    "reset-completion": reset_completion,
+    "invite-acceptance": invite_acceptance,
+    "change-password": change_password,
+}
+
+
+def parse_mix(mix):
+    weights = {}
+    for item in mix.split(","):
+        scenario, _, weight = item.partition("=")
+        if scenario.strip() not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario {scenario!r} - choose from {', '.join(SCENARIOS)}")
+        weights[scenario.strip()] = float(weight or 1)
+    return weights
+
+
+def _run_virtual_user(base_url, user_index, mix, warmup_until, stop_at, seed):
+    user = VirtualUser(base_url, user_index)
+    rng = random.Random(seed)
+    scenarios, weights = zip(*mix.items())
+    while time.monotonic() < stop_at:
+        scenario = rng.choices(scenarios, weights)[0]
+        user.run(scenario, record=time.monotonic() >= warmup_until)
+    return dict(user.latencies), dict(user.durations), dict(user.errors)
+
+
+def _drive_process(base_url, user_indexes, mix, warmup, duration):
+    """Run a virtual user in a thread for each of `user_indexes`, returning their combined results"""
+    now = time.monotonic()
+    warmup_until, stop_at = now + warmup, now + warmup + duration
+
+    with ThreadPoolExecutor(len(user_indexes)) as executor:
+        futures = [
+            executor.submit(_run_virtual_user, base_url, index, mix, warmup_until, stop_at, index)
+            for index in user_indexes
+        ]
+        return _combine_results(future.result() for future in futures)
+
+
+def _combine_results(results):
+    latencies, durations, errors = defaultdict(list), defaultdict(list), defaultdict(int)
+    for result_latencies, result_durations, result_errors in results:
+        for scenario, values in result_latencies.items():
+            latencies[scenario].extend(values)
+        for scenario, values in result_durations.items():
+            durations[scenario].extend(values)
+        for scenario, count in result_errors.items():
+            errors[scenario] += count
+    return dict(latencies), dict(durations), dict(errors)
+
+
+def drive(base_url, mix, concurrency, processes, warmup, duration):
+    """
+    Run `concurrency` virtual users, spread over `processes` driver processes so that the driver's own GIL isn't the
+    bottleneck, each as a different seeded user.
+    """
+    user_indexes = [list(range(1, concurrency + 1))[i::processes] for i in range(processes)]
+
+    with multiprocessing.Pool(processes) as pool:
+        return _combine_results(pool.starmap(
+            _drive_process,
+            [(base_url, indexes, mix, warmup, duration) for indexes in user_indexes if indexes],
+        ))
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+class RSSSampler:
+    """Samples the resident set size of each child process of `pid` (gunicorn's workers), keeping the peak"""
+
+    def __init__(self, pid, interval=0.5):
+        self.pid = pid
+        self.interval = interval
+        self.peak_rss = {}
+        self._stopped = None
+
+    def _children(self):
+        children = []
+        for stat in Path("/proc").glob("[0-9]*/stat"):
+            try:
+                fields = stat.read_text().rpartition(")")[2].split()
+            except OSError:
+                continue
+            if int(fields[1]) == self.pid:
+                children.append(int(stat.parent.name))
+        return children
+
+    def sample(self):
+        for pid in self._children():
+            try:
+                status = Path(f"/proc/{pid}/status").read_text()
+            except OSError:
+                continue
+            rss_kb = int(re.search(r"^VmRSS:\s+(\d+) kB", status, re.MULTILINE).group(1))
+            self.peak_rss[pid] = max(self.peak_rss.get(pid, 0), rss_kb * 1024)
+
+    def __enter__(self):
+        self._stopped = threading.Event()
+
+        def run():
+            while not self._stopped.wait(self.interval):
+                self.sample()
+
+        self.sample()
+        threading.Thread(target=run, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self._stopped.set()
+        self.sample()
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for(url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"{url} wasn't up after {timeout} seconds")
+
+
+def start_app(worker_class, workers, threads, port, data_api_url, notify_url, metrics_dir):
+    env = dict(
+        os.environ,
+        DM_ENVIRONMENT="development",
+        DM_DATA_API_URL=data_api_url,
+        DM_NOTIFY_BASE_URL=notify_url,
+        DEBUG="false",
+        DM_LOG_LEVEL="WARNING",
+        # every virtual user logs in from the same address, so would soon be throttled
+        DM_LOGIN_THROTTLE="false",
+        prometheus_multiproc_dir=metrics_dir,
+    )
+    command = [
+        sys.executable, "-m", "gunicorn", "application:application",
+        "--bind", f"127.0.0.1:{port}",
+        "--worker-class", worker_class,
+        "--workers", str(workers),
+        "--log-level", "warning",
+    ]
+    if worker_class == "gthread":
+        command += ["--threads", str(threads)]
+
+    process = subprocess.Popen(command, cwd=str(REPO_ROOT), env=env)
+    try:
+        _wait_for(f"http://127.0.0.1:{port}/user/_status/live")
+        # fail early if the app can't render pages or store sessions, rather than reporting only errors
+        response = requests.get(f"http://127.0.0.1:{port}/user/login")
+        if response.status_code != 200:
+            raise RuntimeError(f"/user/login returned {response.status_code} - is Redis running?")
+    except BaseException:
+        stop_app(process)
+        raise
+    return process
+
+
+def stop_app(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def report(name, latencies, durations, errors, duration, peak_rss, api_stats):
+    print(f"\n{name}")
+    print(
+        f"{'scenario':<20}{'scenarios/s':>12}{'requests/s':>12}{'errors':>8}"
+        f"{'p50 (ms)':>10}{'p90 (ms)':>10}{'p99 (ms)':>10}{'max (ms)':>10}"
+    )
+    for scenario in SCENARIOS:
+        values = latencies.get(scenario)
+        if not values:
+            continue
+        print(
+            f"{scenario:<20}{len(durations.get(scenario, ())) / duration:>12.1f}{len(values) / duration:>12.1f}"
+            f"{errors.get(scenario, 0):>8}"
+            + "".join(f"{percentile(values, p) * 1000:>10.1f}" for p in (50, 90, 99))
+            + f"{max(values) * 1000:>10.1f}"
+        )
+    if peak_rss:
+        rss_mb = sorted(rss / 2 ** 20 for rss in peak_rss.values())
+        print(
+            f"peak worker RSS (MiB): {', '.join(f'{rss:.1f}' for rss in rss_mb)} "
+            f"- {len(rss_mb)} worker process(es), mean {sum(rss_mb) / len(rss_mb):.1f}"
+        )
+    print(
+        f"Data API: {sum(api_stats['requests'].values())} requests, "
+        f"at most {api_stats['max_in_flight']} in flight at once"
+    )
+
+
+def available_worker_classes(worker_classes):
+    for worker_class in worker_classes:
+        module = WORKER_CLASS_MODULES.get(worker_class)
+        if module and importlib.util.find_spec(module) is None:
+            print(f"skipping {worker_class} workers: {module} isn't installed", file=sys.stderr)
+        else:
+            yield worker_class
+
+
+def main(args):
+    if importlib.util.find_spec("gunicorn") is None:
+        sys.exit("gunicorn isn't installed - pip install gunicorn")
+
+    runs = [(scenario, {scenario: 1}) for scenario in args.mix] if args.isolated else []
+    runs.append(("mix", args.mix))
+
+    data_api_port, notify_port = args.data_api_port or _free_port(), args.notify_port or _free_port()
+    data_api_url = f"http://127.0.0.1:{data_api_port}"
+    stubs = multiprocessing.Process(
+        target=serve, args=(data_api_port, notify_port, args.users, args.stub_latency, args.fault), daemon=True,
+    )
+    stubs.start()
+
+    try:
+        for worker_class in available_worker_classes(args.worker_class):
+            with tempfile.TemporaryDirectory() as metrics_dir:
+                port = _free_port()
+                app = start_app(
+                    worker_class, args.workers, args.threads, port,
+                    data_api_url, f"http://127.0.0.1:{notify_port}", metrics_dir,
+                )
+                try:
+                    for name, mix in runs:
+                        requests.post(f"{data_api_url}/_fake/reset-stats")
+                        with RSSSampler(app.pid) as rss:
+                            latencies, durations, errors = drive(
+                                f"http://127.0.0.1:{port}", mix, args.concurrency, args.driver_processes,
+                                args.warmup, args.duration,
+                            )
+                        report(
+                            f"{worker_class} ({args.workers} workers): {name}",
+                            latencies, durations, errors, args.duration, rss.peak_rss,
+                            requests.get(f"{data_api_url}/_fake/stats").json(),
+                        )
+                finally:
+                    stop_app(app)
+    finally:
+        stubs.terminate()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--worker-class", nargs="+", default=["sync", "gthread", "gevent"], help="gunicorn worker classes to compare",
+    )
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn worker processes")
+    parser.add_argument("--threads", type=int, default=4, help="threads per gthread worker")
+    parser.add_argument("--concurrency", type=int, default=16, help="virtual users")
+    parser.add_argument("--driver-processes", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--warmup", type=float, default=5, help="seconds to run before recording")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to record for")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f"default {DEFAULT_MIX}")
+    parser.add_argument("--isolated", action="store_true", help="also run each scenario of the mix on its own")
+    parser.add_argument("--users", type=int, default=1000, help="users seeded in the Data API stub")
+    parser.add_argument("--stub-latency", type=float, default=0.01, help="seconds added to every stub response")
+    parser.add_argument(
+        "--fault", type=parse_fault, action="append", default=[],
+        help="a fault to inject into the Data API stub, e.g. authenticate_user:latency=0.5,rate=0.1",
+    )
+    parser.add_argument("--data-api-port", type=int, default=None)
+    parser.add_argument("--notify-port", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.concurrency > args.users:
+        parser.error("--concurrency can't be more than --users, as each virtual user is a different user")
+    main(args)
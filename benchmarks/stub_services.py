@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""
+Local stand-ins for the Data API and Notify, for load testing the app without either - `fakes.data_api`'s
+`FakeDataAPIServer`, seeded with users and optionally with faults (see `parse_fault`), and `fakes.notify`'s
+`FakeNotifyServer`, which accepts every email.
+
+Usage:
+    benchmarks/stub_services.py [--data-api-port=<port>] [--notify-port=<port>] [--users=<n>] [--latency=<seconds>]
+                                [--fault=<endpoint>:<option>=<value>,...]...
+"""
+import argparse
+from pathlib import Path
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fakes.data_api import FakeDataAPIServer, lognormal_latency  # noqa: E402
+from fakes.notify import FakeNotifyServer  # noqa: E402
+
+
+FAULT_OPTIONS = {
+    "latency": float,
+    "sigma": float,
+    "status": int,
+    "reset": lambda value: value.lower() in ("1", "true", "yes"),
+    "hang": lambda value: value.lower() in ("1", "true", "yes"),
+    "rate": float,
+    "count": int,
+}
+
+
+def parse_fault(spec):
+    """
+    A `Fault` for `FakeDataAPIServer.inject` from `<endpoint>:<option>=<value>,...`, where the endpoint is a
+    `DataAPIClient` method name or "*" and the options are those of `Fault`. A `sigma` makes `latency` the median of a
+    lognormal distribution. For example "authenticate_user:latency=0.2,sigma=0.5" or "get_user:status=503,rate=0.05".
+    """
+    endpoint, _, options = spec.partition(":")
+    kwargs = {}
+    for option in filter(None, options.split(",")):
+        name, _, value = option.partition("=")
+        if name not in FAULT_OPTIONS:
+            raise argparse.ArgumentTypeError(f"unknown fault option {name!r} - choose from {', '.join(FAULT_OPTIONS)}")
+        kwargs[name] = FAULT_OPTIONS[name](value)
+    if "sigma" in kwargs:
+        kwargs["latency"] = lognormal_latency(kwargs.get("latency", 0), kwargs.pop("sigma"))
+    return endpoint or "*", kwargs
+
+
+def serve(data_api_port, notify_port, users, latency, faults=()):
+    """Run both stubs until interrupted, with `latency` seconds added to every response and the given faults"""
+    with FakeDataAPIServer(data_api_port, users) as data_api, FakeNotifyServer(notify_port, latency=latency) as notify:
+        for endpoint, kwargs in faults:
+            data_api.inject(endpoint, **kwargs)
+        if latency:
+            data_api.inject(latency=latency)
+        print(f"Data API stub at {data_api.base_url}, Notify stub at {notify.base_url}", flush=True)
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-api-port", type=int, default=5000)
+    parser.add_argument("--notify-port", type=int, default=6011)
+    parser.add_argument("--users", type=int, default=1000, help="number of users to seed the Data API stub with")
+    parser.add_argument("--latency", type=float, default=0, help="seconds added to every stub response")
+    parser.add_argument(
+        "--fault", type=parse_fault, action="append", default=[], help="a fault to inject into the Data API stub",
+    )
+    args = parser.parse_args()
+
+    serve(args.data_api_port, args.notify_port, args.users, args.latency, args.fault)
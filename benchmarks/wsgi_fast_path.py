@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+"""
+Compare the time taken to serve `_status?ignore-dependencies`, `_metrics` and a static file through the full Flask
+stack with the time taken through FastPathMiddleware.
+
+Usage:
+    benchmarks/wsgi_fast_path.py [--number=<n>]
+"""
+import argparse
+from pathlib import Path
+import sys
+import tempfile
+import timeit
+
+import mock
+from werkzeug.test import EnvironBuilder, run_wsgi_app
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import create_app  # noqa: E402
+from app.fast_path import FastPathMiddleware  # noqa: E402
+from app.metrics import gds_metrics  # noqa: E402
+
+
+PATHS = (
+    "/user/_status?ignore-dependencies",
+    "/user/_metrics",
+    "/user/static/benchmark.css",
+)
+
+
+def make_apps(static_folder):
+    # the test config, with cookie sessions rather than Redis ones
+    with mock.patch("dmutils.session.init_app"), \
+            mock.patch.dict("gds_metrics.os.environ", {"PROMETHEUS_METRICS_PATH": "/_metrics"}):
+        app = create_app("test")
+    app.config["DM_LOG_LEVEL"] = "CRITICAL"
+    app.static_folder = static_folder
+
+    flask_app = app.wsgi_app
+    if isinstance(flask_app, FastPathMiddleware):
+        flask_app = flask_app.wsgi_app
+    return flask_app, FastPathMiddleware(app, flask_app, gds_metrics)
+
+
+def time_requests(wsgi_app, path, number):
+    environ = EnvironBuilder(path=path).get_environ()
+
+    def request():
+        app_iter, status, headers = run_wsgi_app(wsgi_app, dict(environ), buffered=True)
+        assert status.startswith("200"), (path, status)
+
+    request()
+    return min(timeit.repeat(request, number=number, repeat=3)) / number
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=1000, help="requests per timing run")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as static_folder:
+        (Path(static_folder) / "benchmark.css").write_text("body { color: #0b0c0c; }\n" * 100)
+        flask_app, fast_path_app = make_apps(static_folder)
+
+        print(f"{'path':<40}{'flask (ms)':>12}{'fast path (ms)':>16}{'saved (ms)':>12}")
+        for path in PATHS:
+            flask_time = time_requests(flask_app, path, args.number) * 1000
+            fast_path_time = time_requests(fast_path_app, path, args.number) * 1000
+            print(f"{path:<40}{flask_time:>12.3f}{fast_path_time:>16.3f}{flask_time - fast_path_time:>12.3f}")
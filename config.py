@@ -18,6 +18,13 @@ class Config(object):
     SESSION_COOKIE_SAMESITE = "Lax"
 
     PERMANENT_SESSION_LIFETIME = 3600  # 1 hour
+    # sessions are only rewritten (extending their lifetime) when modified - refresh_session does this once this
+    # fraction of their lifetime has passed. requests to DM_SESSIONLESS_ENDPOINTS never refresh the session.
+    SESSION_REFRESH_EACH_REQUEST = False
+    DM_SESSION_REFRESH_FRACTION = 0.1
+    DM_SESSIONLESS_ENDPOINTS = ('static', 'main.status', 'main.status_live', 'main.status_ready', 'metrics.metrics')
+    # serve DM_SESSIONLESS_ENDPOINTS without going through Flask's request handling at all (see FastPathMiddleware)
+    DM_WSGI_FAST_PATH = True
 
     DM_COOKIE_PROBE_EXPECT_PRESENT = True
 
@@ -26,9 +33,112 @@ class Config(object):
 
     DM_DATA_API_URL = None
     DM_DATA_API_AUTH_TOKEN = None
+    # size of the keep-alive connection pool to the API, connect/read timeouts in seconds, and how many times (with
+    # exponential backoff) failed requests are retried
+    DM_DATA_API_POOL_SIZE = 10
+    DM_DATA_API_KEEP_ALIVE = True
+    DM_DATA_API_CONNECT_TIMEOUT = 15
+    DM_DATA_API_READ_TIMEOUT = 45
+    DM_DATA_API_RETRIES = 5
+    DM_DATA_API_RETRY_BACKOFF = 0.3
     DM_NOTIFY_API_KEY = None
+    DM_NOTIFY_BASE_URL = 'https://api.notifications.service.gov.uk'
+    # size of the keep-alive connection pool to Notify, and connect/read timeouts in seconds
+    DM_NOTIFY_POOL_SIZE = 10
+    DM_NOTIFY_CONNECT_TIMEOUT = 5
+    DM_NOTIFY_READ_TIMEOUT = 30
     DM_REDIS_SERVICE_NAME = None
 
+    # the most label sets of http_server_requests_total/http_server_request_duration_seconds a worker will create -
+    # requests that would create more are counted under "other" (see BoundedGDSMetrics). None for no limit.
+    DM_HTTP_METRICS_MAX_SERIES = 2000
+    # hosts requests are labelled with in those metrics - requests made with any other Host header are labelled "other".
+    # deployments set this from the environment, as a comma-separated DM_HTTP_METRICS_HOSTS, to the routes they serve.
+    DM_HTTP_METRICS_HOSTS = ()
+
+    # _status and _status/ready report the Data API's status as probed by a background thread in each worker this
+    # often (in seconds), rather than making a request to the API for every status check. None probes on every check.
+    DM_STATUS_PROBE_INTERVAL = 15
+
+    # users loaded by flask-login's user_loader are cached in-process for this many seconds, so that a locked or
+    # deactivated account can stay logged in for at most this long
+    DM_USER_CACHE_TTL = 30
+    DM_USER_CACHE_MAXSIZE = 1000
+
+    # decoded invitation tokens, and whether the invited user already exists, are cached in-process for this many
+    # seconds - so a token can be accepted for at most this long after it expires
+    DM_INVITATION_CACHE_TTL = 60
+    DM_INVITATION_CACHE_MAXSIZE = 500
+
+    # valid password reset tokens are cached in-process for this many seconds (well within their 24 hour lifetime),
+    # until their user's password is changed through the app. changes are recorded in Redis if DM_REDIS_SERVICE_NAME is
+    # set, so a token used through one worker isn't accepted by the others - otherwise resetting the password always
+    # checks the token with the API. changes made elsewhere (by an admin, say) aren't seen until the entry expires.
+    DM_RESET_PASSWORD_TOKEN_CACHE_TTL = 300
+    DM_RESET_PASSWORD_TOKEN_CACHE_MAXSIZE = 500
+    DM_PASSWORD_CHANGES_REDIS_KEY_PREFIX = 'user-frontend:password-changed-at:'
+
+    # pages from views marked with cacheable_response (those that only vary by path and the user's role) are cached
+    # in-process for this many seconds
+    DM_RESPONSE_CACHE_TTL = 300
+    DM_RESPONSE_CACHE_MAXSIZE = 100
+
+    # rendered header, footer and banner fragments of pages (see {% fragmentcache %} in _base_page.html) are cached
+    # in-process for this many seconds
+    DM_FRAGMENT_CACHE_TTL = 3600
+    DM_FRAGMENT_CACHE_MAXSIZE = 500
+
+    # passwords can be checked against a Bloom filter with this false positive rate before the exact password blocklist
+    # lookup. 0 always does just the exact lookup, which benchmarks/hot_paths.py shows is faster for the shipped list.
+    DM_PASSWORD_BLOCKLIST_BLOOM_FILTER_FP_RATE = 0.0
+
+    # send Notify emails from a background queue - a Redis list if DM_REDIS_SERVICE_NAME is set, otherwise an in-process
+    # thread pool - rather than blocking the request on them. failed sends are retried with exponential backoff. emails
+    # a worker was sending from Redis when it died are queued again after DM_NOTIFY_DISPATCH_VISIBILITY_TIMEOUT seconds;
+    # emails queued in-process are lost if the worker stops before sending them.
+    DM_NOTIFY_ASYNC = True
+    DM_NOTIFY_DISPATCH_THREADS = 2
+    DM_NOTIFY_DISPATCH_RETRIES = 3
+    DM_NOTIFY_DISPATCH_RETRY_BACKOFF = 0.5
+    DM_NOTIFY_DISPATCH_REDIS_KEY = 'user-frontend:notify-dispatch'
+    DM_NOTIFY_DISPATCH_VISIBILITY_TIMEOUT = 300
+
+    # pad every response from the password reset request view to this percentile of the time taken by recent requests
+    # that sent an email, so response times don't reveal whether an account exists
+    DM_RESET_PASSWORD_PAD_RESPONSE_TIME = True
+    DM_RESET_PASSWORD_PAD_PERCENTILE = 90
+    DM_RESET_PASSWORD_PAD_DEFAULT_SECONDS = 0.25
+    DM_RESET_PASSWORD_PAD_MAX_SECONDS = 2.0
+
+    # build the password blocklist, compile templates and fingerprint assets in create_app rather than on the first
+    # requests each worker serves
+    DM_PREWARM = False
+
+    # load compiled templates from (and save newly compiled ones to) this Jinja bytecode cache, precompiled by the
+    # build with scripts/compile-templates.py
+    DM_TEMPLATE_BYTECODE_CACHE_DIR = None
+
+    # profile requests with cProfile - a DM_PROFILE_SAMPLE_RATE fraction of them, and any sent with a
+    # DM_PROFILE_HEADER header made by scripts/sign-profile-header.py with DM_PROFILE_SIGNING_KEY - writing the profiles
+    # to DM_PROFILE_DIR. disabled unless DM_PROFILE_DIR is set.
+    DM_PROFILE_DIR = None
+    DM_PROFILE_SAMPLE_RATE = 0.0
+    DM_PROFILE_HEADER = 'X-DM-Profile'
+    DM_PROFILE_HEADER_MAX_AGE = 3600
+    DM_PROFILE_SIGNING_KEY = None
+
+    # login attempts are limited by token buckets per client IP address and per email address, each holding up to
+    # _BURST attempts and refilled at _PER_MINUTE attempts a minute, so that credential stuffing gets 429s rather than
+    # reaching the API. the buckets are shared by workers through Redis if DM_REDIS_SERVICE_NAME is set, otherwise
+    # the most recently used DM_LOGIN_THROTTLE_MAXSIZE are kept in-process.
+    DM_LOGIN_THROTTLE = True
+    DM_LOGIN_THROTTLE_IP_BURST = 100
+    DM_LOGIN_THROTTLE_IP_PER_MINUTE = 60
+    DM_LOGIN_THROTTLE_EMAIL_BURST = 10
+    DM_LOGIN_THROTTLE_EMAIL_PER_MINUTE = 1
+    DM_LOGIN_THROTTLE_MAXSIZE = 10000
+    DM_LOGIN_THROTTLE_REDIS_KEY_PREFIX = 'user-frontend:login-throttle:'
+
     NOTIFY_TEMPLATES = {
         "reset_password": "4ae02cdd-65fd-417f-8c24-61260229f9af",
         "change_password_alert": "1c4c0562-44aa-4ae4-ba61-e17c544df535",
@@ -42,6 +152,7 @@ class Config(object):
     SHARED_EMAIL_KEY = None
     RESET_PASSWORD_TOKEN_NS = 'ResetPasswordSalt'
     INVITE_EMAIL_TOKEN_NS = 'InviteEmailSalt'
+    NOTIFY_DISPATCH_TOKEN_NS = 'NotifyDispatchSalt'
 
     STATIC_URL_PATH = '/user/static'
     ASSET_PATH = STATIC_URL_PATH + '/'
@@ -71,6 +182,7 @@ class Config(object):
         ]
         jinja_loader = jinja2.FileSystemLoader(template_folders)
         app.jinja_loader = jinja_loader
+        app.jinja_env.add_extension('app.fragment_cache.FragmentCacheExtension')
 
 
 class Test(Config):
@@ -83,6 +195,10 @@ class Test(Config):
     DM_DATA_API_AUTH_TOKEN = "myToken"
 
     DM_NOTIFY_API_KEY = "not_a_real_key-00000000-fake-uuid-0000-000000000000"
+    DM_NOTIFY_ASYNC = False
+    DM_RESET_PASSWORD_PAD_RESPONSE_TIME = False
+    DM_STATUS_PROBE_INTERVAL = None
+    DM_HTTP_METRICS_HOSTS = ('localhost',)
     SHARED_EMAIL_KEY = "KEY"
     SECRET_KEY = "KEY2"
 
@@ -94,6 +210,7 @@ class Development(Config):
 
     DM_DATA_API_URL = f"http://localhost:{os.getenv('DM_API_PORT', 5000)}"
     DM_DATA_API_AUTH_TOKEN = "myToken"
+    DM_HTTP_METRICS_HOSTS = ('localhost:5007', '127.0.0.1:5007')
 
     DM_NOTIFY_API_KEY = "not_a_real_key-00000000-fake-uuid-0000-000000000000"
     SECRET_KEY = "verySecretKey"
@@ -106,6 +223,8 @@ class Live(Config):
     DM_LOG_PATH = '/var/log/digitalmarketplace/application.log'
     DM_HTTP_PROTO = 'https'
 
+    DM_TEMPLATE_BYTECODE_CACHE_DIR = os.path.join(basedir, 'app', 'data', 'template_bytecode')
+
     # use of invalid email addresses with live api keys annoys Notify
     DM_NOTIFY_REDIRECT_DOMAINS_TO_ADDRESS = {
         "example.com": "success@simulator.amazonses.com",
@@ -133,3 +252,19 @@ configs = {
     'staging': Staging,
     'production': Production,
 }
+
+
+def convert_environment_overrides(app):
+    """
+    Convert settings overridden by environment variables to the type of their default in `Config`. `dmutils.config`
+    only converts bools and ints - and only where the environment's own config doesn't set them to None - leaving the
+    rest as strings. Tuples are given as comma-separated strings. Call after `dmutils.init_app`.
+    """
+    for key, default in vars(Config).items():
+        value = app.config.get(key)
+        if not isinstance(value, str):
+            continue
+        if isinstance(default, tuple):
+            app.config[key] = tuple(item.strip() for item in value.split(",") if item.strip())
+        elif isinstance(default, (int, float)) and not isinstance(default, bool):
+            app.config[key] = type(default)(value)
@@ -0,0 +1,3 @@
+"""
+Local stand-ins for the services the app calls, shared by the tests and the benchmarks.
+"""
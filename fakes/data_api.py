@@ -0,0 +1,299 @@
+from collections import Counter
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import json
+import random
+import socket
+from socketserver import ThreadingMixIn
+import struct
+import sys
+from threading import Event, Lock, Thread
+import time
+from urllib.parse import parse_qs, urlsplit
+
+
+DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+
+# every seeded user has this password
+PASSWORD = "load-test-Password-2f9c"
+
+# the longest a request held by a `hang` fault waits to be released before it's answered anyway
+MAX_HANG_SECONDS = 60
+
+
+def seeded_user_email(index):
+    return f"load-test-{index}@example.gov.uk"
+
+
+def lognormal_latency(median, sigma, seed=None):
+    """Latencies with a long tail, as for a real service - `sigma` of 0.5 puts the 99th percentile at ~3x the median"""
+    rng = random.Random(seed)
+    return lambda: rng.lognormvariate(0, sigma) * median
+
+
+class Fault:
+    """
+    A fault injected into requests to an endpoint of `FakeDataAPIServer`, named by the `DataAPIClient` method which
+    calls it ("*" for all). A `rate` fraction of requests - only the first `count`, if given - are delayed by
+    `latency` seconds (a number, or a function returning one such as `lognormal_latency`), then
+
+    - with `hang`, held without a response until the fault is cleared, so the client times out
+    - with `reset`, have their connection reset
+    - with `status`, get that error status
+    - otherwise get their normal response
+    """
+
+    def __init__(self, endpoint="*", latency=0, status=None, reset=False, hang=False, rate=1.0, count=None, seed=None):
+        self.endpoint = endpoint
+        self.latency = latency if callable(latency) else (lambda: latency)
+        self.status = status
+        self.reset = reset
+        self.hang = hang
+        self.rate = rate
+        self.count = count
+        self.triggered = 0
+        self._rng = random.Random(seed)
+
+    def applies_to(self, endpoint):
+        """Whether the fault applies to this request to `endpoint` - call with the server's lock held"""
+        if self.endpoint not in ("*", endpoint) or (self.count is not None and self.triggered >= self.count):
+            return False
+        if self.rate < 1 and self._rng.random() >= self.rate:
+            return False
+        self.triggered += 1
+        return True
+
+
+class FakeDataAPIServer(ThreadingMixIn, HTTPServer):
+    """
+    A local stand-in for the Data API, keeping users in memory and implementing just the endpoints the app calls. It's
+    seeded with `users` users, `seeded_user_email(i)` (with id i) for i in 1..users, all with password `PASSWORD`.
+    Faults - latency, timeouts, error statuses and connection resets - can be injected into endpoints with `inject`.
+
+    Counts requests by endpoint in `requests`, and the most that were in flight at once in `max_in_flight` - with sync
+    workers, the number of worker slots tied up waiting on the API. Use as a context manager, pointing
+    `DM_DATA_API_URL` at `base_url`.
+    """
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, port=0, users=1):
+        super().__init__(("127.0.0.1", port), _FakeDataAPIRequestHandler)
+        self.faults = []
+        self.requests = Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._released = Event()
+        self._lock = Lock()
+        self._users = {}
+        self._passwords = {}
+        self._ids_by_email = {}
+        for index in range(1, users + 1):
+            self.add_user(seeded_user_email(index), PASSWORD, password_changed_at=datetime(2020, 1, 1))
+
+    @property
+    def base_url(self):
+        return "http://{}:{}".format(*self.server_address)
+
+    def __enter__(self):
+        Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self._released.set()
+        self.shutdown()
+        self.server_close()
+
+    def handle_error(self, request, client_address):
+        # clients giving up on requests held by faults leave broken connections behind - not a problem
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def inject(self, endpoint="*", **kwargs):
+        """Add a `Fault` (see its arguments) to `endpoint`, returning it. Faults are applied in the order added."""
+        fault = Fault(endpoint, **kwargs)
+        with self._lock:
+            self.faults.append(fault)
+        return fault
+
+    def clear_faults(self):
+        """Remove all faults, releasing any requests held by `hang` faults"""
+        with self._lock:
+            self.faults = []
+            self._released.set()
+            self._released = Event()
+
+    def reset_stats(self):
+        with self._lock:
+            self.requests = Counter()
+            self.max_in_flight = self.in_flight
+
+    def stats(self):
+        with self._lock:
+            return {"requests": dict(self.requests), "in_flight": self.in_flight, "max_in_flight": self.max_in_flight}
+
+    def start_request(self, endpoint):
+        """Count a request to `endpoint`, returning the fault which applies to it, if any"""
+        with self._lock:
+            self.requests[endpoint] += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            released = self._released
+            for fault in self.faults:
+                if fault.applies_to(endpoint):
+                    return fault, released
+            return None, released
+
+    def end_request(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def add_user(self, email_address, password, name="Load Test", role="buyer", password_changed_at=None):
+        with self._lock:
+            if email_address.lower() in self._ids_by_email:
+                return None
+            user_id = len(self._users) + 1
+            self._users[user_id] = {
+                "id": user_id,
+                "emailAddress": email_address,
+                "name": name,
+                "role": role,
+                "active": True,
+                "locked": False,
+                "passwordChangedAt": (password_changed_at or datetime.utcnow()).strftime(DATETIME_FORMAT),
+                "userResearchOptedIn": False,
+            }
+            self._passwords[user_id] = password
+            self._ids_by_email[email_address.lower()] = user_id
+            return dict(self._users[user_id])
+
+    def get_user(self, user_id=None, email_address=None):
+        with self._lock:
+            if email_address is not None:
+                user_id = self._ids_by_email.get(email_address.lower())
+            user = self._users.get(user_id)
+            return dict(user) if user else None
+
+    def authenticate(self, email_address, password):
+        with self._lock:
+            user_id = self._ids_by_email.get(email_address.lower())
+            user = self._users.get(user_id)
+            if user and user["active"] and not user["locked"] and self._passwords[user_id] == password:
+                return dict(user)
+            return None
+
+    def update_user(self, user_id, fields):
+        with self._lock:
+            user = self._users.get(user_id)
+            if user is None:
+                return None
+            if "password" in fields:
+                self._passwords[user_id] = fields.pop("password")
+                user["passwordChangedAt"] = datetime.utcnow().strftime(DATETIME_FORMAT)
+            user.update(fields)
+            return dict(user)
+
+
+def _endpoint(method, path):
+    """The `DataAPIClient` method making a request, or None for requests the fake doesn't implement"""
+    parts = path.strip("/").split("/")
+    if (method, path) == ("GET", "/_status"):
+        return "get_status"
+    if (method, path) == ("POST", "/users/auth"):
+        return "authenticate_user"
+    if path == "/users":
+        return {"GET": "get_user", "POST": "create_user"}.get(method)
+    if len(parts) == 2 and parts[0] == "users" and parts[1].isdigit():
+        # update_user_password is an update_user of the password
+        return {"GET": "get_user", "POST": "update_user"}.get(method)
+    return None
+
+
+class _FakeDataAPIRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def _handle(self, method):
+        url = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length)) if length else {}
+
+        if url.path.startswith("/_fake/"):
+            return self._respond(*self._control(method, url.path))
+
+        endpoint = _endpoint(method, url.path)
+        fault, released = self.server.start_request(endpoint)
+        try:
+            if fault is None:
+                return self._respond(*self._route(endpoint, url, body))
+
+            time.sleep(fault.latency())
+            if fault.hang:
+                released.wait(MAX_HANG_SECONDS)
+            if fault.reset:
+                # an RST rather than a FIN, with no response
+                self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+                self.connection.close()
+                self.close_connection = True
+            elif fault.status:
+                self._respond(fault.status, {"error": f"Injected {fault.status}"})
+            else:
+                self._respond(*self._route(endpoint, url, body))
+        finally:
+            self.server.end_request()
+
+    def _route(self, endpoint, url, body):
+        server = self.server
+        user_id = url.path.rpartition("/")[2]
+
+        if endpoint == "get_status":
+            return 200, {"status": "ok"}
+
+        if endpoint == "authenticate_user":
+            user = server.authenticate(body["authUsers"]["emailAddress"], body["authUsers"]["password"])
+            return (200, {"users": user}) if user else (403, {"authorization": False})
+
+        if endpoint == "get_user" and user_id.isdigit():
+            user = server.get_user(user_id=int(user_id))
+            return (200, {"users": user}) if user else (404, {"error": "Not found"})
+
+        if endpoint == "get_user":
+            email_address = parse_qs(url.query).get("email_address", [""])[0]
+            user = server.get_user(email_address=email_address)
+            return (200, {"users": [user]}) if user else (404, {"error": "Not found"})
+
+        if endpoint == "create_user":
+            fields = body["users"]
+            user = server.add_user(fields["emailAddress"], fields["password"], fields["name"], fields["role"])
+            return (201, {"users": user}) if user else (409, {"error": "The user already exists"})
+
+        if endpoint == "update_user":
+            user = server.update_user(int(user_id), dict(body["users"]))
+            return (200, {"users": user}) if user else (404, {"error": "Not found"})
+
+        return 404, {"error": "Not found"}
+
+    def _control(self, method, path):
+        # for driving the fake when it's running in another process (see benchmarks/stub_services.py)
+        if (method, path) == ("GET", "/_fake/stats"):
+            return 200, self.server.stats()
+        if (method, path) == ("POST", "/_fake/reset-stats"):
+            self.server.reset_stats()
+            return 200, self.server.stats()
+        return 404, {"error": "Not found"}
+
+    def _respond(self, status, body):
+        response = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,72 @@
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import json
+from socketserver import ThreadingMixIn
+from threading import Condition, Thread
+import time
+import uuid
+
+
+class FakeNotifyServer(ThreadingMixIn, HTTPServer):
+    """
+    A local stand-in for the Notify API, recording emails sent to it. Responds after `latency` seconds, and to the
+    first `failures` requests with a 500. Use as a context manager, pointing `DM_NOTIFY_BASE_URL` at `base_url`.
+    """
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, port=0, failures=0, latency=0):
+        super().__init__(("127.0.0.1", port), _FakeNotifyRequestHandler)
+        self.failures = failures
+        self.latency = latency
+        self.requests = []
+        self.sent_emails = []
+        self._condition = Condition()
+
+    @property
+    def base_url(self):
+        return "http://{}:{}".format(*self.server_address)
+
+    def __enter__(self):
+        Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+
+    def wait_for_requests(self, count, timeout=5):
+        with self._condition:
+            return self._condition.wait_for(lambda: len(self.requests) >= count, timeout=timeout)
+
+    def record(self, notification):
+        with self._condition:
+            self.requests.append(notification)
+            failed = len(self.requests) <= self.failures
+            if not failed:
+                self.sent_emails.append(notification)
+            self._condition.notify_all()
+        return not failed
+
+
+class _FakeNotifyRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        notification = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if self.server.record(notification):
+            status, body = 201, {"id": str(uuid.uuid4()), "reference": notification.get("reference")}
+        else:
+            status, body = 500, {"status_code": 500, "errors": [{"error": "Exception", "message": "Internal error"}]}
+
+        response = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,25 @@
+#!/usr/bin/env python
+"""
+Compile the password blocklist files in app/data/password_blocklist into the memory-mapped index used by the
+NotInPasswordBlocklist validator. Run as part of the build (see scripts/build.sh) and whenever the blocklist changes -
+the app falls back to reading the text files if the index is missing or stale.
+
+Usage:
+    scripts/build-password-blocklist-index.py
+"""
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.main.forms.auth_forms import NotInPasswordBlocklist, PASSWORD_MIN_LENGTH  # noqa: E402
+from app.main.forms.password_blocklist import build_index  # noqa: E402
+
+
+if __name__ == "__main__":
+    app_root = Path(__file__).resolve().parent.parent / "app"
+    index_path = app_root / NotInPasswordBlocklist.BLOCKLIST_INDEX_PATH
+
+    count = build_index(app_root / NotInPasswordBlocklist.BLOCKLIST_DIR_PATH, index_path, PASSWORD_MIN_LENGTH)
+
+    print(f"Wrote {count} password hashes to {index_path}", file=sys.stderr)
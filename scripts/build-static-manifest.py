@@ -0,0 +1,25 @@
+#!/usr/bin/env python
+"""
+Fingerprint the compiled assets in app/static, writing their hashes to app/static/manifest.json along with gzip (and,
+if the brotli package is installed, brotli) compressed copies of them to serve instead. Run as part of the build after
+the frontend assets are compiled (see scripts/build.sh) - assets missing from the manifest are hashed at runtime and
+served uncompressed.
+
+Usage:
+    scripts/build-static-manifest.py [<static-folder>]
+"""
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.static_assets import MANIFEST_FILENAME, build_manifest  # noqa: E402
+
+
+if __name__ == "__main__":
+    repo_root = Path(__file__).resolve().parent.parent
+    static_folder = Path(sys.argv[1]) if len(sys.argv) > 1 else repo_root / "app" / "static"
+
+    count = build_manifest(str(static_folder))
+
+    print(f"Fingerprinted {count} assets into {static_folder / MANIFEST_FILENAME}", file=sys.stderr)
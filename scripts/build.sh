@@ -3,8 +3,13 @@
 set -e
 
 npm run frontend-build:production 1>&2
+python scripts/build-password-blocklist-index.py 1>&2
+python scripts/compile-templates.py 1>&2
+python scripts/build-static-manifest.py 1>&2
 
 # Non-Git paths that should be included when deploying
 echo "app/static"
 echo "app/templates/govuk"
 echo "app/content"
+echo "app/data/password_blocklist.idx"
+echo "app/data/template_bytecode"
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+"""
+Translate and compile our templates, and the govuk-frontend/DM templates they might import, into the Jinja bytecode
+cache loaded by apps with DM_TEMPLATE_BYTECODE_CACHE_DIR set (the Live configs). Run as part of the build (see
+scripts/build.sh) - templates that have changed since the cache was compiled are simply compiled again at runtime.
+
+Usage:
+    scripts/compile-templates.py [<cache-dir>]
+"""
+import os
+from pathlib import Path
+import shutil
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from flask import Flask  # noqa: E402
+from govuk_frontend_jinja.flask_ext import init_govuk_frontend  # noqa: E402
+
+from app.prewarm import prewarm_templates  # noqa: E402
+from app.template_cache import TemplateBytecodeCache  # noqa: E402
+from config import Live  # noqa: E402
+
+
+if __name__ == "__main__":
+    repo_root = Path(__file__).resolve().parent.parent
+    cache_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(Live.DM_TEMPLATE_BYTECODE_CACHE_DIR)
+
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.makedirs(cache_dir)
+
+    # set up the jinja environment exactly as create_app does
+    app = Flask("app")
+    init_govuk_frontend(app)
+    Live.init_app(app)
+    app.jinja_env.bytecode_cache = TemplateBytecodeCache(str(cache_dir), root=str(repo_root))
+
+    with app.app_context():
+        count = prewarm_templates(app)
+
+    print(f"Compiled {count} templates into {cache_dir}", file=sys.stderr)
@@ -0,0 +1,26 @@
+#!/usr/bin/env python
+"""
+Print an X-DM-Profile header value which makes an app with DM_PROFILE_DIR set profile the requests it's sent with,
+signed with the app's DM_PROFILE_SIGNING_KEY (read from the environment) and valid for DM_PROFILE_HEADER_MAX_AGE
+seconds. For example
+
+    curl -H "X-DM-Profile: $(scripts/sign-profile-header.py)" https://www.digitalmarketplace.service.gov.uk/user/login
+
+Usage:
+    scripts/sign-profile-header.py
+"""
+import os
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.profiling import PROFILE_HEADER_VALUE, profile_header_signer  # noqa: E402
+
+
+if __name__ == "__main__":
+    signing_key = os.environ.get("DM_PROFILE_SIGNING_KEY")
+    if not signing_key:
+        sys.exit("DM_PROFILE_SIGNING_KEY must be set")
+
+    print(profile_header_signer(signing_key).sign(PROFILE_HEADER_VALUE).decode())
@@ -0,0 +1,14 @@
+import os
+import shutil
+import tempfile
+
+
+def pytest_configure(config):
+    # gds_metrics would otherwise have prometheus_client write its multiprocess metrics files to the shared /tmp, and
+    # this has to be set before either is imported
+    config.prometheus_multiproc_dir = tempfile.mkdtemp(prefix="prometheus-multiproc-")
+    os.environ["prometheus_multiproc_dir"] = config.prometheus_multiproc_dir
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(config.prometheus_multiproc_dir, ignore_errors=True)
@@ -0,0 +1,132 @@
+import os
+
+import mock
+import pytest
+
+from app.main.forms.password_blocklist import (
+    BloomFilter,
+    BloomFilteredBlocklist,
+    build_index,
+    password_hash,
+    PasswordBlocklistIndex,
+)
+
+
+@pytest.fixture()
+def blocklist_dir(tmp_path):
+    blocklist_dir = tmp_path / "blocklist"
+    blocklist_dir.mkdir()
+    (blocklist_dir / "common.txt").write_text("Password123\n  qwertyuiop  \nshort\n", encoding="utf-8")
+    (blocklist_dir / "site_specific.txt").write_text("digitalmarketplace\n", encoding="utf-8")
+    return blocklist_dir
+
+
+@pytest.fixture()
+def index_path(tmp_path):
+    return tmp_path / "blocklist.idx"
+
+
+class TestPasswordBlocklistIndex:
+
+    def test_index_contains_normalized_passwords_over_min_length(self, blocklist_dir, index_path):
+        assert build_index(blocklist_dir, index_path, 10) == 3
+
+        index = PasswordBlocklistIndex.open(index_path, blocklist_dir, 10)
+
+        assert len(index) == 3
+        assert "password123" in index
+        assert "qwertyuiop" in index
+        assert "digitalmarketplace" in index
+        assert "short" not in index
+        assert "Password123" not in index
+        assert "not-a-common-password" not in index
+
+    def test_missing_index_is_not_opened(self, blocklist_dir, index_path):
+        assert PasswordBlocklistIndex.open(index_path, blocklist_dir, 10) is None
+
+    def test_index_is_stale_if_blocklist_files_change(self, blocklist_dir, index_path):
+        build_index(blocklist_dir, index_path, 10)
+        (blocklist_dir / "site_specific.txt").write_text("digitalmarketplace\ngovernment\n", encoding="utf-8")
+
+        assert PasswordBlocklistIndex.open(index_path, blocklist_dir, 10) is None
+
+    def test_index_is_stale_if_blocklist_files_are_modified(self, blocklist_dir, index_path):
+        build_index(blocklist_dir, index_path, 10)
+        stat = (blocklist_dir / "common.txt").stat()
+        os.utime(blocklist_dir / "common.txt", ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+
+        assert PasswordBlocklistIndex.open(index_path, blocklist_dir, 10) is None
+
+    def test_opening_index_doesnt_read_blocklist_files(self, blocklist_dir, index_path):
+        build_index(blocklist_dir, index_path, 10)
+
+        with mock.patch("pathlib.Path.read_bytes", side_effect=AssertionError), \
+                mock.patch("app.main.forms.password_blocklist.passwords_from_file", side_effect=AssertionError):
+            assert PasswordBlocklistIndex.open(index_path, blocklist_dir, 10) is not None
+
+    def test_index_is_stale_if_min_length_changes(self, blocklist_dir, index_path):
+        build_index(blocklist_dir, index_path, 10)
+
+        assert PasswordBlocklistIndex.open(index_path, blocklist_dir, 12) is None
+
+    def test_index_built_from_files_matches_compiled_index(self, blocklist_dir, index_path):
+        build_index(blocklist_dir, index_path, 10)
+
+        index = PasswordBlocklistIndex.from_files(blocklist_dir, 10)
+
+        assert list(index) == list(PasswordBlocklistIndex.open(index_path, blocklist_dir, 10))
+        assert "password123" in index
+        assert "short" not in index
+
+    def test_truncated_index_is_not_opened(self, blocklist_dir, index_path):
+        build_index(blocklist_dir, index_path, 10)
+        index_path.write_bytes(index_path.read_bytes()[:-4])
+
+        assert PasswordBlocklistIndex.open(index_path, blocklist_dir, 10) is None
+
+
+class TestBloomFilter:
+
+    def test_no_false_negatives(self):
+        hashes = [password_hash(str(i)) for i in range(1000)]
+        bloom_filter = BloomFilter(hashes, len(hashes), 0.01)
+
+        assert all(bloom_filter.might_contain(hash_) for hash_ in hashes)
+
+    def test_false_positive_rate_is_roughly_as_configured(self):
+        hashes = [password_hash(str(i)) for i in range(1000)]
+        bloom_filter = BloomFilter(hashes, len(hashes), 0.01)
+
+        false_positives = sum(bloom_filter.might_contain(password_hash(f"not-{i}")) for i in range(10000))
+
+        assert false_positives < 300
+
+
+class TestBloomFilteredBlocklist:
+
+    @pytest.mark.parametrize("compiled", (False, True))
+    def test_membership_matches_underlying_blocklist(self, blocklist_dir, index_path, compiled):
+        if compiled:
+            build_index(blocklist_dir, index_path, 10)
+            blocklist = PasswordBlocklistIndex.open(index_path, blocklist_dir, 10)
+        else:
+            blocklist = PasswordBlocklistIndex.from_files(blocklist_dir, 10)
+
+        filtered_blocklist = BloomFilteredBlocklist(blocklist, 0.01)
+
+        assert len(filtered_blocklist) == 3
+        assert "password123" in filtered_blocklist
+        assert "digitalmarketplace" in filtered_blocklist
+        assert "not-a-common-password" not in filtered_blocklist
+
+    def test_exact_lookup_only_made_for_possible_matches(self):
+        blocklist = mock.MagicMock(spec=PasswordBlocklistIndex)
+        blocklist.__iter__.return_value = iter((password_hash("password123"),))
+        blocklist.__len__.return_value = 1
+        blocklist.contains_hash.return_value = True
+
+        filtered_blocklist = BloomFilteredBlocklist(blocklist, 0.0001)
+
+        assert "password123" in filtered_blocklist
+        assert "not-a-common-password" not in filtered_blocklist
+        assert blocklist.contains_hash.call_args_list == [mock.call(password_hash("password123"))]
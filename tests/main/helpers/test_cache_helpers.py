@@ -0,0 +1,71 @@
+import mock
+from lxml import html
+
+from app import response_cache
+from app.main.helpers.cache_helpers import CSRF_TOKEN_PLACEHOLDER
+from app.main.views import cookie_settings
+from ...helpers import BaseApplicationTest
+
+
+class TestCacheableResponse(BaseApplicationTest):
+
+    def setup_method(self, method):
+        super().setup_method(method)
+        self.render_template_patch = mock.patch.object(
+            cookie_settings, "render_template", wraps=cookie_settings.render_template
+        )
+        self.render_template = self.render_template_patch.start()
+
+    def teardown_method(self, method):
+        self.render_template_patch.stop()
+        super().teardown_method(method)
+
+    def test_page_is_only_rendered_once(self):
+        first = self.client.get("/user/cookie-settings")
+        second = self.client.get("/user/cookie-settings")
+
+        assert first.status_code == second.status_code == 200
+        assert first.get_data() == second.get_data()
+        assert second.mimetype == "text/html"
+        assert self.render_template.call_count == 1
+
+    def test_pages_are_cached_per_role(self):
+        self.client.get("/user/cookie-settings")
+        self.login_as_buyer()
+        self.client.get("/user/cookie-settings")
+        self.client.get("/user/cookie-settings")
+
+        assert self.render_template.call_count == 2
+
+    def test_pages_are_cached_per_query_string(self):
+        self.client.get("/user/cookie-settings")
+        self.client.get("/user/cookie-settings?foo=bar")
+
+        assert self.render_template.call_count == 2
+
+    def test_cache_is_bypassed_if_messages_have_been_flashed(self):
+        self.client.get("/user/cookie-settings")
+        with self.client.session_transaction() as session:
+            session["_flashes"] = [("message", "Hello")]
+        self.client.get("/user/cookie-settings")
+
+        assert self.render_template.call_count == 2
+
+    def test_cache_can_be_disabled(self):
+        response_cache.init_app(self.app, maxsize=0, ttl=0)
+        self.client.get("/user/cookie-settings")
+        self.client.get("/user/cookie-settings")
+
+        assert self.render_template.call_count == 2
+
+    def test_cached_pages_get_the_sessions_own_csrf_token(self):
+        self.app.config["WTF_CSRF_ENABLED"] = True
+
+        def csrf_token(client):
+            response = client.get("/user/login")
+            assert CSRF_TOKEN_PLACEHOLDER not in response.get_data(as_text=True)
+            return html.fromstring(response.get_data(as_text=True)).xpath("//input[@name='csrf_token']/@value")[0]
+
+        other_client = self.app.test_client()
+        assert csrf_token(self.client) != csrf_token(other_client)
+        assert len(response_cache) == 1
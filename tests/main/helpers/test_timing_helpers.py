@@ -0,0 +1,56 @@
+import mock
+import pytest
+
+from app.main.helpers.timing_helpers import ResponseTimePadder
+
+from ...helpers import BaseApplicationTest
+
+
+class TestResponseTimePadder(BaseApplicationTest):
+
+    def setup_method(self, method):
+        super().setup_method(method)
+        self.app.config.update({
+            "DM_TEST_PAD_RESPONSE_TIME": True,
+            "DM_TEST_PAD_PERCENTILE": 90,
+            "DM_TEST_PAD_DEFAULT_SECONDS": 0.25,
+            "DM_TEST_PAD_MAX_SECONDS": 2.0,
+        })
+        self.padder = ResponseTimePadder("DM_TEST_PAD")
+
+    def _record(self, *durations):
+        for duration in durations:
+            with mock.patch("app.main.helpers.timing_helpers.monotonic", return_value=100 + duration):
+                self.padder.record(100)
+
+    def test_target_is_default_until_durations_are_recorded(self):
+        with self.app.app_context():
+            assert self.padder.target_duration() == 0.25
+
+    def test_target_is_percentile_of_most_recent_durations(self):
+        self._record(*(i / 100 for i in range(1, 101)))
+        with self.app.app_context():
+            # only the last 50 durations, 0.51 to 1.0, are kept
+            assert self.padder.target_duration() == pytest.approx(0.96)
+
+    def test_target_is_capped(self):
+        self._record(5, 6, 7)
+        with self.app.app_context():
+            assert self.padder.target_duration() == 2.0
+
+    @pytest.mark.parametrize("elapsed, expected_sleeps", ((0.1, [mock.call(pytest.approx(0.15))]), (0.3, [])))
+    @mock.patch("app.main.helpers.timing_helpers.sleep", autospec=True)
+    def test_pad_sleeps_for_remainder_of_target(self, sleep, elapsed, expected_sleeps):
+        with self.app.app_context(), \
+                mock.patch("app.main.helpers.timing_helpers.monotonic", return_value=100 + elapsed):
+            self.padder.pad(100)
+
+        assert sleep.call_args_list == expected_sleeps
+
+    @mock.patch("app.main.helpers.timing_helpers.sleep", autospec=True)
+    def test_pad_does_nothing_if_disabled(self, sleep):
+        self.app.config["DM_TEST_PAD_RESPONSE_TIME"] = False
+        with self.app.app_context():
+            self.padder.pad(0)
+
+        assert sleep.called is False
@@ -4,12 +4,13 @@ from ...helpers import BaseApplicationTest
 from lxml import html
 import mock
 
+from app import login_throttle
 from app.main.forms.auth_forms import (
     EMAIL_EMPTY_ERROR_MESSAGE,
     EMAIL_INVALID_ERROR_MESSAGE,
     LOGIN_PASSWORD_EMPTY_ERROR_MESSAGE
 )
-from app.main.views.auth import NO_ACCOUNT_MESSAGE
+from app.main.views.auth import NO_ACCOUNT_MESSAGE, TOO_MANY_ATTEMPTS_MESSAGE
 
 
 # subset of WCAG 2.1 input purposes
@@ -239,6 +240,39 @@ class TestLogin(BaseApplicationTest):
         assert res.status_code == 400
         assert self.strip_all_whitespace(EMAIL_INVALID_ERROR_MESSAGE) in content
 
+    def test_should_return_a_429_without_calling_the_api_if_too_many_attempts(self):
+        self.app.config["DM_LOGIN_THROTTLE_EMAIL_BURST"] = 2
+        login_throttle.init_app(self.app)
+
+        responses = [
+            # from a new client each time, as a logged in one would be redirected
+            self.app.test_client().post(
+                "/user/login", data={'email_address': 'valid@email.com', 'password': '1234567890'}
+            )
+            for _ in range(3)
+        ]
+
+        assert [response.status_code for response in responses] == [302, 302, 429]
+        assert self.data_api_client.authenticate_user.call_count == 2
+        assert int(responses[2].headers["Retry-After"]) > 0
+        assert self.strip_all_whitespace(TOO_MANY_ATTEMPTS_MESSAGE) \
+            in self.strip_all_whitespace(responses[2].get_data(as_text=True))
+
+    def test_attempts_are_throttled_by_the_forwarded_client_address(self):
+        self.app.config["DM_LOGIN_THROTTLE_IP_BURST"] = 2
+        login_throttle.init_app(self.app)
+
+        status_codes = [
+            self.app.test_client().post(
+                "/user/login",
+                data={'email_address': f'valid{i}@email.com', 'password': '1234567890'},
+                headers={"X-Forwarded-For": forwarded_for},
+            ).status_code
+            for i, forwarded_for in enumerate(("192.0.2.1", "192.0.2.1", "192.0.2.1", "192.0.2.2"))
+        ]
+
+        assert status_codes == [302, 302, 429, 302]
+
 
 class TestLoginFormIsAccessible(BaseApplicationTest):
 
@@ -6,8 +6,9 @@ import mock
 from freezegun import freeze_time
 
 from dmapiclient import HTTPError
-from dmutils.email import generate_token
+from dmutils.email import decode_invitation_token, generate_token
 
+from app import invitation_cache
 from ...helpers import BaseApplicationTest
 
 
@@ -171,6 +172,41 @@ class TestCreateUser(BaseApplicationTest):
 
         assert form.cssselect("button:contains('Create account')")
 
+    def test_reloading_create_user_page_reuses_decoded_token_and_user_lookup(self):
+        self.data_api_client.get_user.return_value = None
+        token = self._generate_token()
+
+        with mock.patch(
+            "app.main.views.create_user.decode_invitation_token",
+            wraps=decode_invitation_token,
+        ) as decode_invitation_token_mock:
+            for _ in range(3):
+                assert self.client.get(f"/user/create/{token}").status_code == 200
+
+        assert decode_invitation_token_mock.call_count == 1
+        assert self.data_api_client.get_user.call_count == 1
+
+    def test_invalid_token_is_only_decoded_once(self):
+        with mock.patch(
+            "app.main.views.create_user.decode_invitation_token",
+            wraps=decode_invitation_token,
+        ) as decode_invitation_token_mock:
+            for _ in range(3):
+                assert self.client.get("/user/create/1234").status_code == 400
+
+        assert decode_invitation_token_mock.call_count == 1
+        assert self.data_api_client.get_user.called is False
+
+    def test_user_lookup_is_not_cached_if_invitation_cache_disabled(self):
+        invitation_cache.init_app(self.app, maxsize=500, ttl=0)
+        self.data_api_client.get_user.return_value = None
+        token = self._generate_token()
+
+        for _ in range(2):
+            self.client.get(f"/user/create/{token}")
+
+        assert self.data_api_client.get_user.call_count == 2
+
     def test_should_render_an_error_if_already_registered_as_a_buyer(self):
         error_messages = [
             'Account already exists',
@@ -504,6 +540,20 @@ class TestSubmitCreateUser(BaseApplicationTest):
         assert res.status_code == 302
         assert res.location == 'http://localhost/'
 
+    def test_creating_user_invalidates_cached_user_lookup(self):
+        self.data_api_client.create_user.side_effect = HTTPError(mock.Mock(status_code=409))
+        self.data_api_client.get_user.return_value = None
+        token = self._generate_token(role='buyer')
+
+        self.client.get(f"/user/create/{token}")
+        self.client.post(
+            f"/user/create/{token}",
+            data={'password': 'validpassword', 'name': 'valid name', 'phone_number': '020-7930-4832'},
+        )
+        self.client.get(f"/user/create/{token}")
+
+        assert self.data_api_client.get_user.call_count == 2
+
     def test_should_create_suplier_user_if_user_does_not_exist(self):
         self.data_api_client.create_user.return_value = {
             "users": {
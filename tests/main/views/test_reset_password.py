@@ -8,6 +8,7 @@ from dmtestutils.comparisons import AnyStringMatching
 
 from ...helpers import BaseApplicationTest, MockMatcher
 
+from app import password_changes
 from app.main.views import reset_password
 from app.main.forms.auth_forms import (
     EMAIL_EMPTY_ERROR_MESSAGE,
@@ -20,8 +21,6 @@ from app.main.forms.auth_forms import (
     PASSWORD_CHANGE_AUTH_ERROR_MESSAGE
 )
 
-PASSWORD_RESET_EMAIL_ERROR = "Try again later."  # Generic 500 error message content
-
 
 class TestSendResetPasswordEmail(BaseApplicationTest):
 
@@ -72,7 +71,7 @@ class TestSendResetPasswordEmail(BaseApplicationTest):
         "buyer",
         "supplier",
     ))
-    @mock.patch('app.main.views.reset_password.DMNotifyClient.send_email')
+    @mock.patch('app.notify.DMNotifyClient.send_email')
     def test_reset_password_request_redirects_to_same_page_and_shows_flash_message(self, send_email, user_role):
         self.data_api_client.get_user.return_value = self.user(
             123, "email@email.com", 1234, "Ahoy", name="Bob", role=user_role,
@@ -92,8 +91,8 @@ class TestSendResetPasswordEmail(BaseApplicationTest):
             template_name_or_id=self.app.config['NOTIFY_TEMPLATES']['reset_password']
         )]
 
-    @mock.patch('app.main.views.reset_password.DMNotifyClient.send_email')
-    def test_nonexistent_account_sends_email_to_sandbox_address(self, send_email):
+    @mock.patch('app.notify.DMNotifyClient.send_email')
+    def test_nonexistent_account_does_not_send_email(self, send_email):
         self.data_api_client.get_user.return_value = None
 
         with mock.patch('app.main.views.reset_password.current_app') as current_app_mock:
@@ -103,20 +102,16 @@ class TestSendResetPasswordEmail(BaseApplicationTest):
 
         assert res.status_code == 302
         self.assert_flashes("we'll send a link to reset the", expected_category="success")
-        assert send_email.call_args_list == [mock.call(
-            reset_password.NOTIFY_SANDBOX_ADDRESS,
-            reference="reset-password-nonexistent-user-{}".format(self.expected_email_hash),
-            template_name_or_id=current_app_mock.config['NOTIFY_TEMPLATES']['reset_password_inactive']
-        )]
+        assert send_email.call_args_list == []
         assert current_app_mock.logger.info.call_args_list == [mock.call(
-            '{code}: Sent password (non-)reset email for invalid user email_hash {email_hash}',
+            '{code}: Password reset requested for invalid user email_hash {email_hash}',
             extra={
                 'email_hash': self.expected_email_hash,
                 'code': 'login.reset-email.invalid-email'
             }
         )]
 
-    @mock.patch('app.main.views.reset_password.DMNotifyClient.send_email')
+    @mock.patch('app.notify.DMNotifyClient.send_email')
     def test_should_strip_whitespace_surrounding_reset_password_email_address_field(self, send_email):
         self.client.post("/user/reset-password", data={
             'email_address': ' email@email.com'
@@ -130,8 +125,8 @@ class TestSendResetPasswordEmail(BaseApplicationTest):
         )]
 
     @mock.patch('app.main.helpers.logging_helpers.current_app')
-    @mock.patch('app.main.views.reset_password.DMNotifyClient.send_email')
-    def test_should_be_an_error_if_send_email_fails_for_real_user(self, send_email, current_app):
+    @mock.patch('app.notify.DMNotifyClient.send_email')
+    def test_send_email_failure_for_real_user_is_logged_but_not_revealed(self, send_email, current_app):
         send_email.side_effect = EmailError(Exception('Notify API is down'))
 
         res = self.client.post(
@@ -139,8 +134,8 @@ class TestSendResetPasswordEmail(BaseApplicationTest):
             data={'email_address': 'email@email.com'}
         )
 
-        assert res.status_code == 503
-        assert PASSWORD_RESET_EMAIL_ERROR in res.get_data(as_text=True)
+        assert res.status_code == 302
+        self.assert_flashes("we'll send a link to reset the", expected_category="success")
 
         assert current_app.logger.error.call_args_list == [mock.call(
             '{code}: {email_type} email for email_hash {email_hash} failed to send. Error: {error}',
@@ -152,31 +147,7 @@ class TestSendResetPasswordEmail(BaseApplicationTest):
             }
         )]
 
-    @mock.patch('app.main.helpers.logging_helpers.current_app')
-    @mock.patch('app.main.views.reset_password.DMNotifyClient.send_email')
-    def test_should_be_an_error_if_send_email_fails_for_nonexistent_user(self, send_email, current_app):
-        send_email.side_effect = EmailError(Exception('Notify API is down'))
-        self.data_api_client.get_user.return_value = None
-
-        res = self.client.post(
-            '/user/reset-password',
-            data={'email_address': 'email@email.com'}
-        )
-
-        assert res.status_code == 503
-        assert PASSWORD_RESET_EMAIL_ERROR in res.get_data(as_text=True)
-
-        assert current_app.logger.error.call_args_list == [mock.call(
-            '{code}: {email_type} email for email_hash {email_hash} failed to send. Error: {error}',
-            extra={
-                'email_hash': self.expected_email_hash,
-                'error': 'Notify API is down',
-                'code': 'login.reset-email-nonexistent.notify-error',
-                'email_type': "Password reset (non-existent user)"
-            }
-        )]
-
-    @mock.patch('app.main.views.reset_password.DMNotifyClient.send_email', autospec=True)
+    @mock.patch('app.notify.DMNotifyClient.send_email', autospec=True)
     def test_inactive_user_attempts_password_reset(self, send_email):
         self.data_api_client.get_user.return_value = self.user(
             123, "email@email.com", 1234, 'email', 'Name', active=False,
@@ -197,8 +168,8 @@ class TestSendResetPasswordEmail(BaseApplicationTest):
         )]
 
     @mock.patch('app.main.helpers.logging_helpers.current_app')
-    @mock.patch('app.main.views.reset_password.DMNotifyClient.send_email', autospec=True)
-    def test_should_be_an_error_if_send_email_fails_for_inactive_user(self, send_email, current_app):
+    @mock.patch('app.notify.DMNotifyClient.send_email', autospec=True)
+    def test_send_email_failure_for_inactive_user_is_logged_but_not_revealed(self, send_email, current_app):
         send_email.side_effect = EmailError(Exception('Notify API is down'))
         self.data_api_client.get_user.return_value = self.user(
             123, "email@email.com", 1234, 'email', 'Name', active=False,
@@ -208,8 +179,8 @@ class TestSendResetPasswordEmail(BaseApplicationTest):
             data={'email_address': 'email@email.com'}
         )
 
-        assert res.status_code == 503
-        assert PASSWORD_RESET_EMAIL_ERROR in res.get_data(as_text=True)
+        assert res.status_code == 302
+        self.assert_flashes("we'll send a link to reset the", expected_category="success")
 
         assert current_app.logger.error.call_args_list == [mock.call(
             '{code}: {email_type} email for email_hash {email_hash} failed to send. Error: {error}',
@@ -221,7 +192,7 @@ class TestSendResetPasswordEmail(BaseApplicationTest):
             }
         )]
 
-    @mock.patch("app.main.views.reset_password.DMNotifyClient.send_email", autospec=True)
+    @mock.patch("app.notify.DMNotifyClient.send_email", autospec=True)
     def test_admin_manager_does_not_get_reset_email(self, send_email):
         self.data_api_client.get_user.return_value = self.user(
             123, "email@email.com", name="Eve", role="admin-manager",
@@ -237,6 +208,32 @@ class TestSendResetPasswordEmail(BaseApplicationTest):
         self.assert_flashes("we'll send a link to reset the", expected_category="success")
         assert send_email.call_args_list == []
 
+    @pytest.mark.parametrize("user, send_email_error, records_duration", (
+        (BaseApplicationTest.user(123, "email@email.com", None, None, "Eve", role="admin-manager"), None, False),
+        (BaseApplicationTest.user(123, "email@email.com", 1234, "Ahoy", "Bob"), None, True),
+        (BaseApplicationTest.user(123, "email@email.com", 1234, "Ahoy", "Bob"), EmailError("Notify is down"), False),
+        (BaseApplicationTest.user(123, "email@email.com", 1234, "Ahoy", "Bob", active=False), None, True),
+        (
+            BaseApplicationTest.user(123, "email@email.com", 1234, "Ahoy", "Bob", active=False),
+            EmailError("Notify is down"),
+            False,
+        ),
+        (None, None, False),
+    ))
+    @mock.patch("app.main.helpers.logging_helpers.current_app")
+    @mock.patch("app.notify.DMNotifyClient.send_email", autospec=True)
+    @mock.patch("app.main.views.reset_password.reset_password_email_timing", autospec=True)
+    def test_response_time_is_padded_for_all_users(self, reset_password_email_timing, send_email, current_app, user,
+                                                   send_email_error, records_duration):
+        self.data_api_client.get_user.return_value = user
+        send_email.side_effect = send_email_error
+
+        res = self.client.post("/user/reset-password", data={"email_address": "email@email.com"})
+
+        assert res.status_code == 302
+        assert reset_password_email_timing.record.called is records_duration
+        assert reset_password_email_timing.pad.call_count == 1
+
 
 class TestResetPassword(BaseApplicationTest):
     _user = None
@@ -438,6 +435,131 @@ class TestResetPassword(BaseApplicationTest):
         assert reset_password.EXPIRED_PASSWORD_RESET_TOKEN_MESSAGE in error_elements[0].text_content()
         assert self.data_api_client.update_user_password.called is False
 
+    def test_token_is_only_validated_against_the_api_once_for_showing_the_page(self):
+        token = generate_token(
+            self._user,
+            self.app.config['SHARED_EMAIL_KEY'],
+            self.app.config['RESET_PASSWORD_TOKEN_NS'])
+        url = '/user/reset-password/{}'.format(token)
+
+        assert self.client.get(url).status_code == 200
+        assert self.client.get(url).status_code == 200
+
+        assert self.data_api_client.get_user.call_count == 1
+
+    def _share_password_changes(self):
+        store = {}
+        redis = mock.Mock()
+        redis.get.side_effect = store.get
+        redis.set.side_effect = lambda key, value, ex: store.__setitem__(key, value.encode("utf-8"))
+        self.app.config.update(DM_REDIS_SERVICE_NAME="digitalmarketplace_redis", SESSION_REDIS=redis)
+        password_changes.init_app(self.app)
+        return store
+
+    def test_token_is_only_validated_against_the_api_once_for_a_reset_if_password_changes_are_shared(self):
+        self._share_password_changes()
+        token = generate_token(
+            self._user,
+            self.app.config['SHARED_EMAIL_KEY'],
+            self.app.config['RESET_PASSWORD_TOKEN_NS'])
+        url = '/user/reset-password/{}'.format(token)
+
+        assert self.client.get(url).status_code == 200
+        res = self.client.post(url, data={
+            'password': 'password12345',
+            'confirm_password': 'password12345'
+        })
+
+        assert res.status_code == 302
+        assert res.location == 'http://localhost/user/login'
+        assert self.data_api_client.get_user.call_count == 1
+        assert self.data_api_client.update_user_password.call_count == 1
+
+    def test_token_is_validated_against_the_api_again_after_a_shared_password_change(self):
+        store = self._share_password_changes()
+        token = generate_token(
+            self._user,
+            self.app.config['SHARED_EMAIL_KEY'],
+            self.app.config['RESET_PASSWORD_TOKEN_NS'])
+        url = '/user/reset-password/{}'.format(token)
+
+        assert self.client.get(url).status_code == 200
+        # the token is used through another worker
+        store["user-frontend:password-changed-at:{}".format(self._user["user"])] = b"1600000000.0"
+        self.data_api_client.get_user.return_value = self.user(
+            123, "email@email.com", 1234, 'email', 'Name', is_token_valid=False
+        )
+        res = self.client.post(url, data={
+            'password': 'password12345',
+            'confirm_password': 'password12345'
+        })
+
+        assert res.status_code == 302
+        assert res.location == 'http://localhost/user/reset-password'
+        assert self.data_api_client.get_user.call_count == 2
+        assert self.data_api_client.update_user_password.called is False
+
+    def test_token_is_always_validated_against_the_api_when_used_if_password_changes_arent_shared(self):
+        token = generate_token(
+            self._user,
+            self.app.config['SHARED_EMAIL_KEY'],
+            self.app.config['RESET_PASSWORD_TOKEN_NS'])
+        url = '/user/reset-password/{}'.format(token)
+
+        assert self.client.get(url).status_code == 200
+        # the token is used through another worker, so isn't dropped from this one's cache
+        self.data_api_client.get_user.return_value = self.user(
+            123, "email@email.com", 1234, 'email', 'Name', is_token_valid=False
+        )
+        res = self.client.post(url, data={
+            'password': 'password12345',
+            'confirm_password': 'password12345'
+        })
+
+        assert res.status_code == 302
+        assert res.location == 'http://localhost/user/reset-password'
+        assert self.data_api_client.get_user.call_count == 2
+        assert self.data_api_client.update_user_password.called is False
+
+    def test_token_is_validated_again_after_password_is_updated(self):
+        token = generate_token(
+            self._user,
+            self.app.config['SHARED_EMAIL_KEY'],
+            self.app.config['RESET_PASSWORD_TOKEN_NS'])
+        url = '/user/reset-password/{}'.format(token)
+
+        self.client.post(url, data={
+            'password': 'password12345',
+            'confirm_password': 'password12345'
+        })
+        self.data_api_client.get_user.return_value = self.user(
+            123, "email@email.com", 1234, 'email', 'Name', is_token_valid=False
+        )
+        res = self.client.post(url, data={
+            'password': 'password12345',
+            'confirm_password': 'password12345'
+        })
+
+        assert res.status_code == 302
+        assert res.location == 'http://localhost/user/reset-password'
+        assert self.data_api_client.get_user.call_count == 2
+        assert self.data_api_client.update_user_password.call_count == 1
+
+    def test_invalid_tokens_are_not_cached(self):
+        self.data_api_client.get_user.return_value = self.user(
+            123, "email@email.com", 1234, 'email', 'Name', is_token_valid=False
+        )
+        token = generate_token(
+            self._user,
+            self.app.config['SHARED_EMAIL_KEY'],
+            self.app.config['RESET_PASSWORD_TOKEN_NS'])
+        url = '/user/reset-password/{}'.format(token)
+
+        self.client.get(url)
+        self.client.get(url)
+
+        assert self.data_api_client.get_user.call_count == 2
+
 
 class TestChangePassword(BaseApplicationTest):
 
@@ -545,7 +667,7 @@ class TestChangePassword(BaseApplicationTest):
             "digitalmarketplace",
         ),
     )
-    @mock.patch('app.main.views.reset_password.DMNotifyClient.send_email', autospec=True)
+    @mock.patch('app.notify.DMNotifyClient.send_email', autospec=True)
     def test_user_can_change_password(self, send_email, user_role, redirect_url, user_email, old_password):
         if user_role == 'buyer':
             self.login_as_buyer()
@@ -684,7 +806,7 @@ class TestChangePassword(BaseApplicationTest):
         )
 
     @mock.patch('app.main.helpers.logging_helpers.current_app')
-    @mock.patch('app.main.views.reset_password.DMNotifyClient.send_email')
+    @mock.patch('app.notify.DMNotifyClient.send_email')
     def test_should_log_an_error_and_redirect_if_change_password_email_sending_fails(self, send_email, current_app):
         self.login_as_supplier()
         send_email.side_effect = EmailError(Exception('Notify API is down'))
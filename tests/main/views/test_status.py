@@ -46,3 +46,35 @@ class TestStatus(BaseApplicationTest):
 
         assert "{}".format(json_data['status']) == "error"
         assert "{}".format(json_data['api_status']['status']) == "error"
+
+    def test_status_includes_age_of_dependency_status(self):
+        self._data_api_client.get_status.return_value = {'status': 'ok'}
+
+        json_data = self.client.get('/user/_status').json
+        assert json_data['dependencies_checked_seconds_ago'] == 0.0
+        assert self._data_api_client.get_status.call_count == 1
+
+    def test_liveness_does_not_check_dependencies(self):
+        response = self.client.get('/user/_status/live')
+
+        assert response.status_code == 200
+        assert response.json['status'] == 'ok'
+        assert self._data_api_client.get_status.called is False
+
+    def test_readiness_ok(self):
+        self._data_api_client.get_status.return_value = {'status': 'ok'}
+
+        response = self.client.get('/user/_status/ready')
+
+        assert response.status_code == 200
+        assert response.json['status'] == 'ok'
+        assert set(response.json['warm']) == {'password_blocklist', 'templates'}
+
+    def test_readiness_error_in_api(self):
+        self._data_api_client.get_status.return_value = {'status': 'error'}
+
+        response = self.client.get('/user/_status/ready')
+
+        assert response.status_code == 503
+        assert response.json['status'] == 'error'
+        assert response.json['api_status'] == {'status': 'error'}
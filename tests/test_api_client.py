@@ -0,0 +1,109 @@
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import json
+from socketserver import ThreadingMixIn
+from threading import Thread
+
+import mock
+import pytest
+
+from app import data_api_client
+from .helpers import BaseApplicationTest
+
+
+class _FakeAPIServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _UsersRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.client_ports.add(self.client_address[1])
+        if self.path == "/users/123":
+            status, body = 200, {"users": {"id": 123}}
+        else:
+            status, body = 404, {"error": "Not found"}
+
+        response = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestPooledDataAPIClient(BaseApplicationTest):
+
+    def setup_method(self, method):
+        super().setup_method(method)
+        self.server = _FakeAPIServer(("127.0.0.1", 0), _UsersRequestHandler)
+        self.server.client_ports = set()
+        Thread(target=self.server.serve_forever, daemon=True).start()
+
+        self.app.config["DM_DATA_API_URL"] = "http://{}:{}".format(*self.server.server_address)
+
+    def teardown_method(self, method):
+        self.server.shutdown()
+        self.server.server_close()
+        super().teardown_method(method)
+
+    def test_init_app_applies_config(self):
+        self.app.config.update(
+            DM_DATA_API_POOL_SIZE=4,
+            DM_DATA_API_CONNECT_TIMEOUT=2,
+            DM_DATA_API_READ_TIMEOUT=3,
+            DM_DATA_API_RETRIES=1,
+            DM_DATA_API_RETRY_BACKOFF=0,
+        )
+        data_api_client.init_app(self.app)
+
+        assert data_api_client.timeout == (2.0, 3.0)
+        adapter = data_api_client._requests_retry_session().get_adapter(data_api_client.base_url)
+        assert adapter._pool_maxsize == 4
+        assert adapter.max_retries.total == 1
+
+    def test_requests_reuse_a_keep_alive_connection(self):
+        data_api_client.init_app(self.app)
+        with self.app.app_context():
+            for _ in range(3):
+                assert data_api_client.get_user(user_id=123) == {"users": {"id": 123}}
+
+        assert len(self.server.client_ports) == 1
+
+    def test_keep_alive_can_be_disabled(self):
+        self.app.config["DM_DATA_API_KEEP_ALIVE"] = False
+        data_api_client.init_app(self.app)
+        with self.app.app_context():
+            for _ in range(3):
+                data_api_client.get_user(user_id=123)
+
+        assert len(self.server.client_ports) == 3
+
+    @mock.patch("app.api_client.DATA_API_REQUESTS_IN_FLIGHT")
+    @mock.patch("app.api_client.DATA_API_REQUEST_DURATION_SECONDS")
+    def test_request_metrics_are_labelled_by_endpoint(self, request_duration_seconds, requests_in_flight):
+        data_api_client.init_app(self.app)
+        with self.app.app_context():
+            data_api_client.get_user(user_id=123)
+            assert data_api_client.get_user(user_id=456) is None
+
+        assert requests_in_flight.labels.call_args_list == [mock.call("GET", "/users/<id>")] * 2
+        assert requests_in_flight.labels.return_value.inc.call_count == 2
+        assert requests_in_flight.labels.return_value.dec.call_count == 2
+        assert request_duration_seconds.labels.call_args_list == [
+            mock.call("GET", "/users/<id>", "2xx"),
+            mock.call("GET", "/users/<id>", 404),
+        ]
+
+    @pytest.mark.parametrize("url, endpoint", (
+        ("http://localhost/users/123", "/users/<id>"),
+        ("/users/123/frameworks/g-cloud-12", "/users/<id>/frameworks/g-cloud-12"),
+        ("/users/auth", "/users/auth"),
+        ("/users?email_address=foo%40example.com", "/users"),
+        ("http://localhost", "/"),
+    ))
+    def test_endpoint(self, url, endpoint):
+        assert data_api_client._endpoint(url) == endpoint
@@ -1,6 +1,7 @@
 import mock
 from wtforms import ValidationError
 from .helpers import BaseApplicationTest
+from app import create_app, data_api_client, invalidate_cached_user, user_cache
 from werkzeug.exceptions import ServiceUnavailable, BadRequest
 
 
@@ -76,3 +77,55 @@ class TestApplication(BaseApplicationTest):
             # POST requests will not preserve the request path on redirect
             assert res.location == 'http://localhost/user/login'
             assert validate_csrf.call_args_list == [mock.call(None)]
+
+
+class TestEnvironmentOverrides(BaseApplicationTest):
+    @mock.patch.dict("os.environ", {
+        "DM_SESSION_REFRESH_FRACTION": "0.5",
+        "DM_STATUS_PROBE_INTERVAL": "5",
+        "DM_DATA_API_RETRY_BACKOFF": "1",
+    })
+    def test_numeric_settings_are_converted_to_the_type_of_their_default(self):
+        app = create_app('test')
+
+        assert app.config["DM_SESSION_REFRESH_FRACTION"] == 0.5
+        # None in the test config, so left as a string by dmutils
+        assert app.config["DM_STATUS_PROBE_INTERVAL"] == 5
+        assert app.config["DM_DATA_API_RETRY_BACKOFF"] == 1.0
+        assert isinstance(app.config["DM_DATA_API_RETRY_BACKOFF"], float)
+
+    @mock.patch.dict("os.environ", {"DM_HTTP_METRICS_HOSTS": "www.example.com, example.com"})
+    def test_tuple_settings_are_split_on_commas(self):
+        app = create_app('test')
+
+        assert app.config["DM_HTTP_METRICS_HOSTS"] == ("www.example.com", "example.com")
+
+
+class TestLoadUser(BaseApplicationTest):
+
+    def test_user_is_only_loaded_from_api_once_while_cached(self):
+        self.login_as_buyer()
+
+        for _ in range(3):
+            res = self.client.get('/user/change-password')
+            assert res.status_code == 200
+
+        assert data_api_client.get_user.call_args_list == [mock.call(user_id=123)]
+
+    def test_user_is_loaded_from_api_again_after_invalidation(self):
+        self.login_as_buyer()
+
+        self.client.get('/user/change-password')
+        invalidate_cached_user(123)
+        self.client.get('/user/change-password')
+
+        assert data_api_client.get_user.call_args_list == [mock.call(user_id=123), mock.call(user_id=123)]
+
+    def test_user_cache_can_be_disabled(self):
+        user_cache.init_app(self.app, maxsize=self.app.config['DM_USER_CACHE_MAXSIZE'], ttl=0)
+        self.login_as_buyer()
+
+        self.client.get('/user/change-password')
+        self.client.get('/user/change-password')
+
+        assert data_api_client.get_user.call_count == 2
@@ -0,0 +1,70 @@
+import mock
+
+from app.cache import TTLCache
+
+
+class TestTTLCache:
+
+    def test_get_returns_value_that_was_set(self):
+        cache = TTLCache('test', maxsize=10, ttl=60)
+        cache.set('a', 1)
+
+        assert cache.get('a') == 1
+        assert cache.get('b') is None
+        assert cache.get('b', 'default') == 'default'
+
+    def test_entries_expire_after_ttl(self):
+        cache = TTLCache('test', maxsize=10, ttl=60)
+        with mock.patch('app.cache.monotonic', return_value=1000):
+            cache.set('a', 1)
+        with mock.patch('app.cache.monotonic', return_value=1059):
+            assert cache.get('a') == 1
+        with mock.patch('app.cache.monotonic', return_value=1060):
+            assert cache.get('a') is None
+        assert len(cache) == 0
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = TTLCache('test', maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        assert cache.get('a') == 1
+        assert cache.get('b') is None
+        assert cache.get('c') == 3
+
+    def test_pop_removes_entry(self):
+        cache = TTLCache('test', maxsize=10, ttl=60)
+        cache.set('a', 1)
+
+        assert cache.pop('a') == 1
+        assert cache.pop('a') is None
+        assert cache.get('a') is None
+
+    def test_zero_ttl_disables_cache(self):
+        cache = TTLCache('test', maxsize=10, ttl=0)
+        cache.set('a', 1)
+
+        assert cache.get('a') is None
+        assert len(cache) == 0
+
+    def test_init_app_clears_cache(self):
+        cache = TTLCache('test', maxsize=10, ttl=60)
+        cache.set('a', 1)
+        cache.init_app(mock.Mock(), maxsize=5, ttl=30)
+
+        assert cache.get('a') is None
+        assert (cache.maxsize, cache.ttl) == (5, 30)
+
+    @mock.patch('app.cache.CACHE_MISSES_TOTAL')
+    @mock.patch('app.cache.CACHE_HITS_TOTAL')
+    def test_hits_and_misses_are_counted(self, hits_total, misses_total):
+        cache = TTLCache('test', maxsize=10, ttl=60)
+        cache.get('a')
+        cache.set('a', 1)
+        cache.get('a')
+        cache.get('a')
+
+        assert misses_total.labels.call_args_list == [mock.call('test')]
+        assert hits_total.labels.call_args_list == [mock.call('test'), mock.call('test')]
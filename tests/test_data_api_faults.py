@@ -0,0 +1,143 @@
+from threading import Thread
+import time
+
+from dmapiclient import HTTPError
+import pytest
+
+from app import data_api_client, load_user, user_cache
+from fakes.data_api import FakeDataAPIServer, PASSWORD, seeded_user_email
+from .helpers import BaseApplicationTest
+
+
+class TestDataAPIFaults(BaseApplicationTest):
+    """How the app behaves when the Data API is slow or failing, against `FakeDataAPIServer`"""
+
+    READ_TIMEOUT = 0.5
+    RETRIES = 2
+
+    def setup_method(self, method):
+        super().setup_method(method)
+        self.api = FakeDataAPIServer(users=3).__enter__()
+        self.app.config.update(
+            DM_DATA_API_URL=self.api.base_url,
+            DM_DATA_API_READ_TIMEOUT=self.READ_TIMEOUT,
+            DM_DATA_API_RETRIES=self.RETRIES,
+            DM_DATA_API_RETRY_BACKOFF=0,
+        )
+        data_api_client.init_app(self.app)
+
+    def teardown_method(self, method):
+        self.api.__exit__(None, None, None)
+        super().teardown_method(method)
+
+    def _login(self, client=None):
+        return (client or self.client).post(
+            "/user/login", data={"email_address": seeded_user_email(1), "password": PASSWORD}
+        )
+
+    def test_login_waits_for_a_slow_api(self):
+        self.api.inject("authenticate_user", latency=0.2)
+
+        start_time = time.monotonic()
+        res = self._login()
+
+        assert res.status_code == 302
+        assert time.monotonic() - start_time >= 0.2
+
+    @pytest.mark.parametrize("fault, status_code", (
+        ({"status": 500}, 500),
+        ({"status": 503}, 503),
+        ({"reset": True}, 503),
+    ))
+    def test_login_is_an_error_page_when_the_api_keeps_failing(self, fault, status_code):
+        self.api.inject("authenticate_user", **fault)
+
+        assert self._login().status_code == status_code
+        # POSTs aren't retried, as they mightn't be idempotent
+        assert self.api.requests["authenticate_user"] == 1
+
+    def test_login_gives_up_on_an_api_which_doesnt_respond(self):
+        hang = self.api.inject("authenticate_user", hang=True)
+
+        start_time = time.monotonic()
+        res = self._login()
+
+        assert res.status_code == 503
+        assert time.monotonic() - start_time >= self.READ_TIMEOUT
+        # given up on after one read timeout, rather than retried
+        assert hang.triggered == 1
+        assert self.api.requests["authenticate_user"] == 1
+
+    def test_slow_api_calls_tie_up_a_slot_each(self):
+        self.api.inject("authenticate_user", latency=0.3)
+        clients = [self.app.test_client() for _ in range(3)]
+
+        threads = [Thread(target=self._login, args=(client,)) for client in clients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert self.api.max_in_flight == 3
+
+    def test_load_user_only_waits_for_a_slow_api_once(self):
+        latency = self.api.inject("get_user", latency=0.2)
+        user_cache.clear()
+
+        with self.app.test_request_context():
+            start_time = time.monotonic()
+            assert load_user(1).email_address == seeded_user_email(1)
+            assert time.monotonic() - start_time >= 0.2
+
+            assert load_user(1).email_address == seeded_user_email(1)
+
+        assert latency.triggered == 1
+        assert self.api.requests["get_user"] == 1
+
+    def test_load_user_rides_out_an_error_burst_within_the_retry_budget(self):
+        burst = self.api.inject("get_user", status=503, count=self.RETRIES)
+        user_cache.clear()
+
+        with self.app.test_request_context():
+            assert load_user(1).email_address == seeded_user_email(1)
+
+        assert burst.triggered == self.RETRIES
+        assert self.api.requests["get_user"] == self.RETRIES + 1
+
+    def test_load_user_gives_up_on_an_api_which_doesnt_respond(self):
+        self.api.inject("get_user", hang=True)
+        user_cache.clear()
+
+        start_time = time.monotonic()
+        with self.app.test_request_context(), pytest.raises(HTTPError) as e:
+            load_user(1)
+
+        assert e.value.status_code == 503
+        # unlike POSTs, GETs are retried after read timeouts
+        assert self.api.requests["get_user"] == self.RETRIES + 1
+        assert time.monotonic() - start_time >= (self.RETRIES + 1) * self.READ_TIMEOUT
+
+    def test_status_reports_an_api_which_doesnt_respond(self):
+        self.api.inject("get_status", hang=True)
+
+        res = self.client.get("/user/_status")
+
+        assert res.status_code == 500
+        assert res.json["api_status"]["status"] == "error"
+
+    def test_status_ignoring_dependencies_doesnt_wait_for_the_api(self):
+        hang = self.api.inject("get_status", hang=True)
+
+        res = self.client.get("/user/_status?ignore-dependencies")
+
+        assert res.status_code == 200
+        assert hang.triggered == 0
+        assert self.api.requests["get_status"] == 0
+
+    def test_readiness_fails_while_api_errors(self):
+        fault = self.api.inject("get_status", status=503)
+        assert self.client.get("/user/_status/ready").status_code == 503
+
+        self.api.clear_faults()
+        assert fault.triggered == self.RETRIES + 1
+        assert self.client.get("/user/_status/ready").status_code == 200
@@ -0,0 +1,122 @@
+from flask import request_started
+import mock
+
+from app.fast_path import FastPathMiddleware
+from app.metrics import gds_metrics
+from .helpers import BaseApplicationTest
+
+
+class TestFastPathMiddleware(BaseApplicationTest):
+
+    def setup_method(self, method):
+        super().setup_method(method)
+        self.flask_requests = []
+        request_started.connect(self._record_flask_request, self.app)
+
+    def teardown_method(self, method):
+        request_started.disconnect(self._record_flask_request, self.app)
+        super().teardown_method(method)
+
+    def _record_flask_request(self, sender, **extra):
+        self.flask_requests.append(sender)
+
+    def test_middleware_is_installed_by_create_app(self):
+        assert isinstance(self.app.wsgi_app, FastPathMiddleware)
+
+    @mock.patch("app.main.views.status.data_api_client", autospec=True)
+    def test_status_bypasses_flask(self, data_api_client):
+        data_api_client.get_status.return_value = {"status": "ok"}
+
+        assert self.client.get("/user/_status?ignore-dependencies").status_code == 200
+        response = self.client.get("/user/_status")
+
+        assert response.status_code == 200
+        assert response.json["api_status"] == {"status": "ok"}
+        assert "Set-Cookie" not in response.headers
+        assert self.flask_requests == []
+
+    @mock.patch("app.main.views.status.data_api_client", autospec=True)
+    def test_liveness_and_readiness_bypass_flask(self, data_api_client):
+        data_api_client.get_status.return_value = {"status": "ok"}
+
+        assert self.client.get("/user/_status/live").status_code == 200
+        assert self.client.get("/user/_status/ready").status_code == 200
+        assert self.flask_requests == []
+
+    @mock.patch("app.main.views.status.data_api_client", autospec=True)
+    def test_status_errors_are_returned(self, data_api_client):
+        data_api_client.get_status.return_value = {"status": "error"}
+
+        assert self.client.get("/user/_status").status_code == 500
+
+    def test_metrics_bypass_flask_but_are_counted(self):
+        self.client.get("/user/_metrics")
+        response = self.client.get("/user/_metrics")
+
+        assert response.status_code == 200
+        assert response.headers["Cache-Control"] == "no-cache, no-store, max-age=0, must-revalidate"
+        assert (
+            b'http_server_requests_total{code="200",host="localhost",method="GET",path="/user/_metrics"}'
+            in response.data
+        )
+        assert self.flask_requests == []
+
+    @mock.patch.object(gds_metrics, "observe_request", autospec=True)
+    def test_requests_are_counted_with_the_forwarded_host(self, observe_request):
+        self.client.get(
+            "/user/_metrics", headers={"Host": "router.internal", "X-Forwarded-Host": "www.example.com"}
+        )
+
+        (method, host, rule, code, _), _ = observe_request.call_args
+        assert (method, host, rule, code) == ("GET", "www.example.com", "/user/_metrics", 200)
+
+    def test_metrics_can_be_gzipped(self):
+        response = self.client.get("/user/_metrics", headers={"Accept-Encoding": "gzip, deflate"})
+
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.data[:2] == b"\x1f\x8b"
+
+    @mock.patch.object(gds_metrics, "auth_token", "abc")
+    def test_metrics_require_auth_token_if_set(self):
+        assert self.client.get("/user/_metrics").status_code == 401
+        assert self.client.get("/user/_metrics", headers={"Authorization": "Bearer xyz"}).status_code == 403
+        assert self.client.get("/user/_metrics", headers={"Authorization": "Bearer abc"}).status_code == 200
+
+    def test_static_files_bypass_flask(self, tmpdir):
+        tmpdir.join("application.css").write("body {}")
+        self.app.static_folder = str(tmpdir)
+        self.app.wsgi_app = FastPathMiddleware(self.app, self.app.wsgi_app.wsgi_app, gds_metrics)
+
+        response = self.client.get("/user/static/application.css")
+
+        assert response.status_code == 200
+        assert response.data == b"body {}"
+        assert "max-age" in response.headers["Cache-Control"]
+        assert self.flask_requests == []
+
+    def test_responses_have_security_headers(self, tmpdir):
+        tmpdir.join("application.css").write("body {}")
+        self.app.static_folder = str(tmpdir)
+        self.app.wsgi_app = FastPathMiddleware(self.app, self.app.wsgi_app.wsgi_app, gds_metrics)
+
+        for path in ("/user/_status?ignore-dependencies", "/user/_metrics", "/user/static/application.css"):
+            response = self.client.get(path)
+
+            assert response.headers.getlist("X-Frame-Options") == ["DENY"]
+        assert self.flask_requests == []
+
+    def test_missing_static_files_are_passed_on_to_flask(self, tmpdir):
+        self.app.static_folder = str(tmpdir)
+        self.app.wsgi_app = FastPathMiddleware(self.app, self.app.wsgi_app.wsgi_app, gds_metrics)
+
+        response = self.client.get("/user/static/missing.css")
+
+        assert response.status_code == 404
+        assert response.headers.getlist("X-Frame-Options") == ["DENY"]
+        assert self.flask_requests == [self.app]
+
+    def test_other_requests_are_passed_on_to_flask(self):
+        assert self.client.post("/user/_status").status_code == 405
+        self.client.get("/user/cookie-settings")
+
+        assert self.flask_requests == [self.app, self.app]
@@ -0,0 +1,39 @@
+import jinja2
+import mock
+
+from app.cache import TTLCache
+from app.fragment_cache import FragmentCacheExtension
+
+
+class TestFragmentCacheExtension:
+
+    def setup_method(self, method):
+        self.environment = jinja2.Environment(extensions=[FragmentCacheExtension], autoescape=True)
+        self.environment.fragment_cache = TTLCache("template_fragment", maxsize=10, ttl=60)
+        self.render_count = mock.Mock(return_value="")
+        self.template = self.environment.from_string(
+            '{% fragmentcache "greeting", name %}{{ render_count() }}<p>Hello {{ name }}</p>{% endfragmentcache %}'
+        )
+
+    def test_fragment_is_rendered_once_per_key(self):
+        assert self.template.render(name="Alice", render_count=self.render_count) == "<p>Hello Alice</p>"
+        assert self.template.render(name="Alice", render_count=self.render_count) == "<p>Hello Alice</p>"
+        assert self.template.render(name="<Bob>", render_count=self.render_count) == "<p>Hello &lt;Bob&gt;</p>"
+
+        assert self.render_count.call_count == 2
+        assert len(self.environment.fragment_cache) == 2
+
+    def test_fragment_is_rendered_every_time_without_a_cache(self):
+        self.environment.fragment_cache = None
+        self.template.render(name="Alice", render_count=self.render_count)
+        self.template.render(name="Alice", render_count=self.render_count)
+
+        assert self.render_count.call_count == 2
+
+    def test_fragment_output_is_not_escaped_again_when_cached(self):
+        template = self.environment.from_string(
+            '{% fragmentcache "link" %}<a href="{{ url }}">link</a>{% endfragmentcache %}'
+        )
+
+        assert template.render(url="/?a=1&b=2") == '<a href="/?a=1&amp;b=2">link</a>'
+        assert template.render(url="/?a=1&b=2") == '<a href="/?a=1&amp;b=2">link</a>'
@@ -0,0 +1,78 @@
+from flask import Flask
+import mock
+import pytest
+
+from app.health import DependencyProber
+
+
+class TestDependencyProber:
+
+    def setup_method(self, method):
+        self.app = Flask(__name__)
+        self.probe = mock.Mock(return_value={"status": "ok"})
+        self.prober = DependencyProber()
+
+    def teardown_method(self, method):
+        # stops any background thread
+        self.app.config["DM_STATUS_PROBE_INTERVAL"] = None
+        self.prober.init_app(self.app, probe=self.probe)
+
+    def _init_app(self, interval):
+        self.app.config["DM_STATUS_PROBE_INTERVAL"] = interval
+        self.prober.init_app(self.app, probe=self.probe)
+
+    def test_every_call_probes_without_an_interval(self):
+        self._init_app(None)
+
+        assert self.prober.get_status() == {"status": "ok"}
+        assert self.prober.get_status() == {"status": "ok"}
+        assert self.probe.call_count == 2
+
+    def test_last_result_is_reused_with_an_interval(self):
+        self._init_app(60)
+
+        assert self.prober.get_status() == {"status": "ok"}
+        assert self.prober.get_status() == {"status": "ok"}
+        assert self.probe.call_count == 1
+
+    def test_status_age_is_that_of_the_last_result(self):
+        self._init_app(60)
+
+        with mock.patch("app.health.monotonic", return_value=100.0):
+            self.prober.get_status()
+        with mock.patch("app.health.monotonic", return_value=112.5):
+            assert self.prober.get()[1] == 12.5
+            assert self.prober.status_age() == {"dependencies_checked_seconds_ago": 12.5}
+
+    def test_stale_results_are_refreshed(self):
+        self._init_app(60)
+
+        with mock.patch("app.health.monotonic", return_value=100.0):
+            self.prober.get_status()
+        with mock.patch("app.health.monotonic", return_value=400.0):
+            self.prober.get_status()
+
+        assert self.probe.call_count == 2
+
+    def test_results_are_refreshed_in_the_background(self):
+        self._init_app(0.01)
+        self.prober.get_status()
+        self.probe.return_value = {"status": "error"}
+
+        for _ in range(100):
+            if self.prober.get_status() == {"status": "error"}:
+                break
+            self.prober._stopped.wait(0.01)
+
+        assert self.prober.get_status() == {"status": "error"}
+
+    @pytest.mark.parametrize("probe_behaviour, expected", (
+        ({"return_value": None}, {"status": "n/a"}),
+        ({"side_effect": ValueError("Boom")}, {"status": "error", "message": "Boom"}),
+        ({"return_value": {"error": "Bad gateway"}}, {"status": "error", "error": "Bad gateway"}),
+    ))
+    def test_failed_probes_are_errors(self, probe_behaviour, expected):
+        self.probe.configure_mock(**probe_behaviour)
+        self._init_app(None)
+
+        assert self.prober.get_status() == expected
@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
 import re
 
+import mock
+
+from app.metrics import gds_metrics
 from tests.helpers import BaseApplicationTest
 
 
@@ -56,3 +59,64 @@ class TestMetricsPageRegistersPageViews(BaseApplicationTest):
 
         assert expected_metric_name in results
         assert metric_value - initial_metric_value == 3
+
+
+class TestBoundedGDSMetrics(BaseApplicationTest):
+
+    def setup_method(self, method):
+        super().setup_method(method)
+        self._max_series_patch = mock.patch.object(gds_metrics, 'max_series', 2)
+        self._max_series_patch.start()
+
+    def teardown_method(self, method):
+        self._max_series_patch.stop()
+        super().teardown_method(method)
+
+    def test_existing_label_sets_are_kept(self):
+        assert gds_metrics.labels('GET', 'localhost', '/user/login', 200) == ('GET', 'localhost', '/user/login', 200)
+        assert gds_metrics.labels('GET', 'localhost', '/user/login', 200) == ('GET', 'localhost', '/user/login', 200)
+
+    def test_unknown_methods_are_labelled_other(self):
+        assert gds_metrics.labels('BREW', 'localhost', 'No endpoint', 405) == ('other', 'localhost', 'No endpoint', 405)
+
+    @mock.patch('app.metrics.HTTP_SERVER_SERIES_OVERFLOW_TOTAL')
+    def test_unknown_hosts_are_labelled_other(self, series_overflow_total):
+        for i in range(10):
+            assert gds_metrics.labels('GET', f'{i}.example.com', '/user/login', 200) == (
+                'GET', 'other', '/user/login', 200
+            )
+
+        assert gds_metrics.labels('GET', 'localhost', '/user/login', 200) == ('GET', 'localhost', '/user/login', 200)
+        assert series_overflow_total.inc.call_count == 0
+
+    def test_hosts_are_taken_from_config(self):
+        self.app.config['DM_HTTP_METRICS_HOSTS'] = ('www.example.com',)
+        gds_metrics.init_app(self.app)
+
+        assert gds_metrics.labels('GET', 'www.example.com', '/user/login', 200)[1] == 'www.example.com'
+        assert gds_metrics.labels('GET', 'localhost', '/user/login', 200)[1] == 'other'
+
+    @mock.patch('app.metrics.HTTP_SERVER_SERIES_OVERFLOW_TOTAL')
+    def test_label_sets_beyond_the_limit_are_labelled_other(self, series_overflow_total):
+        gds_metrics.labels('GET', 'localhost', '/user/login', 200)
+        gds_metrics.labels('GET', 'localhost', '/user/login', 302)
+
+        assert gds_metrics.labels('GET', 'localhost', '/user/logout', 200) == ('GET', 'other', 'other', 200)
+        assert gds_metrics.labels('GET', 'localhost', '/user/login', 302) == ('GET', 'localhost', '/user/login', 302)
+        assert series_overflow_total.inc.call_count == 1
+
+    @mock.patch('app.metrics.HTTP_SERVER_REQUESTS_TOTAL')
+    def test_requests_are_labelled_by_route_template(self, requests_total):
+        with self.app.test_request_context('/user/reset-password/abc123'):
+            self.app.preprocess_request()
+            gds_metrics.teardown_request(self.app, self.app.response_class(status=200))
+
+        requests_total.labels.assert_called_once_with('GET', 'localhost', '/user/reset-password/<token>', 200)
+
+    @mock.patch('app.metrics.HTTP_SERVER_REQUESTS_TOTAL')
+    def test_unmatched_requests_are_labelled_no_endpoint(self, requests_total):
+        with self.app.test_request_context('/user/no-such-page/abc123'):
+            self.app.preprocess_request()
+            gds_metrics.teardown_request(self.app, self.app.response_class(status=404))
+
+        requests_total.labels.assert_called_once_with('GET', 'localhost', 'No endpoint', 404)
@@ -0,0 +1,72 @@
+import json
+
+import mock
+from prometheus_client import CollectorRegistry, generate_latest
+from prometheus_client.core import _MmapedDict
+import pytest
+
+from app.multiprocess_metrics import ArchivingMultiProcessCollector, archive_dead_process_files
+
+DEAD_PID, LIVE_PID = 1001, 1002
+
+
+def _write_metrics_file(path, filename, values):
+    d = _MmapedDict(str(path / filename))
+    for (metric_name, name, labelnames, labelvalues), value in values.items():
+        d.write_value(json.dumps((metric_name, name, labelnames, labelvalues)), value)
+    d.close()
+
+
+def _counter(value):
+    return {("requests_total", "requests_total", ("code",), ("200",)): value}
+
+
+def _gauge(value):
+    return {("in_flight", "in_flight", (), ()): value}
+
+
+class TestArchiveDeadProcessFiles:
+
+    @pytest.fixture(autouse=True)
+    def pid_alive(self):
+        with mock.patch("app.multiprocess_metrics._pid_alive", side_effect=lambda pid: pid == LIVE_PID) as pid_alive:
+            yield pid_alive
+
+    @pytest.fixture
+    def registry(self, tmp_path):
+        registry = CollectorRegistry()
+        ArchivingMultiProcessCollector(registry, path=str(tmp_path))
+        return registry
+
+    def test_dead_process_counters_are_archived(self, tmp_path):
+        _write_metrics_file(tmp_path, f"counter_{DEAD_PID}.db", _counter(3))
+        _write_metrics_file(tmp_path, f"counter_{LIVE_PID}.db", _counter(4))
+        _write_metrics_file(tmp_path, "counter_archived.db", _counter(5))
+
+        archive_dead_process_files(str(tmp_path))
+
+        assert sorted(f.name for f in tmp_path.iterdir()) == ["counter_1002.db", "counter_archived.db"]
+        archive = _MmapedDict(str(tmp_path / "counter_archived.db"), read_mode=True)
+        assert [value for _, value in archive.read_all_values()] == [8]
+
+    @pytest.mark.parametrize("multiprocess_mode", ("all", "liveall", "livesum", "max", "min"))
+    def test_dead_process_gauges_are_removed(self, tmp_path, multiprocess_mode):
+        _write_metrics_file(tmp_path, f"gauge_{multiprocess_mode}_{DEAD_PID}.db", _gauge(1))
+        _write_metrics_file(tmp_path, f"gauge_{multiprocess_mode}_{LIVE_PID}.db", _gauge(2))
+
+        archive_dead_process_files(str(tmp_path))
+
+        assert [f.name for f in tmp_path.iterdir()] == [f"gauge_{multiprocess_mode}_1002.db"]
+
+    def test_totals_are_unchanged_by_archiving(self, tmp_path, registry, pid_alive):
+        _write_metrics_file(tmp_path, f"counter_{DEAD_PID}.db", _counter(3))
+        _write_metrics_file(tmp_path, f"counter_{LIVE_PID}.db", _counter(4))
+        pid_alive.side_effect = lambda pid: True
+
+        before = generate_latest(registry)
+        pid_alive.side_effect = lambda pid: pid == LIVE_PID
+        after = generate_latest(registry)
+
+        assert b'requests_total{code="200"} 7.0' in before
+        assert after == before
+        assert not (tmp_path / f"counter_{DEAD_PID}.db").exists()
@@ -0,0 +1,182 @@
+import mock
+import pytest
+
+from dmutils.email import EmailError
+
+from app import email_dispatcher
+from fakes.notify import FakeNotifyServer
+from .helpers import BaseApplicationTest
+
+
+class TestEmailDispatcher(BaseApplicationTest):
+
+    def setup_method(self, method):
+        super().setup_method(method)
+        self.app.config["DM_NOTIFY_DISPATCH_RETRY_BACKOFF"] = 0.01
+
+    def _init_dispatcher(self, fake_notify, **config):
+        self.app.config["DM_NOTIFY_BASE_URL"] = fake_notify.base_url
+        self.app.config.update(config)
+        email_dispatcher.init_app(self.app)
+
+    def _send_email(self):
+        with self.app.test_request_context():
+            return email_dispatcher.send_email(
+                "email@example.com",
+                template_name_or_id="reset_password",
+                personalisation={"url": "http://localhost/user/reset-password/abc"},
+                reference="reset-password-abc",
+                email_type="Password reset",
+                error_code="login.reset-email.notify-error",
+            )
+
+    def _wait_for_dispatch(self):
+        email_dispatcher._get_executor().shutdown(wait=True)
+
+    def test_synchronous_dispatch_sends_email_during_request(self):
+        with FakeNotifyServer() as fake_notify:
+            self._init_dispatcher(fake_notify, DM_NOTIFY_ASYNC=False)
+            assert self._send_email() == "sent"
+
+            assert fake_notify.sent_emails == [{
+                "email_address": "email@example.com",
+                "template_id": self.app.config["NOTIFY_TEMPLATES"]["reset_password"],
+                "personalisation": {"url": "http://localhost/user/reset-password/abc"},
+                "reference": "reset-password-abc",
+            }]
+
+    @mock.patch("app.main.helpers.logging_helpers.current_app")
+    def test_synchronous_dispatch_logs_and_raises_errors_without_retrying(self, current_app):
+        with FakeNotifyServer(failures=1) as fake_notify:
+            self._init_dispatcher(fake_notify, DM_NOTIFY_ASYNC=False)
+            with pytest.raises(EmailError):
+                self._send_email()
+
+            assert len(fake_notify.requests) == 1
+            assert current_app.logger.error.call_args[1]["extra"]["code"] == "login.reset-email.notify-error"
+
+    def test_asynchronous_dispatch_sends_email_in_background(self):
+        with FakeNotifyServer() as fake_notify:
+            self._init_dispatcher(fake_notify, DM_NOTIFY_ASYNC=True)
+            assert self._send_email() == "queued"
+            self._wait_for_dispatch()
+
+            assert [email["reference"] for email in fake_notify.sent_emails] == ["reset-password-abc"]
+
+    @mock.patch("app.main.helpers.logging_helpers.current_app")
+    def test_asynchronous_dispatch_retries_failures(self, current_app):
+        with FakeNotifyServer(failures=2) as fake_notify:
+            self._init_dispatcher(fake_notify, DM_NOTIFY_ASYNC=True, DM_NOTIFY_DISPATCH_RETRIES=3)
+            self._send_email()
+            self._wait_for_dispatch()
+
+            assert len(fake_notify.requests) == 3
+            assert len(fake_notify.sent_emails) == 1
+            assert current_app.logger.error.called is False
+
+    @mock.patch("app.main.helpers.logging_helpers.current_app")
+    def test_asynchronous_dispatch_logs_email_error_once_retries_exhausted(self, current_app):
+        with FakeNotifyServer(failures=10) as fake_notify:
+            self._init_dispatcher(fake_notify, DM_NOTIFY_ASYNC=True, DM_NOTIFY_DISPATCH_RETRIES=2)
+            self._send_email()
+            self._wait_for_dispatch()
+
+            assert len(fake_notify.requests) == 3
+            assert fake_notify.sent_emails == []
+            assert current_app.logger.error.call_args_list == [mock.call(
+                "{code}: {email_type} email for email_hash {email_hash} failed to send. Error: {error}",
+                extra={
+                    "email_hash": mock.ANY,
+                    "error": mock.ANY,
+                    "code": "login.reset-email.notify-error",
+                    "email_type": "Password reset",
+                },
+            )]
+
+    @mock.patch("app.notify.EmailDispatcher._start_redis_consumers", autospec=True)
+    def test_redis_dispatch_queues_email_on_redis_list(self, start_redis_consumers):
+        redis = mock.Mock()
+        with FakeNotifyServer() as fake_notify:
+            self._init_dispatcher(
+                fake_notify,
+                DM_NOTIFY_ASYNC=True,
+                DM_REDIS_SERVICE_NAME="digitalmarketplace_redis",
+                SESSION_REDIS=redis,
+            )
+            # consumers are started with the app, not left until the first email
+            assert start_redis_consumers.call_count == 1
+            assert self._send_email() == "queued"
+
+            ((key, token), _), = redis.lpush.call_args_list
+            assert key == self.app.config["DM_NOTIFY_DISPATCH_REDIS_KEY"]
+            # the reset link isn't stored in Redis in plaintext
+            assert "reset-password" not in token
+
+            # and what a consumer thread would then do with it
+            redis.brpoplpush.return_value = token.encode("utf-8")
+            email_dispatcher._consume_redis_email()
+            assert [email["reference"] for email in fake_notify.sent_emails] == ["reset-password-abc"]
+
+            processing_key = f"{key}:processing"
+            assert redis.brpoplpush.call_args_list == [mock.call(key, processing_key, timeout=5)]
+            # only removed from the processing list once sent
+            assert redis.lrem.call_args_list == [mock.call(processing_key, 1, token.encode("utf-8"))]
+
+    @mock.patch("app.notify.EmailDispatcher._start_redis_consumers", autospec=True)
+    def test_redis_dispatch_drops_items_which_cannot_be_decrypted(self, start_redis_consumers):
+        redis = mock.Mock()
+        with FakeNotifyServer() as fake_notify:
+            self._init_dispatcher(
+                fake_notify,
+                DM_NOTIFY_ASYNC=True,
+                DM_REDIS_SERVICE_NAME="digitalmarketplace_redis",
+                SESSION_REDIS=redis,
+            )
+            redis.brpoplpush.return_value = b"not-a-token"
+            email_dispatcher._consume_redis_email()
+
+            assert fake_notify.sent_emails == []
+            assert redis.lrem.call_count == 1
+
+    def test_app_can_be_created_without_a_notify_api_key(self):
+        self.app.config["DM_NOTIFY_API_KEY"] = None
+        email_dispatcher.init_app(self.app)
+
+        with pytest.raises(TypeError):
+            email_dispatcher.notify_client
+
+    def test_emails_are_sent_through_a_single_pooled_session(self):
+        with FakeNotifyServer() as fake_notify:
+            self._init_dispatcher(
+                fake_notify,
+                DM_NOTIFY_ASYNC=False,
+                DM_NOTIFY_POOL_SIZE=3,
+                DM_NOTIFY_CONNECT_TIMEOUT=1,
+                DM_NOTIFY_READ_TIMEOUT=2,
+            )
+            client = email_dispatcher.notify_client.client
+            assert client.timeout == (1.0, 2.0)
+            assert client.session.get_adapter(fake_notify.base_url)._pool_maxsize == 3
+
+            with mock.patch.object(client.session, "request", wraps=client.session.request) as session_request:
+                self._send_email()
+                self._send_email()
+
+            assert session_request.call_count == 2
+            assert session_request.call_args[1]["timeout"] == (1.0, 2.0)
+            assert len(fake_notify.sent_emails) == 2
+
+    @mock.patch("app.main.helpers.logging_helpers.current_app")
+    @mock.patch("app.notify.NOTIFY_REQUEST_DURATION_SECONDS")
+    def test_notify_request_durations_are_recorded(self, notify_request_duration_seconds, current_app):
+        with FakeNotifyServer(failures=1) as fake_notify:
+            self._init_dispatcher(fake_notify, DM_NOTIFY_ASYNC=False)
+            with pytest.raises(EmailError):
+                self._send_email()
+            self._send_email()
+
+        assert notify_request_duration_seconds.labels.call_args_list == [
+            mock.call("POST", 500),
+            mock.call("POST", 201),
+        ]
+        assert notify_request_duration_seconds.labels.return_value.observe.call_count == 2
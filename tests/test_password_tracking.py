@@ -0,0 +1,39 @@
+import mock
+
+from app import password_changes
+from .helpers import BaseApplicationTest
+
+
+class TestPasswordChanges(BaseApplicationTest):
+
+    def test_changes_are_recorded_in_process(self):
+        assert password_changes.shared is False
+        assert password_changes.changed_at(123) == ""
+
+        password_changes.record(123)
+
+        assert password_changes.changed_at(123) != ""
+        assert password_changes.changed_at(456) == ""
+
+    def test_changes_are_recorded_in_redis(self):
+        redis = mock.Mock()
+        redis.get.return_value = b"1600000000.5"
+        self.app.config.update(DM_REDIS_SERVICE_NAME="digitalmarketplace_redis", SESSION_REDIS=redis)
+        password_changes.init_app(self.app)
+
+        with mock.patch("app.password_tracking.time", return_value=1600000001.5):
+            password_changes.record(123)
+
+        assert password_changes.shared is True
+        assert password_changes.changed_at(123) == "1600000000.5"
+        redis.get.assert_called_once_with("user-frontend:password-changed-at:123")
+        redis.set.assert_called_once_with("user-frontend:password-changed-at:123", "1600000001.5", ex=300)
+
+    def test_changes_are_unknown_if_redis_fails(self):
+        redis = mock.Mock()
+        redis.get.side_effect = ConnectionError
+        self.app.config.update(DM_REDIS_SERVICE_NAME="digitalmarketplace_redis", SESSION_REDIS=redis)
+        password_changes.init_app(self.app)
+
+        with self.app.app_context():
+            assert password_changes.changed_at(123) is None
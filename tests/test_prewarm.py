@@ -0,0 +1,49 @@
+import mock
+
+from app import create_app
+from app.main.forms.auth_forms import NotInPasswordBlocklist
+from app.prewarm import prewarm
+from .helpers import BaseApplicationTest
+
+
+class TestPrewarm(BaseApplicationTest):
+
+    def setup_method(self, method):
+        super().setup_method(method)
+        self._original_blocklist_set = NotInPasswordBlocklist._blocklist_set
+        NotInPasswordBlocklist._blocklist_set = None
+
+    def teardown_method(self, method):
+        NotInPasswordBlocklist._blocklist_set = self._original_blocklist_set
+        super().teardown_method(method)
+
+    def test_prewarm_builds_password_blocklist(self):
+        prewarm(self.app)
+
+        assert NotInPasswordBlocklist._blocklist_set is not None
+        assert "digitalmarketplace" in NotInPasswordBlocklist._blocklist_set
+
+    def test_prewarm_compiles_templates(self):
+        prewarm(self.app)
+
+        compiled_template_names = {template.name for template in self.app.jinja_env.cache.values()}
+        assert {"_base_page.html", "auth/login.html", "govuk/template.njk"} <= compiled_template_names
+
+    def test_prewarm_logs_duration_of_each_step(self):
+        with mock.patch.object(self.app, "logger") as logger:
+            prewarm(self.app)
+
+        assert [call[1]["extra"]["prewarm_step"] for call in logger.log.call_args_list] == [
+            "password_blocklist",
+            "templates",
+            "asset_fingerprints",
+        ]
+
+    @mock.patch("app.prewarm.prewarm", autospec=True)
+    def test_create_app_only_prewarms_if_configured(self, prewarm):
+        create_app("test")
+        assert prewarm.called is False
+
+        with mock.patch.dict("os.environ", {"DM_PREWARM": "true"}):
+            application = create_app("test")
+        assert prewarm.call_args_list == [mock.call(application)]
@@ -0,0 +1,74 @@
+import pstats
+
+import mock
+import pytest
+
+from app.profiling import PROFILE_HEADER_VALUE, RequestProfiler, profile_header_signer
+from .helpers import BaseApplicationTest
+
+
+class TestRequestProfiler(BaseApplicationTest):
+
+    @pytest.fixture(autouse=True)
+    def profile_dir(self, tmpdir):
+        self.profile_dir = tmpdir
+
+    def _install_profiler(self, **config):
+        self.app.config.update(DM_PROFILE_DIR=str(self.profile_dir), DM_PROFILE_SIGNING_KEY="signing-key", **config)
+        self.app.wsgi_app = RequestProfiler(self.app, self.app.wsgi_app)
+
+    def _profiles(self):
+        return sorted(f.basename for f in self.profile_dir.listdir())
+
+    def test_requests_are_not_profiled_by_default(self):
+        self._install_profiler()
+
+        assert self.client.get("/user/logout").status_code == 302
+        assert self._profiles() == []
+
+    def test_sampled_requests_are_profiled_by_endpoint_and_request_id(self):
+        self._install_profiler(DM_PROFILE_SAMPLE_RATE=0.5)
+
+        with mock.patch("app.profiling.random.random", return_value=0.25):
+            response = self.client.get("/user/logout", headers={"DM-Request-ID": "abc123"})
+
+        assert response.status_code == 302
+        assert self._profiles() == ["main.logout.abc123.prof"]
+        stats = pstats.Stats(str(self.profile_dir.join("main.logout.abc123.prof")))
+        assert any(function_name == "logout" for _, _, function_name in stats.stats)
+
+    def test_requests_with_a_signed_header_are_profiled(self):
+        self._install_profiler()
+        header = profile_header_signer("signing-key").sign(PROFILE_HEADER_VALUE).decode()
+
+        self.client.get("/user/logout", headers={"X-DM-Profile": header, "DM-Request-ID": "abc123"})
+
+        assert self._profiles() == ["main.logout.abc123.prof"]
+
+    @pytest.mark.parametrize("header", (
+        "profile",
+        profile_header_signer("wrong-key").sign(PROFILE_HEADER_VALUE).decode(),
+    ))
+    def test_requests_with_a_bad_header_are_not_profiled(self, header):
+        self._install_profiler()
+
+        self.client.get("/user/logout", headers={"X-DM-Profile": header})
+
+        assert self._profiles() == []
+
+    def test_expired_headers_are_not_accepted(self):
+        self._install_profiler(DM_PROFILE_HEADER_MAX_AGE=60)
+        with mock.patch("itsdangerous.timed.time.time", return_value=1000):
+            header = profile_header_signer("signing-key").sign(PROFILE_HEADER_VALUE).decode()
+
+        self.client.get("/user/logout", headers={"X-DM-Profile": header})
+
+        assert self._profiles() == []
+
+    def test_unsafe_request_ids_are_not_used_in_filenames(self):
+        self._install_profiler(DM_PROFILE_SAMPLE_RATE=1.0)
+
+        self.client.get("/user/logout", headers={"DM-Request-ID": "../../etc"})
+
+        [profile] = self._profiles()
+        assert profile.startswith("main.logout.") and ".." not in profile[len("main.logout."):]
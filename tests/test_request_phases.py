@@ -0,0 +1,86 @@
+from flask import render_template_string
+import mock
+from wtforms import StringField
+
+from app import data_api_client, email_dispatcher
+from app.main.forms.auth_forms import NotInPasswordBlocklist
+from app.request_phases import PhaseTimedForm, timed_phase
+from .helpers import BaseApplicationTest
+
+
+class _NameForm(PhaseTimedForm):
+    name = StringField()
+
+
+class TestRequestPhases(BaseApplicationTest):
+
+    def setup_method(self, method):
+        super().setup_method(method)
+        self._phase_duration_patch = mock.patch("app.request_phases.REQUEST_PHASE_DURATION_SECONDS")
+        self.phase_duration_seconds = self._phase_duration_patch.start()
+
+    def teardown_method(self, method):
+        self._phase_duration_patch.stop()
+        super().teardown_method(method)
+
+    def _recorded_phases(self):
+        return [call[0] for call in self.phase_duration_seconds.labels.call_args_list]
+
+    def test_phases_are_labelled_by_endpoint(self):
+        with self.app.test_request_context("/user/login"):
+            with timed_phase("data_api", "authenticate_user"):
+                pass
+
+        assert self._recorded_phases() == [("main.render_login", "data_api", "authenticate_user")]
+        assert self.phase_duration_seconds.labels.return_value.observe.call_count == 1
+
+    def test_phases_outside_a_request_are_labelled_none(self):
+        with timed_phase("notify", "reset_password"):
+            pass
+
+        assert self._recorded_phases() == [("none", "notify", "reset_password")]
+
+    def test_nested_phases_of_the_same_kind_are_not_recorded(self):
+        with timed_phase("data_api", "find_users_iter"):
+            with timed_phase("data_api", "find_users"):
+                pass
+            with timed_phase("validator", "MatchesCurrentPassword"):
+                pass
+
+        assert self._recorded_phases() == [
+            ("none", "validator", "MatchesCurrentPassword"),
+            ("none", "data_api", "find_users_iter"),
+        ]
+
+    def test_form_validation_and_validators_are_recorded(self):
+        with self.app.test_request_context("/user/reset-password", method="POST", data={"name": "Alice"}):
+            form = _NameForm()
+            form.name.validators = [NotInPasswordBlocklist(message="Too common")]
+            assert form.validate() is True
+
+        assert self._recorded_phases() == [
+            ("main.send_reset_password_email", "validator", "NotInPasswordBlocklist"),
+            ("main.send_reset_password_email", "form_validation", "_NameForm"),
+        ]
+
+    @mock.patch("dmapiclient.DataAPIClient._get", autospec=True)
+    def test_data_api_client_methods_are_recorded(self, _get):
+        _get.return_value = {"users": {"id": 123}}
+
+        assert data_api_client.get_user(user_id=123) == {"users": {"id": 123}}
+        assert self._recorded_phases() == [("none", "data_api", "get_user")]
+
+    @mock.patch("app.notify.DMNotifyClient.send_email", autospec=True)
+    def test_emails_are_recorded_by_template_name(self, send_email):
+        with self.app.app_context():
+            email_dispatcher.notify_client.send_email(
+                "email@example.com", template_name_or_id=self.app.config["NOTIFY_TEMPLATES"]["reset_password"]
+            )
+
+        assert self._recorded_phases() == [("none", "notify", "reset_password")]
+
+    def test_rendering_is_recorded(self):
+        with self.app.test_request_context("/user/login"):
+            assert render_template_string("Hello {{ name }}", name="Alice") == "Hello Alice"
+
+        assert self._recorded_phases() == [("main.render_login", "render", None)]
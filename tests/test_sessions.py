@@ -0,0 +1,66 @@
+from flask_session.sessions import RedisSession
+from freezegun import freeze_time
+import mock
+
+from app.sessions import SlidingRedisSessionInterface
+from .helpers import BaseApplicationTest
+
+
+class TestRefreshSession(BaseApplicationTest):
+
+    def _sets_session_cookie(self, url):
+        response = self.client.get(url)
+        return any(c.startswith("dm_session=") for c in response.headers.getlist("Set-Cookie"))
+
+    def test_session_is_only_rewritten_once_a_fraction_of_its_lifetime_has_passed(self):
+        with freeze_time("2021-01-01 12:00:00"):
+            assert self._sets_session_cookie("/user/cookie-settings") is True
+            assert self._sets_session_cookie("/user/cookie-settings") is False
+
+        with freeze_time("2021-01-01 12:05:59"):
+            assert self._sets_session_cookie("/user/cookie-settings") is False
+
+        with freeze_time("2021-01-01 12:06:00"):
+            assert self._sets_session_cookie("/user/cookie-settings") is True
+
+    def test_session_is_rewritten_whenever_it_is_modified(self):
+        self._sets_session_cookie("/user/cookie-settings")
+        with self.client.session_transaction() as session:
+            session["foo"] = "bar"
+
+        assert self._sets_session_cookie("/user/cookie-settings") is True
+
+    def test_sessionless_endpoints_do_not_create_sessions(self):
+        assert self._sets_session_cookie("/user/_metrics") is False
+
+
+class TestSlidingRedisSessionInterface(BaseApplicationTest):
+
+    def setup_method(self, method):
+        super().setup_method(method)
+        self.redis = mock.Mock()
+        self.session_interface = SlidingRedisSessionInterface(self.redis, "session:", False, True)
+
+    @mock.patch("app.sessions.SESSION_SAVES_TOTAL")
+    def test_unmodified_sessions_are_not_written(self, session_saves_total):
+        session = RedisSession({"_permanent": True, "foo": "bar"}, sid="abc")
+        session.modified = False
+        response = mock.Mock()
+
+        self.session_interface.save_session(self.app, session, response)
+
+        assert self.redis.setex.called is False
+        assert response.set_cookie.called is False
+        session_saves_total.labels.assert_called_once_with("skipped")
+
+    @mock.patch("app.sessions.SESSION_SAVES_TOTAL")
+    def test_modified_sessions_are_written(self, session_saves_total):
+        session = RedisSession({"_permanent": True, "foo": "bar"}, sid="abc")
+        session.modified = True
+        response = mock.Mock()
+
+        self.session_interface.save_session(self.app, session, response)
+
+        assert self.redis.setex.call_args[1]["name"] == "session:abc"
+        assert response.set_cookie.called is True
+        session_saves_total.labels.assert_called_once_with("written")
@@ -0,0 +1,185 @@
+import gzip
+import hashlib
+import json
+
+from dmutils.asset_fingerprint import AssetFingerprinter
+from flask import request_started
+import mock
+import pytest
+
+from app import static_assets
+from app.fast_path import FastPathMiddleware
+from app.metrics import gds_metrics
+from app.static_assets import ManifestAssetFingerprinter, build_manifest, load_manifest
+from .helpers import BaseApplicationTest
+
+CSS = "body { color: black; }\n" * 100
+
+
+@pytest.fixture
+def static_folder(tmpdir):
+    tmpdir.mkdir("stylesheets").join("application.css").write(CSS)
+    tmpdir.join("favicon.png").write_binary(b"\x89PNG")
+    return tmpdir
+
+
+class TestBuildManifest:
+
+    @mock.patch.object(static_assets, "brotli", None)
+    def test_manifest_has_fingerprints_and_compressed_variants(self, static_folder):
+        assert build_manifest(str(static_folder)) == 2
+
+        css_path = str(static_folder.join("stylesheets/application.css"))
+        manifest = json.loads(static_folder.join("manifest.json").read())
+        assert manifest == {
+            "favicon.png": {"hash": hashlib.md5(b"\x89PNG").hexdigest(), "encodings": []},
+            "stylesheets/application.css": {
+                "hash": AssetFingerprinter().get_asset_fingerprint(css_path),
+                "encodings": ["gzip"],
+            },
+        }
+        assert gzip.decompress(static_folder.join("stylesheets/application.css.gz").read_binary()).decode() == CSS
+        assert not static_folder.join("favicon.png.gz").exists()
+
+    @mock.patch.object(static_assets, "brotli")
+    def test_brotli_variants_are_built_if_brotli_is_installed(self, brotli, static_folder):
+        brotli.compress.return_value = b"brotli"
+
+        build_manifest(str(static_folder))
+
+        manifest = load_manifest(str(static_folder))
+        assert manifest["stylesheets/application.css"]["encodings"] == ["br", "gzip"]
+        assert static_folder.join("stylesheets/application.css.br").read_binary() == b"brotli"
+
+    def test_rebuilding_ignores_the_manifest_and_variants(self, static_folder):
+        build_manifest(str(static_folder))
+
+        assert build_manifest(str(static_folder)) == 2
+
+    def test_missing_manifest_is_empty(self, tmpdir):
+        assert load_manifest(str(tmpdir)) == {}
+
+
+class TestManifestAssetFingerprinter:
+
+    def test_fingerprints_come_from_the_manifest(self):
+        fingerprinter = ManifestAssetFingerprinter(
+            {"stylesheets/application.css": {"hash": "abc123", "encodings": []}},
+            asset_root="/user/static/",
+        )
+
+        assert fingerprinter.get_url("stylesheets/application.css") == "/user/static/stylesheets/application.css?abc123"
+
+    def test_assets_missing_from_the_manifest_are_hashed(self, static_folder):
+        fingerprinter = ManifestAssetFingerprinter({}, filesystem_path=str(static_folder) + "/")
+
+        assert fingerprinter.get_asset_fingerprint(str(static_folder.join("stylesheets/application.css"))) == (
+            AssetFingerprinter().get_asset_fingerprint(str(static_folder.join("stylesheets/application.css")))
+        )
+
+
+class TestInitApp(BaseApplicationTest):
+
+    def test_asset_fingerprinter_uses_the_manifest(self):
+        assert isinstance(self.app.config["BASE_TEMPLATE_DATA"]["asset_fingerprinter"], ManifestAssetFingerprinter)
+
+
+class TestStaticFiles(BaseApplicationTest):
+
+    def setup_method(self, method):
+        super().setup_method(method)
+        self.flask_requests = []
+        request_started.connect(self._record_flask_request, self.app)
+
+    def teardown_method(self, method):
+        request_started.disconnect(self._record_flask_request, self.app)
+        super().teardown_method(method)
+
+    def _record_flask_request(self, sender, **extra):
+        self.flask_requests.append(sender)
+
+    @pytest.fixture(autouse=True)
+    def fingerprinted_static_folder(self, static_folder):
+        build_manifest(str(static_folder))
+        self.app.static_folder = str(static_folder)
+        static_assets.init_app(self.app)
+        self.app.wsgi_app = FastPathMiddleware(self.app, self.app.wsgi_app.wsgi_app, gds_metrics)
+        self.fingerprint = load_manifest(str(static_folder))["stylesheets/application.css"]["hash"]
+
+    def test_precompressed_variant_is_served_if_accepted(self):
+        response = self.client.get("/user/static/stylesheets/application.css", headers={"Accept-Encoding": "gzip"})
+
+        assert response.status_code == 200
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.headers["Content-Type"] == "text/css; charset=utf-8"
+        assert response.headers["Vary"] == "Accept-Encoding"
+        assert gzip.decompress(response.data).decode() == CSS
+        assert self.flask_requests == []
+
+    def test_uncompressed_file_is_served_otherwise(self):
+        response = self.client.get("/user/static/stylesheets/application.css", headers={"Accept-Encoding": "br"})
+
+        assert "Content-Encoding" not in response.headers
+        assert response.data.decode() == CSS
+
+    def test_fingerprinted_urls_are_immutable(self):
+        response = self.client.get(f"/user/static/stylesheets/application.css?{self.fingerprint}")
+
+        assert response.headers["Cache-Control"] == "public, max-age=31536000, immutable"
+
+    def test_unfingerprinted_urls_are_not_immutable(self):
+        response = self.client.get("/user/static/stylesheets/application.css?stale")
+
+        assert "immutable" not in response.headers["Cache-Control"]
+        assert "max-age" in response.headers["Cache-Control"]
+
+    def test_conditional_requests_are_not_modified(self):
+        etag = self.client.get("/user/static/stylesheets/application.css").headers["ETag"]
+
+        response = self.client.get("/user/static/stylesheets/application.css", headers={"If-None-Match": etag})
+
+        assert response.status_code == 304
+        assert response.data == b""
+
+    def test_files_missing_from_the_manifest_are_served(self, static_folder):
+        static_folder.join("robots.txt").write("User-agent: *")
+
+        response = self.client.get("/user/static/robots.txt", headers={"Accept-Encoding": "gzip"})
+
+        assert response.status_code == 200
+        assert response.data == b"User-agent: *"
+        assert "Content-Encoding" not in response.headers
+
+    def test_paths_outside_the_static_folder_are_passed_on_to_flask(self):
+        assert self.client.get("/user/static/../config.py").status_code == 404
+        assert self.flask_requests == [self.app]
+
+
+class TestStaticView(BaseApplicationTest):
+    """Static files served by the app's `static` view, as without `DM_WSGI_FAST_PATH`"""
+
+    @pytest.fixture(autouse=True)
+    def fingerprinted_static_folder(self, static_folder):
+        build_manifest(str(static_folder))
+        self.app.static_folder = str(static_folder)
+        static_assets.init_app(self.app)
+        if isinstance(self.app.wsgi_app, FastPathMiddleware):
+            self.app.wsgi_app = self.app.wsgi_app.wsgi_app
+        self.fingerprint = load_manifest(str(static_folder))["stylesheets/application.css"]["hash"]
+
+    def test_precompressed_variant_is_served_if_accepted(self):
+        response = self.client.get("/user/static/stylesheets/application.css", headers={"Accept-Encoding": "gzip"})
+
+        assert response.status_code == 200
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.headers["Vary"] == "Accept-Encoding"
+        assert gzip.decompress(response.data).decode() == CSS
+
+    def test_fingerprinted_urls_are_immutable(self):
+        response = self.client.get(f"/user/static/stylesheets/application.css?{self.fingerprint}")
+
+        assert response.headers["Cache-Control"] == "public, max-age=31536000, immutable"
+
+    def test_missing_files_are_not_found(self):
+        assert self.client.get("/user/static/missing.css").status_code == 404
+        assert self.client.get("/user/static/../config.py").status_code == 404
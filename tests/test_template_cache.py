@@ -0,0 +1,49 @@
+import os
+import shutil
+
+import jinja2
+import mock
+
+from app.template_cache import TemplateBytecodeCache
+
+
+class TestTemplateBytecodeCache:
+
+    def _environment(self, root, cache_dir):
+        return jinja2.Environment(
+            loader=jinja2.FileSystemLoader(os.path.join(root, "templates")),
+            bytecode_cache=TemplateBytecodeCache(cache_dir, root=root),
+        )
+
+    def _write_template(self, root, source):
+        os.makedirs(os.path.join(root, "templates"), exist_ok=True)
+        with open(os.path.join(root, "templates", "page.html"), "w") as f:
+            f.write(source)
+
+    def test_cache_compiled_in_one_checkout_is_used_by_another(self, tmpdir):
+        build_root, deploy_root, cache_dir = (str(tmpdir.mkdir(name)) for name in ("build", "deploy", "cache"))
+        self._write_template(build_root, "Hello {{ name }}")
+        self._environment(build_root, cache_dir).get_template("page.html")
+        assert len(os.listdir(cache_dir)) == 1
+
+        shutil.copytree(os.path.join(build_root, "templates"), os.path.join(deploy_root, "templates"))
+        environment = self._environment(deploy_root, cache_dir)
+        with mock.patch.object(environment, "compile", wraps=environment.compile) as compile_:
+            assert environment.get_template("page.html").render(name="world") == "Hello world"
+
+        assert compile_.called is False
+
+    def test_changed_templates_are_recompiled(self, tmpdir):
+        root, cache_dir = str(tmpdir.mkdir("root")), str(tmpdir.mkdir("cache"))
+        self._write_template(root, "Hello {{ name }}")
+        self._environment(root, cache_dir).get_template("page.html")
+
+        self._write_template(root, "Goodbye {{ name }}")
+        assert self._environment(root, cache_dir).get_template("page.html").render(name="world") == "Goodbye world"
+
+    def test_missing_cache_directory_is_not_an_error(self, tmpdir):
+        root = str(tmpdir.mkdir("root"))
+        self._write_template(root, "Hello {{ name }}")
+        environment = self._environment(root, os.path.join(root, "no-such-directory"))
+
+        assert environment.get_template("page.html").render(name="world") == "Hello world"
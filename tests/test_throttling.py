@@ -0,0 +1,104 @@
+import mock
+import pytest
+
+from app import login_throttle
+from app.throttling import Throttled
+from .helpers import BaseApplicationTest
+
+
+class TestLoginThrottle(BaseApplicationTest):
+
+    def setup_method(self, method):
+        super().setup_method(method)
+        self.app.config.update(
+            DM_LOGIN_THROTTLE_IP_BURST=3,
+            DM_LOGIN_THROTTLE_IP_PER_MINUTE=60,
+            DM_LOGIN_THROTTLE_EMAIL_BURST=2,
+            DM_LOGIN_THROTTLE_EMAIL_PER_MINUTE=6,
+        )
+        login_throttle.init_app(self.app)
+        self.now = 1000
+        self.monotonic_patch = mock.patch("app.throttling.monotonic", side_effect=lambda: self.now)
+        self.monotonic_patch.start()
+
+    def teardown_method(self, method):
+        self.monotonic_patch.stop()
+        super().teardown_method(method)
+
+    def _check(self, email_address="email@example.com", ip_address="192.0.2.1"):
+        with self.app.test_request_context(environ_base={"REMOTE_ADDR": ip_address}):
+            return login_throttle.check(email_address)
+
+    def test_allows_attempts_up_to_burst(self):
+        assert [self._check() for _ in range(3)] == [None, None, Throttled("email", pytest.approx(10))]
+
+    def test_email_bucket_refills_at_rate(self):
+        self._check(), self._check()
+
+        self.now += 9
+        assert self._check().bucket == "email"
+        self.now += 1
+        assert self._check() is None
+
+    def test_email_addresses_are_compared_ignoring_case_and_whitespace(self):
+        self._check("email@example.com"), self._check(" Email@Example.com ")
+
+        assert self._check("EMAIL@EXAMPLE.COM", ip_address="192.0.2.2").bucket == "email"
+        assert self._check("other@example.com", ip_address="192.0.2.2") is None
+
+    def test_ip_bucket_limits_attempts_for_any_email_address(self):
+        for i in range(3):
+            assert self._check(f"email{i}@example.com") is None
+
+        assert self._check("email3@example.com") == Throttled("ip", pytest.approx(1))
+        assert self._check("email3@example.com", ip_address="192.0.2.2") is None
+
+    def test_least_recently_used_buckets_are_forgotten(self):
+        self.app.config["DM_LOGIN_THROTTLE_MAXSIZE"] = 2
+        login_throttle.init_app(self.app)
+        for i in range(3):
+            self._check(f"{i}@example.com")
+        assert self._check("3@example.com").bucket == "ip"
+
+        self._check("4@example.com", ip_address="192.0.2.2")
+        assert self._check("5@example.com") is None
+
+    def test_does_nothing_if_disabled(self):
+        self.app.config["DM_LOGIN_THROTTLE"] = False
+        login_throttle.init_app(self.app)
+
+        assert [self._check() for _ in range(5)] == [None] * 5
+
+    @mock.patch("app.throttling.LOGIN_THROTTLE_CHECKS_TOTAL", autospec=True)
+    def test_checks_are_counted_by_outcome(self, checks_total):
+        for _ in range(3):
+            self._check()
+
+        assert checks_total.labels.call_args_list == [
+            mock.call("allowed"), mock.call("allowed"), mock.call("throttled_email"),
+        ]
+
+    def test_redis_buckets_are_taken_by_script(self):
+        redis = mock.Mock()
+        redis.register_script.return_value.return_value = [2, b"9.5"]
+        self.app.config.update(DM_REDIS_SERVICE_NAME="digitalmarketplace_redis", SESSION_REDIS=redis)
+        login_throttle.init_app(self.app)
+
+        with mock.patch("app.throttling.time", return_value=1234.5):
+            assert self._check() == Throttled("email", 9.5)
+
+        (_, kwargs), = redis.register_script.return_value.call_args_list
+        assert kwargs["keys"][0] == "user-frontend:login-throttle:ip:192.0.2.1"
+        assert kwargs["keys"][1].startswith("user-frontend:login-throttle:email:")
+        assert "example" not in kwargs["keys"][1]
+        assert kwargs["args"] == [1234.5, 3, 1, 2, 0.1]
+
+    @mock.patch("app.throttling.LOGIN_THROTTLE_CHECKS_TOTAL", autospec=True)
+    def test_attempts_are_allowed_if_redis_fails(self, checks_total):
+        redis = mock.Mock()
+        redis.register_script.return_value.side_effect = ConnectionError
+        self.app.config.update(DM_REDIS_SERVICE_NAME="digitalmarketplace_redis", SESSION_REDIS=redis)
+        login_throttle.init_app(self.app)
+
+        assert self._check() is None
+        checks_total.labels.assert_called_once_with("error")